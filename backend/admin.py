@@ -1,6 +1,7 @@
 
 from django.contrib import admin
-from .models import User, Driver, Supervisor, Trip, ELDLog, ApprovalRequest
+from .leaderboard import driver_scopes, index_driver_added, index_driver_moved, index_lifetime_mileage
+from .models import User, Driver, Supervisor, Trip, ELDLog, ApprovalRequest, Location, HOSViolation, DutySegment
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -16,6 +17,16 @@ class DriverAdmin(admin.ModelAdmin):
 	list_filter = ('office', 'terminal', 'status')
 	ordering = ('user',)
 
+	def save_model(self, request, obj, form, change):
+		# Keep the leaderboard rank boards in step with drivers created or edited here
+		old_scopes = driver_scopes(Driver.objects.get(pk=obj.pk)) if change else None
+		super().save_model(request, obj, form, change)
+		if change:
+			index_driver_moved(obj, old_scopes)
+			index_lifetime_mileage(obj)
+		else:
+			index_driver_added(obj)
+
 @admin.register(Supervisor)
 class SupervisorAdmin(admin.ModelAdmin):
 	list_display = ('user', 'office', 'email')
@@ -34,6 +45,7 @@ class TripAdmin(admin.ModelAdmin):
 	search_fields = ('driver__user__username', 'start', 'end', 'status')
 	list_filter = ('status', 'date')
 	ordering = ('-date',)
+	raw_id_fields = ('geometry', 'start_location', 'end_location')
 	inlines = [ApprovalRequestInline]
 
 @admin.register(ELDLog)
@@ -49,3 +61,25 @@ class ApprovalRequestAdmin(admin.ModelAdmin):
 	search_fields = ('trip__driver__user__username', 'supervisor__user__username', 'status')
 	list_filter = ('status', 'date')
 	ordering = ('-date',)
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+	list_display = ('name', 'key', 'lat', 'lng', 'trip_count')
+	search_fields = ('key',)
+	ordering = ('-trip_count', 'key')
+
+@admin.register(HOSViolation)
+class HOSViolationAdmin(admin.ModelAdmin):
+	list_display = ('driver', 'date', 'rule', 'value', 'limit', 'detected_at')
+	search_fields = ('driver__user__username',)
+	list_filter = ('rule', 'date')
+	ordering = ('-date',)
+	raw_id_fields = ('log', 'driver')
+
+@admin.register(DutySegment)
+class DutySegmentAdmin(admin.ModelAdmin):
+	list_display = ('driver', 'date', 'start', 'end', 'hours', 'status')
+	search_fields = ('driver__user__username',)
+	list_filter = ('status', 'date')
+	ordering = ('-date',)
+	raw_id_fields = ('log', 'driver')
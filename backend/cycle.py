@@ -0,0 +1,177 @@
+"""
+Rolling 70-hour / 8-day cycle from the DriverDailyDuty rollup.
+
+Every ELD log write recomputes the rollup rows of the (driver, day) pairs it touched from all logs of
+those days. Cycle hours are then the on-duty hours of the last 8 days, read from at most 8 rows per
+driver: no logEntries are decoded at query time.
+
+A 34-hour restart (34 consecutive off-duty hours, Off Duty or Sleeper Berth) resets the cycle. Off-duty
+hours before the first and after the last on-duty segment of each day are stored, so a restart spanning
+midnight, or whole days off, is found by walking the 8 rows. Days without any log count as off duty.
+
+Driver.cycleUsed is refreshed from the rollup whenever that driver's logs change; the hours-available
+query computes the live value.
+"""
+import math
+from collections import defaultdict
+from datetime import date as date_cls, timedelta
+
+from django.db import transaction
+
+from .hos import CYCLE_LIMIT_HOURS, day_totals, evaluate_logs
+from .models import Driver, DriverDailyDuty, ELDLog
+
+CYCLE_DAYS = 8
+RESTART_HOURS = 34
+ROLLUP_FIELDS = ('onDutyHours', 'drivingHours', 'offDutyBefore', 'offDutyAfter')
+OFF_DAY = (0.0, 24.0, 24.0)
+
+
+def cycle_hours(days) -> float:
+    """
+    On-duty hours counting toward the cycle for consecutive days, oldest first, each (on-duty hours,
+    off-duty before, off-duty after) or None for a day without logs. Hours before a restart drop out.
+    """
+    used = 0.0
+    off_run = 0.0
+    for day in days:
+        on_duty, off_before, off_after = day or OFF_DAY
+        if on_duty <= 0 and off_before >= 24:
+            off_run += 24
+            continue
+        if off_run + off_before >= RESTART_HOURS:
+            used = 0.0
+        used += on_duty
+        off_run = off_after
+    return 0.0 if off_run >= RESTART_HOURS else used
+
+
+def _window_days(rows: dict, driver_id, last_day, count=CYCLE_DAYS):
+    first = last_day - timedelta(days=count - 1)
+    return [rows.get((driver_id, first + timedelta(days=i))) for i in range(count)]
+
+
+def _rollup_rows(driver_ids, first_day, last_day) -> dict:
+    """{(driver_id, date): (on, off before, off after)} for a date range; one scan of the (date, driver) index."""
+    qs = DriverDailyDuty.objects.filter(date__gte=first_day, date__lte=last_day)
+    if driver_ids is not None:
+        qs = qs.filter(driver_id__in=driver_ids)
+    return {
+        (driver_id, day): (on_duty, before, after)
+        for driver_id, day, on_duty, before, after in qs.values_list(
+            'driver_id', 'date', 'onDutyHours', 'offDutyBefore', 'offDutyAfter'
+        ).order_by()
+    }
+
+
+def cycle_used_by_driver(driver_ids=None, today=None) -> dict:
+    """{driver_id: cycle hours used as of today} for the drivers with rollup rows in the window (or all of them)."""
+    today = today or date_cls.today()
+    rows = _rollup_rows(driver_ids, today - timedelta(days=CYCLE_DAYS - 1), today)
+    drivers = {driver_id for driver_id, _ in rows}
+    return {driver_id: round(cycle_hours(_window_days(rows, driver_id, today)), 2) for driver_id in drivers}
+
+
+def fleet_hours_available(drivers, today=None) -> list:
+    """
+    [{'driver', 'username', 'cycleHours', 'available'}] for a Driver queryset, fewest available hours first.
+    The rollup window is read in one query over the (date, driver) index, restricted to those drivers.
+    """
+    used = cycle_used_by_driver(drivers.values('id'), today=today)
+    result = [
+        {
+            'driver': driver_id,
+            'username': username,
+            'cycleHours': used.get(driver_id, 0.0),
+            'available': round(max(0.0, CYCLE_LIMIT_HOURS - used.get(driver_id, 0.0)), 2),
+        }
+        for driver_id, username in drivers.values_list('id', 'user__username').order_by()
+    ]
+    result.sort(key=lambda row: (row['available'], row['username']))
+    return result
+
+
+def prior_cycle_hours(logs) -> dict:
+    """
+    {log id: cycle hours used in the 7 days before the log's day}, with a restart completed by the start
+    of that day counted. One rollup query for the whole batch.
+    """
+    logs = [log for log in logs if log.date is not None]
+    if not logs:
+        return {}
+    rows = _rollup_rows(
+        {log.driver_id for log in logs}, min(log.date for log in logs) - timedelta(days=CYCLE_DAYS - 1),
+        max(log.date for log in logs),
+    )
+    prior = {}
+    for log in logs:
+        days = _window_days(rows, log.driver_id, log.date)
+        same_day = days[-1]
+        # Only the off-duty lead-in of the log's own day counts toward a restart
+        days[-1] = (0.0, same_day[1], 0.0) if same_day else (0.0, 24.0, 0.0)
+        prior[log.id] = round(cycle_hours(days), 2)
+    return prior
+
+
+def log_hos(logs) -> dict:
+    """{log id: HOS result} with each log's cycle check using the hours of the 7 days before it."""
+    return evaluate_logs(logs, prior_cycle_hours(logs))
+
+
+def record_duty_days(pairs) -> None:
+    """
+    Recompute the rollup rows of (driver_id, date) pairs from all their ELD logs (one read, one upsert),
+    drop rows of days left without logs, and refresh Driver.cycleUsed for the drivers involved.
+    Call inside the transaction writing the logs.
+    """
+    pairs = {(driver_id, day) for driver_id, day in pairs if day is not None}
+    if not pairs:
+        return
+    driver_ids = {driver_id for driver_id, _ in pairs}
+    entries = defaultdict(list)
+    logs = ELDLog.objects.filter(driver_id__in=driver_ids, date__in={day for _, day in pairs}).order_by()
+    for driver_id, day, log_entries in logs.values_list('driver_id', 'date', 'logEntries'):
+        if (driver_id, day) in pairs and isinstance(log_entries, list):
+            entries[(driver_id, day)].extend(log_entries)
+
+    keys = list(entries)
+    totals = day_totals([entries[key] for key in keys]) if keys else {}
+    rows = [
+        DriverDailyDuty(driver_id=driver_id, date=day, **{field: float(totals[field][i]) for field in ROLLUP_FIELDS})
+        for i, (driver_id, day) in enumerate(keys)
+    ]
+    with transaction.atomic():
+        emptied = pairs - set(keys)
+        for driver_id, day in emptied:
+            DriverDailyDuty.objects.filter(driver_id=driver_id, date=day).delete()
+        DriverDailyDuty.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['driver', 'date'], update_fields=list(ROLLUP_FIELDS),
+        )
+        refresh_cycle_used(driver_ids)
+
+
+def refresh_cycle_used(driver_ids) -> None:
+    """Store the current rolling cycle hours (rounded up to whole hours) on Driver.cycleUsed."""
+    used = cycle_used_by_driver(driver_ids)
+    drivers = list(Driver.objects.filter(pk__in=driver_ids).only('id', 'cycleUsed'))
+    for driver in drivers:
+        driver.cycleUsed = math.ceil(used.get(driver.id, 0.0))
+    Driver.objects.bulk_update(drivers, ['cycleUsed'])
+
+
+def rebuild_duty_rollup(since=None, batch_size: int = 1000) -> int:
+    """Recompute DriverDailyDuty from ELDLog (optionally only from `since` on). Returns rows written."""
+    logs = ELDLog.objects.all()
+    rollup = DriverDailyDuty.objects.all()
+    if since is not None:
+        logs = logs.filter(date__gte=since)
+        rollup = rollup.filter(date__gte=since)
+    written = 0
+    with transaction.atomic():
+        rollup.delete()
+        pairs = list(logs.values_list('driver_id', 'date').distinct().order_by('driver_id', 'date'))
+        for offset in range(0, len(pairs), batch_size):
+            batch = pairs[offset:offset + batch_size]
+            record_duty_days(batch)
+            written += len(batch)
+    return written
@@ -0,0 +1,131 @@
+"""
+ELD log submission: validation of duty segments and the multi-day bulk backfill.
+
+A log records one day as [{start, end, status}] segments, start/end in hours from midnight (0-24).
+Devices that were offline upload their missed days in one /eldlogs/bulk-submit/ call: every item is
+validated before anything is written, drivers and trips are resolved with one query each, and the
+valid logs are inserted with a single bulk_create.
+"""
+from datetime import date as date_cls
+
+from .models import Driver, DutySegment, ELDLog, Trip
+
+# Indexed by the DutySegment status codes
+DUTY_STATUSES = tuple(name for _, name in DutySegment.STATUS_CHOICES)
+HOURS_PER_DAY = 24
+
+
+def _hour(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError
+    hour = float(value)
+    if not 0 <= hour <= HOURS_PER_DAY:
+        raise ValueError
+    return int(hour) if hour.is_integer() else hour
+
+
+def parse_log_entries(entries):
+    """
+    Validate one day's duty segments. Returns (segments sorted by start, None) or (None, error message).
+    Segments need a known status and 0 <= start < end <= 24, and may not overlap.
+    """
+    if not isinstance(entries, list):
+        return None, 'logEntries must be a list'
+    segments = []
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            return None, f'logEntries[{i}] must be an object'
+        if entry.get('status') not in DUTY_STATUSES:
+            return None, f"logEntries[{i}].status must be one of {', '.join(DUTY_STATUSES)}"
+        try:
+            start, end = _hour(entry.get('start')), _hour(entry.get('end'))
+        except ValueError:
+            return None, f'logEntries[{i}]: start and end must be hours between 0 and {HOURS_PER_DAY}'
+        if end <= start:
+            return None, f'logEntries[{i}]: end must be after start'
+        segments.append({**entry, 'start': start, 'end': end})
+    segments.sort(key=lambda s: s['start'])
+    for prev, seg in zip(segments, segments[1:]):
+        if seg['start'] < prev['end']:
+            return None, f"logEntries overlap at hour {seg['start']}"
+    return segments, None
+
+
+def parse_log_date(value):
+    """(date, None) for a YYYY-MM-DD string (today when missing), or (None, error message); future days are refused."""
+    if value in (None, ''):
+        return date_cls.today(), None
+    try:
+        day = date_cls.fromisoformat(str(value))
+    except ValueError:
+        return None, 'date must be YYYY-MM-DD'
+    if day > date_cls.today():
+        return None, 'date cannot be in the future'
+    return day, None
+
+
+def parse_eldlog_item(data):
+    """Normalize one backfilled log (username, date, logEntries, optional tripId). Returns (fields, error)."""
+    if not isinstance(data, dict):
+        return None, 'each log must be an object'
+    username = data.get('username')
+    if not username:
+        return None, 'username is required'
+    day, error = parse_log_date(data.get('date'))
+    if error:
+        return None, error
+    segments, error = parse_log_entries(data.get('logEntries', []))
+    if error:
+        return None, error
+    trip_id = data.get('tripId') or data.get('trip_id')
+    if trip_id is not None and (isinstance(trip_id, bool) or not str(trip_id).isdigit()):
+        return None, 'tripId must be a trip id'
+    return {
+        'username': username,
+        'date': day,
+        'logEntries': segments,
+        'trip_id': int(trip_id) if trip_id is not None else None,
+    }, None
+
+
+def bulk_create_eldlogs(items):
+    """
+    Validate and insert many dated logs for many drivers.
+    Returns (created, errors) where created is [(index, ELDLog)] and errors is [{'index': i, 'detail': ...}].
+    A trip must belong to the log's driver; one log per driver and day is accepted per request.
+    Invalid items are skipped; the valid ones are inserted with a single bulk_create. Call inside a transaction.
+    """
+    parsed = []
+    errors = []
+    for idx, data in enumerate(items):
+        fields, error = parse_eldlog_item(data)
+        if error:
+            errors.append({'index': idx, 'detail': error})
+        else:
+            parsed.append((idx, fields))
+
+    usernames = {fields['username'] for _, fields in parsed}
+    drivers = {d.user.username: d for d in Driver.objects.select_related('user').filter(user__username__in=usernames)}
+    trip_ids = {fields['trip_id'] for _, fields in parsed if fields['trip_id'] is not None}
+    trip_drivers = dict(Trip.objects.filter(pk__in=trip_ids).values_list('id', 'driver_id'))
+
+    pending = []
+    seen_days = set()
+    for idx, fields in parsed:
+        driver = drivers.get(fields['username'])
+        if driver is None:
+            errors.append({'index': idx, 'detail': 'Driver not found'})
+            continue
+        trip_id = fields['trip_id']
+        if trip_id is not None and trip_drivers.get(trip_id) != driver.pk:
+            errors.append({'index': idx, 'detail': 'Trip not found for this driver'})
+            continue
+        if (driver.pk, fields['date']) in seen_days:
+            errors.append({'index': idx, 'detail': f"Duplicate log for {fields['username']} on {fields['date'].isoformat()}"})
+            continue
+        seen_days.add((driver.pk, fields['date']))
+        pending.append((idx, ELDLog(driver=driver, date=fields['date'], logEntries=fields['logEntries'], trip_id=trip_id)))
+
+    created = list(zip([idx for idx, _ in pending], ELDLog.objects.bulk_create([log for _, log in pending])))
+    errors.sort(key=lambda e: e['index'])
+    return created, errors
@@ -0,0 +1,88 @@
+"""
+Streaming exports for payroll/audit consumers.
+
+Rows are read with values_list(...).iterator(chunk_size=...) so neither the queryset cache nor
+model instances are built, and are written out incrementally through StreamingHttpResponse.
+Memory use depends on the chunk size only, not on how many rows match.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+# Lines are grouped before being handed to the WSGI server to avoid one write per row
+LINES_PER_WRITE = 500
+
+TRIP_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('driver', 'driver__user__username'),
+    ('date', 'date'),
+    ('start', 'start'),
+    ('end', 'end'),
+    ('stops', 'stops'),
+    ('mileage', 'mileage'),
+    ('reportedMileage', 'reportedMileage'),
+    ('routeMileage', 'routeMileage'),
+    ('cycleUsed', 'cycleUsed'),
+    ('status', 'status'),
+]
+
+ELDLOG_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('driver', 'driver__user__username'),
+    ('date', 'date'),
+    ('status', 'status'),
+    ('trip', 'trip_id'),
+    ('logEntries', 'logEntries'),
+]
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def _ndjson_lines(names, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def _csv_lines(names, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        # JSON columns (stops, logEntries) are embedded as JSON text in a single cell
+        yield writer.writerow([
+            json.dumps(value, cls=DjangoJSONEncoder) if isinstance(value, (list, dict)) else value
+            for value in row
+        ])
+
+
+def _batched(lines):
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= LINES_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_export(queryset, columns, output: str, filename: str) -> StreamingHttpResponse:
+    """Stream `queryset` as NDJSON or CSV using the (name, lookup) pairs in `columns`."""
+    names = [name for name, _ in columns]
+    rows = queryset.values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    lines = _csv_lines(names, rows) if output == 'csv' else _ndjson_lines(names, rows)
+    response = StreamingHttpResponse(_batched(lines), content_type=EXPORT_FORMATS[output])
+    extension = 'csv' if output == 'csv' else 'ndjson'
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
@@ -0,0 +1,58 @@
+"""
+Content-addressed route geometry store.
+
+Drivers run the same lanes over and over, so a trip references a shared RouteGeometry row instead
+of carrying its own copy of the polyline. Rows are keyed by the sha256 of the normalized encoded
+polyline (precision 5, so coordinates are already quantized to 1e-5 degrees) and hold the zoom
+variants, computed once per lane. Readers render each shared geometry once per response
+(see serializers.render_trip_polyline) and spatial checks decode it once per query.
+
+Trips no longer referencing a geometry leave it behind; `manage.py prune_route_geometry` removes those.
+"""
+import hashlib
+
+from .models import RouteGeometry
+from .polyline import simplified_variants
+
+
+def geometry_digest(encoded: str) -> str:
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def store_geometries(encoded_values) -> dict:
+    """
+    {encoded: RouteGeometry} for the given polylines, inserting the ones not stored yet.
+    One lookup and at most one insert for the whole batch; concurrent inserts of the same lane are ignored.
+    """
+    by_digest = {geometry_digest(value): value for value in set(encoded_values) if value}
+    if not by_digest:
+        return {}
+    found = {g.digest: g for g in RouteGeometry.objects.filter(digest__in=list(by_digest))}
+    missing = [
+        RouteGeometry(digest=digest, polyline=value, polyline_variants=simplified_variants(value))
+        for digest, value in by_digest.items() if digest not in found
+    ]
+    if missing:
+        RouteGeometry.objects.bulk_create(missing, ignore_conflicts=True)
+        found.update((g.digest, g) for g in RouteGeometry.objects.filter(digest__in=[g.digest for g in missing]))
+    return {value: found[digest] for digest, value in by_digest.items()}
+
+
+def store_geometry(encoded):
+    """Shared RouteGeometry for one polyline, or None without geometry."""
+    return store_geometries([encoded]).get(encoded) if encoded else None
+
+
+def attach_geometries(items: list) -> list:
+    """Swap the 'polyline' of each trip field dict (see spatial.trip_geometry_fields) for its shared 'geometry'."""
+    stored = store_geometries(item['polyline'] for item in items if 'polyline' in item)
+    for item in items:
+        if 'polyline' in item:
+            item['geometry'] = stored.get(item.pop('polyline'))
+    return items
+
+
+def prune_route_geometry() -> int:
+    """Delete geometries no trip references; returns rows deleted."""
+    deleted, _ = RouteGeometry.objects.filter(trips__isnull=True).delete()
+    return deleted
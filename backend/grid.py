@@ -0,0 +1,286 @@
+"""
+Server-rendered ELD daily grid (the 24-hour duty graph of a log) as SVG or PNG.
+
+A day's grid depends only on its logEntries, so renderings are cached under the entries digest
+(hos.entries_digest): identical days of any driver share one cache entry, and an edited log gets a
+new key. The digest also makes the strong ETag of /eldlogs/{id}/grid.svg|png.
+
+Every cached rendering is a building block for the multi-day report as well:
+- SVG: the day's <g> markup.
+- PNG: the zlib-compressed scanlines. That is the IDAT payload of a one-day PNG, so serving one
+  log needs no compression. A report decompresses each day's block and compresses the stacked
+  image once.
+PNG is encoded here with zlib (palette image, no filters), without an imaging library. Its labels
+use a small built-in bitmap font.
+"""
+import hashlib
+import struct
+import zlib
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .eldlogs import DUTY_STATUSES, HOURS_PER_DAY
+from .hos import entries_digest
+from .segments import segment_fields
+
+# Bump when the drawing changes so cached renderings (and ETags) are not reused
+GRID_VERSION = 1
+GRID_CACHE_KEY = 'eldgrid:v{version}:{fmt}:{digest}'
+GRID_CACHE_TTL = 7 * 24 * 3600
+GRID_FORMATS = ('svg', 'png')
+
+LABEL_WIDTH = 40
+HOUR_WIDTH = 20
+TOTAL_WIDTH = 50
+HEADER_HEIGHT = 16
+ROW_HEIGHT = 20
+GRID_WIDTH = LABEL_WIDTH + HOURS_PER_DAY * HOUR_WIDTH + TOTAL_WIDTH
+GRID_HEIGHT = HEADER_HEIGHT + len(DUTY_STATUSES) * ROW_HEIGHT
+# Date line above each day of a report
+BAND_HEIGHT = 18
+ROW_LABELS = ('OFF', 'SB', 'D', 'ON')
+
+# PNG palette indexes and their colors (shared with the SVG)
+WHITE, LIGHT, DARK, LINE, TEXT = range(5)
+COLORS = ('#ffffff', '#d0d7de', '#6e7781', '#1976d2', '#24292f')
+
+# 3x5 bitmap glyphs for PNG labels: one 3-bit row mask per line, top to bottom
+GLYPHS = {
+    '0': (7, 5, 5, 5, 7), '1': (2, 6, 2, 2, 7), '2': (7, 1, 7, 4, 7), '3': (7, 1, 7, 1, 7),
+    '4': (5, 5, 7, 1, 1), '5': (7, 4, 7, 1, 7), '6': (7, 4, 7, 5, 7), '7': (7, 1, 1, 1, 1),
+    '8': (7, 5, 7, 5, 7), '9': (7, 5, 7, 1, 7), '-': (0, 0, 7, 0, 0), '.': (0, 0, 0, 0, 2),
+    'O': (2, 5, 5, 5, 2), 'F': (7, 4, 6, 4, 4), 'S': (3, 4, 2, 1, 6), 'B': (6, 5, 6, 5, 6),
+    'D': (6, 5, 5, 5, 6), 'N': (5, 7, 7, 5, 5), 'h': (4, 4, 6, 5, 5), ' ': (0, 0, 0, 0, 0),
+}
+
+
+def _x(hour) -> int:
+    return LABEL_WIDTH + round(hour * HOUR_WIDTH)
+
+
+def _row_y(status: int) -> int:
+    return HEADER_HEIGHT + status * ROW_HEIGHT + ROW_HEIGHT // 2
+
+
+def _hours(value) -> str:
+    return f'{round(value, 2):g}'
+
+
+def _day(entries):
+    """(segments, hours per status) of one log, from the same cleaned segments as DutySegment rows."""
+    segments = segment_fields(entries)
+    totals = [0.0] * len(DUTY_STATUSES)
+    for seg in segments:
+        totals[seg['status']] += seg['hours']
+    return segments, totals
+
+
+def _duty_path(segments) -> list:
+    """[(x0, y0, x1, y1)] line pieces: one horizontal per segment, a vertical where consecutive segments meet."""
+    pieces = []
+    prev = None
+    for seg in segments:
+        y = _row_y(seg['status'])
+        if prev is not None and prev['end'] == seg['start'] and prev['status'] != seg['status']:
+            pieces.append((_x(seg['start']), _row_y(prev['status']), _x(seg['start']), y))
+        pieces.append((_x(seg['start']), y, _x(seg['end']), y))
+        prev = seg
+    return pieces
+
+
+# SVG
+
+def _svg_day(entries) -> str:
+    segments, totals = _day(entries)
+    right = _x(HOURS_PER_DAY)
+    bottom = HEADER_HEIGHT + len(DUTY_STATUSES) * ROW_HEIGHT
+    parts = [f'<rect width="{GRID_WIDTH}" height="{GRID_HEIGHT}" fill="{COLORS[WHITE]}"/>']
+    for hour in range(HOURS_PER_DAY + 1):
+        color = COLORS[DARK] if hour % 12 == 0 else COLORS[LIGHT]
+        parts.append(f'<line x1="{_x(hour)}" y1="{HEADER_HEIGHT}" x2="{_x(hour)}" y2="{bottom}" stroke="{color}"/>')
+        if hour < HOURS_PER_DAY:
+            parts.append(f'<text x="{_x(hour)}" y="{HEADER_HEIGHT - 4}" font-size="9" text-anchor="middle">{hour}</text>')
+    for row, label in enumerate(ROW_LABELS):
+        top = HEADER_HEIGHT + row * ROW_HEIGHT
+        parts.append(f'<text x="4" y="{top + 14}" font-size="11">{label}</text>')
+        parts.append(f'<text x="{right + 6}" y="{top + 14}" font-size="11">{_hours(totals[row])}h</text>')
+    for row in range(len(DUTY_STATUSES) + 1):
+        y = HEADER_HEIGHT + row * ROW_HEIGHT
+        parts.append(f'<line x1="{LABEL_WIDTH}" y1="{y}" x2="{right}" y2="{y}" stroke="{COLORS[DARK]}"/>')
+    if segments:
+        path = ''.join(f'M{x0} {y0}L{x1} {y1}' for x0, y0, x1, y1 in _duty_path(segments))
+        parts.append(f'<path d="{path}" stroke="{COLORS[LINE]}" stroke-width="3" fill="none"/>')
+    return f'<g font-family="sans-serif" fill="{COLORS[TEXT]}">{"".join(parts)}</g>'
+
+
+def _svg_document(height: int, body: str) -> str:
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{GRID_WIDTH}" height="{height}" '
+        f'viewBox="0 0 {GRID_WIDTH} {height}">{body}</svg>'
+    )
+
+
+# PNG
+
+class _Canvas:
+    """Palette-indexed pixels, one byte each, drawn with axis-aligned rectangles and bitmap text."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(width * height)
+
+    def rect(self, x0, y0, x1, y1, color: int) -> None:
+        x0, x1 = max(0, min(x0, x1)), min(self.width, max(x0, x1))
+        y0, y1 = max(0, min(y0, y1)), min(self.height, max(y0, y1))
+        if x0 >= x1:
+            return
+        run = bytes([color]) * (x1 - x0)
+        for y in range(y0, y1):
+            offset = y * self.width
+            self.pixels[offset + x0:offset + x1] = run
+
+    def text(self, x, y, value: str, color: int = TEXT, scale: int = 1) -> None:
+        for char in value:
+            for row, mask in enumerate(GLYPHS.get(char, GLYPHS[' '])):
+                for col in range(3):
+                    if mask & (4 >> col):
+                        self.rect(x + col * scale, y + row * scale, x + (col + 1) * scale, y + (row + 1) * scale, color)
+            x += 4 * scale
+
+    def scanlines(self) -> bytes:
+        """Rows with PNG filter type 0 (none) prepended, ready for zlib."""
+        width = self.width
+        return b''.join(b'\x00' + self.pixels[y * width:(y + 1) * width] for y in range(self.height))
+
+
+def _text_width(value: str, scale: int) -> int:
+    return len(value) * 4 * scale - scale
+
+
+def _png_day(entries) -> bytes:
+    """Compressed scanlines (IDAT payload) of one day's grid."""
+    segments, totals = _day(entries)
+    canvas = _Canvas(GRID_WIDTH, GRID_HEIGHT)
+    right = _x(HOURS_PER_DAY)
+    bottom = HEADER_HEIGHT + len(DUTY_STATUSES) * ROW_HEIGHT
+    for hour in range(HOURS_PER_DAY + 1):
+        canvas.rect(_x(hour), HEADER_HEIGHT, _x(hour) + 1, bottom, DARK if hour % 12 == 0 else LIGHT)
+        if hour < HOURS_PER_DAY:
+            label = str(hour)
+            canvas.text(_x(hour) - _text_width(label, 1) // 2, HEADER_HEIGHT - 8, label)
+    for row, label in enumerate(ROW_LABELS):
+        top = HEADER_HEIGHT + row * ROW_HEIGHT
+        canvas.text(4, top + 5, label, scale=2)
+        total = f'{_hours(totals[row])}h'
+        canvas.text(right + 6, top + 5, total, scale=2 if _text_width(total, 2) <= TOTAL_WIDTH - 6 else 1)
+    for row in range(len(DUTY_STATUSES) + 1):
+        y = HEADER_HEIGHT + row * ROW_HEIGHT
+        canvas.rect(LABEL_WIDTH, y, right + 1, y + 1, DARK)
+    for x0, y0, x1, y1 in _duty_path(segments):
+        canvas.rect(min(x0, x1) - 1, min(y0, y1) - 1, max(x0, x1) + 2, max(y0, y1) + 2, LINE)
+    return zlib.compress(canvas.scanlines(), 9)
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def _png_document(height: int, idat: bytes) -> bytes:
+    palette = b''.join(bytes.fromhex(color[1:]) for color in COLORS)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', GRID_WIDTH, height, 8, 3, 0, 0, 0)),
+        _png_chunk(b'PLTE', palette),
+        _png_chunk(b'IDAT', idat),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+# Cached renderings
+
+RENDER_DAY = {'svg': _svg_day, 'png': _png_day}
+
+
+def grid_parts(entries_per_log, fmt: str, digests=None) -> list:
+    """
+    Per-day rendering blocks (see module docstring) for many logs' entries, from one cache read.
+    Only days missing from the cache are drawn, each distinct day once, and stored back in one call.
+    """
+    digests = digests or [entries_digest(entries) for entries in entries_per_log]
+    keys = {digest: GRID_CACHE_KEY.format(version=GRID_VERSION, fmt=fmt, digest=digest) for digest in digests}
+    cached = cache.get_many(list(keys.values()))
+    parts = {digest: cached[key] for digest, key in keys.items() if key in cached}
+    fresh = {}
+    for digest, entries in zip(digests, entries_per_log):
+        if digest not in parts:
+            parts[digest] = fresh[keys[digest]] = RENDER_DAY[fmt](entries)
+    if fresh:
+        cache.set_many(fresh, timeout=GRID_CACHE_TTL)
+    return [parts[digest] for digest in digests]
+
+
+def grid_etag(digest: str, fmt: str) -> str:
+    """Strong ETag of one log's grid: the rendering changes exactly when its entries digest (or GRID_VERSION) does."""
+    return f'"{digest[:32]}-{fmt}-v{GRID_VERSION}"'
+
+
+def report_etag(labels, digests, fmt: str) -> str:
+    """Strong ETag of a report: its day labels and entries digests, in order."""
+    body = '|'.join(f'{label}:{digest}' for label, digest in zip(labels, digests))
+    return f'"r{hashlib.sha1(body.encode("utf-8")).hexdigest()[:32]}-{fmt}-v{GRID_VERSION}"'
+
+
+def render_grid(entries, fmt: str, digest=None):
+    """The full SVG (str) or PNG (bytes) document of one log's grid."""
+    part = grid_parts([entries], fmt, [digest] if digest else None)[0]
+    if fmt == 'svg':
+        return _svg_document(GRID_HEIGHT, part)
+    return _png_document(GRID_HEIGHT, part)
+
+
+def render_report(days, fmt: str, digests=None):
+    """
+    One document with the grids of many logs stacked in order, each below a date line.
+    `days` is [(label, entries)]; the day grids come from grid_parts, so a report of cached days only
+    assembles them.
+    """
+    parts = grid_parts([entries for _, entries in days], fmt, digests)
+    height = len(days) * (BAND_HEIGHT + GRID_HEIGHT)
+    if fmt == 'svg':
+        body = ''.join(
+            f'<g transform="translate(0 {i * (BAND_HEIGHT + GRID_HEIGHT)})">'
+            f'<text x="4" y="13" font-family="sans-serif" font-size="12" font-weight="bold">{escape(label)}</text>'
+            f'<g transform="translate(0 {BAND_HEIGHT})">{part}</g></g>'
+            for i, ((label, _), part) in enumerate(zip(days, parts))
+        )
+        return _svg_document(height, f'<rect width="{GRID_WIDTH}" height="{height}" fill="{COLORS[WHITE]}"/>{body}')
+    chunks = []
+    for (label, _), part in zip(days, parts):
+        band = _Canvas(GRID_WIDTH, BAND_HEIGHT)
+        # The bitmap font only has digits and a few letters; the date leads every label
+        band.text(4, 4, label.split(' ')[0], scale=2)
+        chunks.append(band.scanlines())
+        chunks.append(zlib.decompress(part))
+    return _png_document(height, zlib.compress(b''.join(chunks), 6))
+
+
+class SVGRenderer(BaseRenderer):
+    media_type = 'image/svg+xml'
+    format = 'svg'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (str, bytes)):
+            return data
+        # Errors (404, 400) keep their JSON body
+        renderer_context['response']['Content-Type'] = 'application/json'
+        return JSONRenderer().render(data)
+
+
+class PNGRenderer(SVGRenderer):
+    media_type = 'image/png'
+    format = 'png'
+    charset = None
@@ -0,0 +1,181 @@
+"""
+Hours-of-service (HOS) checks for ELD logs, evaluated in batches with numpy.
+
+The same checks the log screen shows (frontend computeHosMetrics), per log day:
+- driving: total Driving hours <= 11
+- window: first to last on-duty (Driving or On Duty) hour <= 14
+- break: consecutive Driving segments (no other segment in between) <= 8 hours
+- cycle: hours already used in the cycle plus the day's on-duty hours <= 70
+
+Every segment of every log in a batch goes into flat arrays (log index, start, end, status code) and
+the per-log totals come out of bincount / ufunc.at reductions, so thousands of logs cost a handful of
+array passes rather than a Python loop per segment. Results are cached per log under a digest of its
+entries and the cycle hours before its day, so a log is re-evaluated only after its segments (or earlier
+days of its cycle) change.
+"""
+import hashlib
+import json
+
+import numpy as np
+from django.core.cache import cache
+
+from .eldlogs import DUTY_STATUSES, HOURS_PER_DAY
+
+DRIVING_LIMIT_HOURS = 11
+DUTY_WINDOW_HOURS = 14
+BREAK_AFTER_DRIVING_HOURS = 8
+CYCLE_LIMIT_HOURS = 70
+
+OFF_DUTY, SLEEPER_BERTH, DRIVING, ON_DUTY = range(len(DUTY_STATUSES))
+STATUS_CODES = {name: code for code, name in enumerate(DUTY_STATUSES)}
+
+# Bump when the checks change so cached results are not reused
+HOS_ENGINE_VERSION = 2
+HOS_CACHE_KEY = 'hos:v{version}:{log_id}:{digest}:{cycle:g}'
+HOS_CACHE_TTL = 7 * 24 * 3600
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def segment_arrays(entries_per_log):
+    """
+    Flatten [[{start, end, status}, ...], ...] into (log index, start, end, status code) arrays ordered by
+    (log, start). Segments with unreadable hours are dropped; an unknown status counts as neither driving
+    nor on duty (code -1) but still ends a driving run, as in the UI.
+    """
+    rows = [
+        (i, _number(seg.get('start')), _number(seg.get('end')), STATUS_CODES.get(seg.get('status'), -1))
+        for i, entries in enumerate(entries_per_log)
+        for seg in (entries if isinstance(entries, list) else [])
+        if isinstance(seg, dict)
+    ]
+    if not rows:
+        empty = np.zeros(0)
+        return empty.astype(np.int64), empty, empty, empty.astype(np.int8)
+    table = np.array(rows, dtype=np.float64)
+    table = table[np.isfinite(table[:, 1]) & np.isfinite(table[:, 2])]
+    table = table[np.lexsort((table[:, 1], table[:, 0]))]
+    return table[:, 0].astype(np.int64), table[:, 1], table[:, 2], table[:, 3].astype(np.int8)
+
+
+def evaluate_segments(log_idx, start, end, status, n_logs: int, cycle_used=None) -> dict:
+    """Per-log HOS metrics (arrays of length n_logs) from the flat arrays of segment_arrays."""
+    duration = np.maximum(end - start, 0.0)
+    driving = status == DRIVING
+    on_duty = driving | (status == ON_DUTY)
+
+    total_driving = np.bincount(log_idx, weights=duration * driving, minlength=n_logs)
+    total_on_duty = np.bincount(log_idx, weights=duration * on_duty, minlength=n_logs)
+
+    first_on = np.full(n_logs, np.inf)
+    last_on = np.full(n_logs, -np.inf)
+    np.minimum.at(first_on, log_idx[on_duty], start[on_duty])
+    np.maximum.at(last_on, log_idx[on_duty], end[on_duty])
+    window = np.where(np.isfinite(first_on), np.maximum(last_on - first_on, 0.0), 0.0)
+
+    # A driving run ends at any non-driving segment or at the next log
+    breaks = ~driving
+    breaks[1:] |= log_idx[1:] != log_idx[:-1]
+    run_id = np.cumsum(breaks)
+    max_run = np.zeros(n_logs)
+    if driving.any():
+        run_hours = np.bincount(run_id[driving], weights=duration[driving])
+        run_log = np.zeros(len(run_hours), dtype=np.int64)
+        run_log[run_id[driving]] = log_idx[driving]
+        np.maximum.at(max_run, run_log, run_hours)
+
+    used = np.zeros(n_logs) if cycle_used is None else np.asarray(cycle_used, dtype=np.float64)
+    return {
+        'totalDriving': total_driving,
+        'totalOnDuty': total_on_duty,
+        'dutyWindow': window,
+        'maxContinuousDriving': max_run,
+        'cycleUsed': used,
+        'cycleTotal': used + total_on_duty,
+    }
+
+
+def day_totals(entries_per_day) -> dict:
+    """
+    Per-day arrays for the duty rollup: on-duty and driving hours, and the off-duty hours before the first
+    and after the last on-duty segment (24 / 24 for a day without on-duty time).
+    """
+    n_days = len(entries_per_day)
+    log_idx, start, end, status = segment_arrays(entries_per_day)
+    metrics = evaluate_segments(log_idx, start, end, status, n_logs=n_days)
+    on_duty = (status == DRIVING) | (status == ON_DUTY)
+    first_on = np.full(n_days, float(HOURS_PER_DAY))
+    last_on = np.zeros(n_days)
+    np.minimum.at(first_on, log_idx[on_duty], np.clip(start[on_duty], 0, HOURS_PER_DAY))
+    np.maximum.at(last_on, log_idx[on_duty], np.clip(end[on_duty], 0, HOURS_PER_DAY))
+    worked = metrics['totalOnDuty'] > 0
+    return {
+        'onDutyHours': metrics['totalOnDuty'],
+        'drivingHours': metrics['totalDriving'],
+        'offDutyBefore': np.where(worked, first_on, HOURS_PER_DAY),
+        'offDutyAfter': np.where(worked, HOURS_PER_DAY - last_on, HOURS_PER_DAY),
+    }
+
+
+def _violations(metrics: dict) -> dict:
+    return {
+        'driving': metrics['totalDriving'] > DRIVING_LIMIT_HOURS,
+        'window': metrics['dutyWindow'] > DUTY_WINDOW_HOURS,
+        'break': metrics['maxContinuousDriving'] > BREAK_AFTER_DRIVING_HOURS,
+        'cycle': metrics['cycleTotal'] > CYCLE_LIMIT_HOURS,
+    }
+
+
+def evaluate_entries(entries_per_log, cycle_used=None) -> list:
+    """
+    HOS results for many logs' entries, in one vectorized pass: per log the metrics of evaluate_segments
+    (hours, rounded to 2 decimals) and 'violations', the names of the failed checks.
+    """
+    n_logs = len(entries_per_log)
+    if not n_logs:
+        return []
+    metrics = evaluate_segments(*segment_arrays(entries_per_log), n_logs=n_logs, cycle_used=cycle_used)
+    flags = _violations(metrics)
+    return [
+        {
+            **{name: round(float(values[i]), 2) for name, values in metrics.items()},
+            'violations': [name for name, flagged in flags.items() if flagged[i]],
+        }
+        for i in range(n_logs)
+    ]
+
+
+def entries_digest(entries) -> str:
+    body = json.dumps(entries, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(body.encode('utf-8')).hexdigest()
+
+
+def evaluate_logs(logs, cycle_used=None) -> dict:
+    """
+    {log id: HOS result} for ELDLog rows, served from the cache where the log is unchanged.
+    cycle_used is {log id: cycle hours used before the log's day} (see cycle.log_hos); missing ids count 0.
+    Only logs missing from the cache are evaluated, all together, and stored back in one call.
+    """
+    cycle_used = cycle_used or {}
+    keys = {
+        log.id: HOS_CACHE_KEY.format(
+            version=HOS_ENGINE_VERSION, log_id=log.id, digest=entries_digest(log.logEntries), cycle=cycle_used.get(log.id, 0),
+        )
+        for log in logs
+    }
+    cached = cache.get_many(list(keys.values()))
+    results = {log_id: cached[key] for log_id, key in keys.items() if key in cached}
+    missing = [log for log in logs if log.id not in results]
+    if missing:
+        fresh = dict(zip(
+            [log.id for log in missing],
+            evaluate_entries([log.logEntries for log in missing], cycle_used=[cycle_used.get(log.id, 0) for log in missing]),
+        ))
+        cache.set_many({keys[log_id]: result for log_id, result in fresh.items()}, timeout=HOS_CACHE_TTL)
+        results.update(fresh)
+    return results
@@ -0,0 +1,137 @@
+"""
+Idempotency-Key support for submit endpoints.
+
+A client retrying a submit sends the same Idempotency-Key header. The first request claims the key
+(a unique IdempotencyKey row) and stores its response once it succeeds; retries get that response
+back with `Idempotent-Replayed: true` instead of creating another row and bumping driver totals again.
+Stored responses are also cached, so a replay is normally answered without a database query.
+
+- Same key, different body: 422. Same key while the first request is still running: 409.
+- Only successful (2xx) responses are kept; on errors the claim is released so the client can retry.
+- Keys expire after settings.IDEMPOTENCY_KEY_TTL; `manage.py purge_idempotency_keys` deletes old rows.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# An unfinished claim older than this belongs to a request that died mid-flight and may be taken over
+CLAIM_TIMEOUT_SECONDS = 60
+CACHE_KEY = 'idempotency:{user}:{scope}:{key}'
+
+
+def _ttl() -> int:
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600)
+
+
+def _fingerprint(data) -> str:
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def _cache_key(user_id, scope, key) -> str:
+    # Header values are arbitrary text; hash them so they are safe in any cache backend
+    return CACHE_KEY.format(user=user_id, scope=scope, key=hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+
+def _replay(fingerprint, stored_fingerprint, status_code, body):
+    if stored_fingerprint != fingerprint:
+        return Response(
+            {'detail': f'{HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if status_code is None:
+        return Response(
+            {'detail': f'A request with this {HEADER} is still being processed'},
+            status=status.HTTP_409_CONFLICT,
+            headers={'Retry-After': '1'},
+        )
+    return Response(body, status=status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def _claim(user, scope, key, fingerprint):
+    """(IdempotencyKey we now own, None) or (None, response replaying/rejecting an existing claim)."""
+    now = timezone.now()
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, scope=scope, key=key, fingerprint=fingerprint, expires_at=now + timedelta(seconds=_ttl()),
+                )
+            return record, None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+            if existing is None:
+                # Released (failed request) or purged between our insert and read; claim again
+                continue
+            abandoned = existing.status_code is None and existing.created_at <= now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS)
+            if existing.expires_at <= now or abandoned:
+                existing.delete()
+                continue
+            return None, _replay(fingerprint, existing.fingerprint, existing.status_code, existing.response)
+    return None, _replay(fingerprint, fingerprint, None, None)
+
+
+def idempotent(scope: str):
+    """
+    Decorate a POST view method (below @action) to honour the Idempotency-Key header.
+    `scope` names the endpoint, so one key can be used once per endpoint and user.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'detail': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            fingerprint = _fingerprint(request.data)
+            cache_key = _cache_key(request.user.pk, scope, key)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return _replay(fingerprint, *cached)
+
+            record, replay = _claim(request.user, scope, key, fingerprint)
+            if replay is not None:
+                return replay
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except Exception:
+                record.delete()
+                raise
+            if not status.is_success(response.status_code):
+                record.delete()
+                return response
+            body = json.loads(json.dumps(response.data, cls=DjangoJSONEncoder))
+            IdempotencyKey.objects.filter(pk=record.pk).update(status_code=response.status_code, response=body)
+            cache.set(cache_key, (fingerprint, response.status_code, body), timeout=_ttl())
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired_keys(batch_size: int = 1000) -> int:
+    """Delete expired IdempotencyKey rows in batches (keeps each DELETE short). Returns rows deleted."""
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
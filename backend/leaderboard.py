@@ -0,0 +1,418 @@
+"""
+Leaderboard data access.
+
+Period boards (week/month) read the DriverDailyMileage rollup, which is bounded by
+drivers x days-in-period, rather than aggregating every Trip row on each request.
+Top-N and rank lookups are answered by the rank index in ranking.py, loaded from these
+SQL sources on first use and kept current on trip submit. Supervisor/office/terminal
+leaderboards are separate boards holding only the drivers in that scope.
+"""
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Driver, DriverDailyMileage, Trip
+from .ranking import get_rank_index
+
+
+def record_trip_mileage(driver_id: int, day, miles: int, trips: int = 1) -> None:
+    """Add a submitted trip to the daily rollup. Call inside the submit transaction."""
+    updated = DriverDailyMileage.objects.filter(driver_id=driver_id, date=day).update(
+        mileage=F('mileage') + miles, trips=F('trips') + trips
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            DriverDailyMileage.objects.create(driver_id=driver_id, date=day, mileage=miles, trips=trips)
+    except IntegrityError:
+        # A concurrent submit created the row first; fall back to incrementing it
+        DriverDailyMileage.objects.filter(driver_id=driver_id, date=day).update(
+            mileage=F('mileage') + miles, trips=F('trips') + trips
+        )
+
+
+def trip_rollup_entry(trip):
+    """(driver_id, date, miles) a trip contributes to the daily rollup."""
+    return trip.driver_id, trip.date, int(trip.mileage or 0)
+
+
+def record_trip_change(before=None, after=None) -> dict:
+    """
+    Apply a trip created (before=None), edited or deleted (after=None) through the CRUD API to the
+    daily rollup; before/after are trip_rollup_entry values. An edit moving the trip to another
+    driver or day takes it off the old row and adds it to the new one. Call inside the write transaction.
+    Returns {(driver_id, date): miles delta} for the rows whose miles changed.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    if before is not None:
+        row = deltas[before[:2]]
+        row[0] -= before[2]
+        row[1] -= 1
+    if after is not None:
+        row = deltas[after[:2]]
+        row[0] += after[2]
+        row[1] += 1
+    for (driver_id, day), (miles, trips) in deltas.items():
+        if miles or trips:
+            record_trip_mileage(driver_id, day, miles, trips)
+    return {key: miles for key, (miles, _) in deltas.items() if miles}
+
+
+def _period_totals(period_start):
+    return (
+        DriverDailyMileage.objects.filter(date__gte=period_start)
+        .values('driver')
+        .annotate(period_miles=Sum('mileage'))
+    )
+
+
+def period_rank(driver, period_start):
+    """(miles, rank) of `driver` since period_start."""
+    miles = (
+        DriverDailyMileage.objects.filter(driver=driver, date__gte=period_start)
+        .aggregate(total=Sum('mileage'))['total']
+    ) or 0
+    higher = _period_totals(period_start).filter(period_miles__gt=miles).count()
+    return int(miles), higher + 1
+
+
+def rebuild_daily_mileage(since=None) -> int:
+    """Recompute the rollup from Trip (optionally only from `since` on). Returns rows written."""
+    trips = Trip.objects.all()
+    rollup = DriverDailyMileage.objects.all()
+    if since is not None:
+        trips = trips.filter(date__gte=since)
+        rollup = rollup.filter(date__gte=since)
+    rows = (
+        DriverDailyMileage(driver_id=row['driver'], date=row['date'], mileage=row['miles'] or 0, trips=row['count'])
+        for row in trips.values('driver', 'date').annotate(miles=Sum('mileage'), count=Count('id')).order_by().iterator()
+    )
+    written = 0
+    with transaction.atomic():
+        rollup.delete()
+        batch = []
+        for obj in rows:
+            batch.append(obj)
+            if len(batch) >= 1000:
+                DriverDailyMileage.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            DriverDailyMileage.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+# --- Rank index (see ranking.py) ---
+
+PERIOD_DAYS = {'week': 7, 'month': 30}
+# Scoped boards rank drivers sharing a supervisor, office or terminal with each other
+SCOPE_FIELDS = {'supervisor': 'supervisor_id', 'office': 'office', 'terminal': 'terminal'}
+
+
+def period_start_for(period: str):
+    days = PERIOD_DAYS.get(period)
+    return timezone.now().date() - timedelta(days=days) if days else None
+
+
+def scope_suffix(scope=None) -> str:
+    """':<kind>:<value>' for a (kind, value) scope, '' for the whole fleet. Values are quoted for cache keys."""
+    if not scope:
+        return ''
+    kind, value = scope
+    return f':{kind}:{quote(str(value), safe="")}'
+
+
+def board_name(period: str, period_start, scope=None) -> str:
+    base = f'{period}:{period_start.isoformat()}' if period_start else 'all'
+    return base + scope_suffix(scope)
+
+
+def driver_scopes(driver) -> dict:
+    """{kind: value} for every scope the driver belongs to (blank office/terminal and no supervisor are skipped)."""
+    scopes = {}
+    for kind, field in SCOPE_FIELDS.items():
+        value = getattr(driver, field)
+        if value not in (None, ''):
+            scopes[kind] = value
+    return scopes
+
+
+def _scoped_drivers(scope=None):
+    drivers = Driver.objects.all()
+    if scope:
+        kind, value = scope
+        drivers = drivers.filter(**{SCOPE_FIELDS[kind]: value})
+    return drivers
+
+
+def sql_scores(period_start=None, scope=None) -> dict:
+    """{driver_id: miles} for every driver in scope, straight from SQL (Driver.mileage or the rollup)."""
+    drivers = _scoped_drivers(scope)
+    scores = dict.fromkeys(drivers.values_list('id', flat=True), 0)
+    if period_start is None:
+        scores.update(drivers.values_list('id', 'mileage'))
+    else:
+        totals = _period_totals(period_start)
+        if scope:
+            totals = totals.filter(driver__in=drivers)
+        scores.update((row['driver'], int(row['period_miles'] or 0)) for row in totals)
+    return {driver_id: int(miles or 0) for driver_id, miles in scores.items()}
+
+
+def ensure_board(period: str, period_start, scope=None) -> str:
+    """Name of the board for this period and scope, loading it from SQL first if it is not indexed yet."""
+    board = board_name(period, period_start, scope)
+    index = get_rank_index()
+    if not index.has(board):
+        index.load(board, sql_scores(period_start, scope))
+    return board
+
+
+def index_top(board: str, limit: int):
+    """[(driver, miles)] for the top `limit` entries of an indexed board."""
+    entries = get_rank_index().top(board, limit)
+    drivers = Driver.objects.select_related('user').in_bulk([driver_id for driver_id, _ in entries])
+    return [(drivers[driver_id], miles) for driver_id, miles in entries if driver_id in drivers]
+
+
+def _driver_miles(driver, period_start) -> int:
+    if period_start is None:
+        return int(driver.mileage or 0)
+    return int(
+        DriverDailyMileage.objects.filter(driver=driver, date__gte=period_start)
+        .aggregate(total=Sum('mileage'))['total'] or 0
+    )
+
+
+def index_rank(board: str, driver, period_start, scope=None):
+    """(miles, rank) of `driver` from the index; drivers missing from it are ranked in SQL and added."""
+    index = get_rank_index()
+    found = index.rank(board, driver.pk)
+    if found is not None:
+        return found
+    if period_start is None:
+        miles = int(driver.mileage or 0)
+        result = miles, _scoped_drivers(scope).filter(mileage__gt=miles).count() + 1
+    elif scope is None:
+        result = period_rank(driver, period_start)
+    else:
+        miles = _driver_miles(driver, period_start)
+        higher = (
+            _period_totals(period_start).filter(driver__in=_scoped_drivers(scope), period_miles__gt=miles).count()
+        )
+        result = miles, higher + 1
+    index.set(board, driver.pk, result[0])
+    return result
+
+
+def _boards_for(scopes):
+    """(period, period_start, scope) for the fleet board and each scoped board, across all periods."""
+    for period in ('', *PERIOD_DAYS):
+        start = period_start_for(period)
+        yield period, start, None
+        for kind, value in scopes.items():
+            yield period, start, (kind, value)
+
+
+def index_trip_recorded(driver_id: int, total_miles: int, miles: int, scopes=None) -> None:
+    """Keep the lifetime boards and today's period boards current after a committed trip submit."""
+    index = get_rank_index()
+    for period, start, scope in _boards_for(scopes or {}):
+        board = board_name(period, start, scope)
+        if start is None:
+            index.set(board, driver_id, total_miles)
+        else:
+            index.incr(board, driver_id, miles)
+    invalidate_top()
+
+
+def index_trip_changed(deltas: dict) -> None:
+    """
+    Move drivers on the period boards (fleet and scoped) after a committed trip create, edit or delete
+    through the CRUD API. `deltas` is record_trip_change's {(driver_id, date): miles}; only boards whose
+    period covers the date move. Lifetime boards follow Driver.mileage, which trip CRUD does not change.
+    """
+    if not deltas:
+        return
+    index = get_rank_index()
+    drivers = Driver.objects.in_bulk({driver_id for driver_id, _ in deltas})
+    for period in PERIOD_DAYS:
+        start = period_start_for(period)
+        moved = defaultdict(int)
+        for (driver_id, day), miles in deltas.items():
+            if day >= start:
+                moved[driver_id] += miles
+        for driver_id, miles in moved.items():
+            if miles and driver_id in drivers:
+                for scope in (None, *driver_scopes(drivers[driver_id]).items()):
+                    index.incr(board_name(period, start, scope), driver_id, miles)
+    invalidate_top()
+
+
+def index_driver_added(driver) -> None:
+    """Put a newly created driver on the fleet and scoped boards of every period at their current miles."""
+    index = get_rank_index()
+    for period, start, scope in _boards_for(driver_scopes(driver)):
+        index.set(board_name(period, start, scope), driver.pk, _driver_miles(driver, start))
+    invalidate_top()
+
+
+def index_lifetime_mileage(driver) -> None:
+    """Set the driver's Driver.mileage on the lifetime boards after a direct edit."""
+    index = get_rank_index()
+    miles = int(driver.mileage or 0)
+    index.set(board_name('', None), driver.pk, miles)
+    for scope in driver_scopes(driver).items():
+        index.set(board_name('', None, scope), driver.pk, miles)
+    invalidate_top()
+
+
+def index_mileage_corrected(drivers) -> None:
+    """Drop every board the drivers appear on after past trips' miles were corrected; they reload from SQL."""
+    index = get_rank_index()
+    boards = set()
+    for driver in drivers:
+        boards.update(board_name(period, start, scope) for period, start, scope in _boards_for(driver_scopes(driver)))
+    for board in boards:
+        index.drop(board)
+    invalidate_top()
+
+
+def index_driver_moved(driver, old_scopes: dict) -> None:
+    """
+    Move a reassigned driver between scoped boards: drop them from boards of scopes they left and
+    add them to already-loaded boards of scopes they joined. Unloaded boards are built on first read.
+    """
+    new_scopes = driver_scopes(driver)
+    changed = [kind for kind in SCOPE_FIELDS if old_scopes.get(kind) != new_scopes.get(kind)]
+    if not changed:
+        return
+    index = get_rank_index()
+    for period in ('', *PERIOD_DAYS):
+        start = period_start_for(period)
+        miles = None
+        for kind in changed:
+            if kind in old_scopes:
+                index.remove(board_name(period, start, (kind, old_scopes[kind])), driver.pk)
+            if kind in new_scopes:
+                board = board_name(period, start, (kind, new_scopes[kind]))
+                if index.has(board):
+                    if miles is None:
+                        miles = _driver_miles(driver, start)
+                    index.set(board, driver.pk, miles)
+    invalidate_top()
+
+
+def rebuild_rank_index(periods=('all', 'week', 'month'), scope=None) -> list:
+    """Reload the given boards (fleet-wide, or for one scope) from SQL; returns the board names written."""
+    boards = []
+    for period in periods:
+        start = period_start_for(period)
+        board = board_name(period, start, scope)
+        get_rank_index().load(board, sql_scores(start, scope))
+        boards.append(board)
+    return boards
+
+
+def check_rank_index(period: str = 'all', scope=None) -> list:
+    """
+    Compare the index against SQL ranking for every driver.
+    Returns [(driver_id, index (miles, rank) or None, sql (miles, rank))] for each mismatch,
+    or None when the board is not loaded (it will be built from SQL on first use).
+    """
+    start = period_start_for(period)
+    board = board_name(period, start, scope)
+    index = get_rank_index()
+    if not index.has(board):
+        return None
+    scores = sql_scores(start, scope)
+    ascending = sorted(-miles for miles in scores.values())
+    mismatches = []
+    for driver_id, miles in scores.items():
+        expected = (miles, bisect_left(ascending, -miles) + 1)
+        actual = index.rank(board, driver_id)
+        if actual != expected:
+            mismatches.append((driver_id, actual, expected))
+    return mismatches
+
+
+# --- Cached top list (single-flight, stale-while-revalidate) ---
+
+# The top list is computed once at the largest size the API serves and sliced per ?limit=
+TOP_CACHE_SIZE = 10
+TOP_CACHE_KEY = 'leaderboard:top:{period}'
+TOP_LOCK_KEY = 'leaderboard:lock:{period}'
+VERSION_KEY = 'leaderboard:version'
+# Longest a request without any cached copy waits for another request's recompute
+LOCK_WAIT_SECONDS = 1.0
+LOCK_TIMEOUT_SECONDS = 10
+
+
+def _version() -> int:
+    return cache.get(VERSION_KEY, 0)
+
+
+def invalidate_top() -> None:
+    """Mark every cached top list stale (trip submits, driver changes). Entries are kept for stale reads."""
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def _compute_top(board: str):
+    top = []
+    for idx, (d, miles) in enumerate(index_top(board, TOP_CACHE_SIZE), start=1):
+        top.append({
+            'username': d.user.username,
+            'name': d.user.get_full_name() or d.user.username,
+            'mileage': miles,
+            'rank': idx,
+        })
+    return top
+
+
+def cached_top(period: str, board: str, scope=None):
+    """
+    Top TOP_CACHE_SIZE entries for a board.
+    A fresh entry is returned as is. When it is stale (TTL passed or invalidated), one request takes
+    the lock and recomputes while concurrent requests keep serving the stale copy; requests with
+    no copy at all wait briefly for that recompute instead of running the same aggregate.
+    """
+    label = (period or 'all') + scope_suffix(scope)
+    key = TOP_CACHE_KEY.format(period=label)
+    lock_key = TOP_LOCK_KEY.format(period=label)
+    entry = cache.get(key)
+    version = _version()
+    if entry and entry['version'] == version and entry['fresh_until'] > time.time():
+        return entry['top']
+    if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT_SECONDS):
+        if entry:
+            return entry['top']
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry:
+                return entry['top']
+        # The lock holder is slow or gone; compute without caching over its result
+        return _compute_top(board)
+    try:
+        top = _compute_top(board)
+        ttl = getattr(settings, 'LEADERBOARD_CACHE_TTL', 60)
+        # Keep the entry well past its freshness window so it can be served stale
+        cache.set(key, {'top': top, 'version': version, 'fresh_until': time.time() + ttl}, timeout=ttl * 10)
+        return top
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,149 @@
+"""
+Location dictionary for trip start/end/stops.
+
+Trips keep the submitted place strings for display, and also reference a Location row per place:
+Trip.start_location / end_location and Trip.stop_ids (ordered Location ids). Names are matched by a
+normalized key (whitespace collapsed, case folded), so "Chicago,  IL" and "chicago, il" are one row.
+Coordinates are filled in when a submission carries them ("Lat: 41.88, Lng: -87.63" strings from the
+trip form, or stop objects with coords). Location.trip_count counts references and orders autocomplete.
+
+Search, autocomplete and lane analytics filter the (small) dictionary first and then join trips on
+integer ids, instead of running icontains over every trip's text columns.
+"""
+import re
+from collections import Counter
+
+from django.db.models import F
+
+from .models import Location, Trip
+
+MAX_NAME_LENGTH = 128
+_COORDS_RE = re.compile(r'Lat:\s*(-?[\d.]+),\s*Lng:\s*(-?[\d.]+)', re.IGNORECASE)
+
+
+def location_key(name) -> str:
+    """Normalized lookup key for a place name ('' when there is no usable name)."""
+    return ' '.join(str(name or '').split()).casefold()[:MAX_NAME_LENGTH]
+
+
+def stop_name(stop):
+    if isinstance(stop, dict):
+        return stop.get('name')
+    return stop if isinstance(stop, str) else None
+
+
+def place_coords(name, stop=None):
+    """(lat, lng) from a stop object's coords or a 'Lat: .., Lng: ..' name, else None."""
+    coords = stop.get('coords') if isinstance(stop, dict) else None
+    if isinstance(coords, (list, tuple)) and len(coords) == 2:
+        try:
+            lat, lng = float(coords[0]), float(coords[1])
+        except (TypeError, ValueError):
+            lat = lng = None
+        if lat is not None and -90 <= lat <= 90 and -180 <= lng <= 180:
+            return lat, lng
+    match = _COORDS_RE.search(name or '')
+    if match:
+        lat, lng = float(match.group(1)), float(match.group(2))
+        if -90 <= lat <= 90 and -180 <= lng <= 180:
+            return lat, lng
+    return None
+
+
+def resolve_locations(places) -> dict:
+    """
+    {key: Location} for [(name, coords or None), ...], creating missing rows in one insert and
+    filling in coordinates for known places that had none.
+    """
+    wanted = {}
+    for name, coords in places:
+        key = location_key(name)
+        if not key:
+            continue
+        display, known = wanted.get(key, (None, None))
+        wanted[key] = (display or ' '.join(str(name).split())[:MAX_NAME_LENGTH], known or coords)
+    if not wanted:
+        return {}
+    found = {loc.key: loc for loc in Location.objects.filter(key__in=list(wanted))}
+    missing = [
+        Location(key=key, name=name, lat=coords[0] if coords else None, lng=coords[1] if coords else None)
+        for key, (name, coords) in wanted.items() if key not in found
+    ]
+    if missing:
+        Location.objects.bulk_create(missing, ignore_conflicts=True)
+        found.update((loc.key, loc) for loc in Location.objects.filter(key__in=[loc.key for loc in missing]))
+    located = [loc for key, loc in found.items() if loc.lat is None and wanted[key][1]]
+    for loc in located:
+        loc.lat, loc.lng = wanted[loc.key][1]
+    if located:
+        Location.objects.bulk_update(located, ['lat', 'lng'])
+    return found
+
+
+def count_location_uses(added=(), removed=()) -> None:
+    """Move Location.trip_count by the references trips gained and lost (one UPDATE per distinct change)."""
+    delta = Counter(loc_id for loc_id in added if loc_id is not None)
+    delta.subtract(loc_id for loc_id in removed if loc_id is not None)
+    by_change = {}
+    for loc_id, change in delta.items():
+        if change:
+            by_change.setdefault(change, []).append(loc_id)
+    for change, ids in by_change.items():
+        Location.objects.filter(id__in=ids).update(trip_count=F('trip_count') + change)
+
+
+def trip_location_ids(trip) -> list:
+    """Every Location id a trip references (start, end, then stops)."""
+    return [trip.start_location_id, trip.end_location_id, *(trip.stop_ids or [])]
+
+
+def attach_locations(items: list) -> list:
+    """
+    Set start_location / end_location / stop_ids on trip field dicts from their 'start', 'end' and
+    'stops' values, resolving every place of the batch at once. Dicts without any of those keys
+    (partial edits) are left alone; counting uses is up to the caller (see count_location_uses).
+    """
+    places = []
+    for item in items:
+        for key in ('start', 'end'):
+            if key in item:
+                places.append((item[key], place_coords(item[key])))
+        for stop in item.get('stops') or []:
+            places.append((stop_name(stop), place_coords(stop_name(stop), stop)))
+    found = resolve_locations(places)
+
+    def location(name):
+        return found.get(location_key(name))
+
+    for item in items:
+        if 'start' in item:
+            item['start_location'] = location(item['start'])
+        if 'end' in item:
+            item['end_location'] = location(item['end'])
+        if 'stops' in item:
+            stops = [location(stop_name(stop)) for stop in item['stops'] or []]
+            item['stop_ids'] = [loc.id for loc in stops if loc is not None]
+    return items
+
+
+def rebuild_locations(batch_size: int = 500) -> int:
+    """Re-resolve every trip's places and recount Location.trip_count; returns trips processed."""
+    done = 0
+    last_id = 0
+    uses = Counter()
+    while True:
+        batch = list(Trip.objects.filter(id__gt=last_id).order_by('id').only('id', 'start', 'end', 'stops')[:batch_size])
+        if not batch:
+            break
+        fields = attach_locations([{'start': t.start, 'end': t.end, 'stops': t.stops} for t in batch])
+        for trip, values in zip(batch, fields):
+            trip.start_location = values['start_location']
+            trip.end_location = values['end_location']
+            trip.stop_ids = values['stop_ids']
+            uses.update(loc_id for loc_id in trip_location_ids(trip) if loc_id is not None)
+        Trip.objects.bulk_update(batch, ['start_location', 'end_location', 'stop_ids'])
+        done += len(batch)
+        last_id = batch[-1].id
+    Location.objects.update(trip_count=0)
+    count_location_uses(added=uses.elements())
+    return done
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backend.segments import backfill_duty_segments
+
+
+class Command(BaseCommand):
+    help = "Rebuild DutySegment rows from every ELD log's logEntries"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Logs processed per batch')
+
+    def handle(self, *args, **options):
+        done = backfill_duty_segments(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f"Duty segments written for {done} logs"))
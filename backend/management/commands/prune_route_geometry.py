@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from backend.geometry import prune_route_geometry
+
+
+class Command(BaseCommand):
+    help = "Delete shared route geometries that no trip references any more"
+
+    def handle(self, *args, **options):
+        deleted = prune_route_geometry()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} unused route geometries"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backend.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records (run periodically, e.g. hourly from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per DELETE statement')
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired idempotency keys"))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.leaderboard import PERIOD_DAYS, SCOPE_FIELDS, check_rank_index, rebuild_rank_index
+
+PERIODS = ['all'] + list(PERIOD_DAYS)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the leaderboard rank index from SQL and/or check it against SQL ranking"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=PERIODS, action='append', help='Board(s) to process (default: all boards)')
+        parser.add_argument('--scope', help='Scoped board as kind:value, e.g. supervisor:3 or office:Denver (default: whole fleet)')
+        parser.add_argument('--rebuild', action='store_true', help='Reload the boards from SQL')
+        parser.add_argument('--check', action='store_true', help='Compare every driver\'s indexed rank with the SQL rank')
+
+    def handle(self, *args, **options):
+        periods = options.get('period') or PERIODS
+        if not options['rebuild'] and not options['check']:
+            raise CommandError('Pass --rebuild and/or --check')
+        scope = None
+        if options.get('scope'):
+            kind, _, value = options['scope'].partition(':')
+            if kind not in SCOPE_FIELDS or not value:
+                raise CommandError(f"--scope must be kind:value with kind in {', '.join(SCOPE_FIELDS)}")
+            scope = (kind, value)
+        if options['rebuild']:
+            boards = rebuild_rank_index(periods, scope)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt boards: {', '.join(boards)}"))
+        if options['check']:
+            failed = False
+            for period in periods:
+                mismatches = check_rank_index(period, scope)
+                if mismatches is None:
+                    self.stdout.write(f"{period}: not loaded")
+                elif mismatches:
+                    failed = True
+                    self.stdout.write(self.style.ERROR(f"{period}: {len(mismatches)} mismatches"))
+                    for driver_id, indexed, expected in mismatches[:20]:
+                        self.stdout.write(f"  driver {driver_id}: index={indexed} sql={expected}")
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{period}: consistent"))
+            if failed:
+                raise CommandError('Rank index is inconsistent with SQL; run with --rebuild')
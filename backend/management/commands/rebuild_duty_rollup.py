@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.cycle import rebuild_duty_rollup
+
+
+class Command(BaseCommand):
+    help = "Backfill or rebuild the DriverDailyDuty rollup (and Driver.cycleUsed) from ELD logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on/after this date (YYYY-MM-DD); default rebuilds everything')
+
+    def handle(self, *args, **options):
+        since = None
+        if options.get('since'):
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM-DD')
+        written = rebuild_duty_rollup(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Daily duty rollup rebuilt: {written} rows"))
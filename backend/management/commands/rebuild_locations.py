@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backend.locations import rebuild_locations
+
+
+class Command(BaseCommand):
+    help = "Re-resolve trip start/end/stops against the Location dictionary and recount Location.trip_count"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Trips processed per batch')
+
+    def handle(self, *args, **options):
+        done = rebuild_locations(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f"Locations resolved for {done} trips"))
@@ -0,0 +1,22 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.leaderboard import rebuild_daily_mileage
+
+
+class Command(BaseCommand):
+    help = "Backfill or rebuild the DriverDailyMileage rollup from Trip rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild days on/after this date (YYYY-MM-DD); default rebuilds everything')
+
+    def handle(self, *args, **options):
+        since = None
+        if options.get('since'):
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be YYYY-MM-DD')
+        written = rebuild_daily_mileage(since=since)
+        self.stdout.write(self.style.SUCCESS(f"Daily mileage rollup rebuilt: {written} rows"))
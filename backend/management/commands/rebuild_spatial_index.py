@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backend.spatial import rebuild_spatial_index
+
+
+class Command(BaseCommand):
+    help = "Recompute trip bounding boxes and grid cells (TripCell) from stored route geometry"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Trips processed per batch')
+
+    def handle(self, *args, **options):
+        done = rebuild_spatial_index(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f"Spatial index rebuilt for {done} trips"))
@@ -0,0 +1,26 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from backend.submissions import recompute_trip_mileage
+
+
+class Command(BaseCommand):
+    help = "Measure every trip route and re-reconcile Trip.mileage (driver totals and rollups follow)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Trips per batch handed to a worker')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes measuring routes (1 = in-process)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many trips would change')
+
+    def handle(self, *args, **options):
+        stats = recompute_trip_mileage(
+            batch_size=max(1, options['batch_size']),
+            workers=max(1, options['workers']),
+            dry_run=options['dry_run'],
+        )
+        verb = 'would change' if options['dry_run'] else 'changed'
+        self.stdout.write(self.style.SUCCESS(
+            f"Measured {stats['trips']} trips: {stats['changed']} {verb}, "
+            f"{stats['mismatched']} reported outside tolerance"
+        ))
@@ -0,0 +1,28 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from backend.violations import scan_hos_violations
+
+
+class Command(BaseCommand):
+    help = "Evaluate ELD logs changed since the last scan and record their HOS violations (HOSViolation)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Logs per chunk handed to a worker')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes evaluating logs (1 = in-process)')
+        parser.add_argument('--full', action='store_true', help='Rescan every log, ignoring the watermark')
+        parser.add_argument('--benchmark', action='store_true', help='Evaluate every log without writing and report throughput')
+
+    def handle(self, *args, **options):
+        stats = scan_hos_violations(
+            chunk_size=max(1, options['chunk_size']),
+            workers=max(1, options['workers']),
+            full=options['full'],
+            benchmark=options['benchmark'],
+        )
+        verb = 'found' if options['benchmark'] else 'recorded'
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {stats['logs']} logs in {stats['seconds']}s ({stats['logs_per_second']} logs/s): "
+            f"{stats['violations']} violations {verb}"
+        ))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_approvalrequest_backend_app_supervi_d5e3ef_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='approvalrequest',
+            index=models.Index(fields=['supervisor', 'status', '-date', '-id'], name='backend_app_supervi_4c8099_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eldlog',
+            index=models.Index(fields=['driver', '-date', '-id'], name='backend_eld_driver__bf02a1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['driver', '-date', '-id'], name='backend_tri_driver__396b7f_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_daily_mileage(apps, schema_editor):
+    Trip = apps.get_model('backend', 'Trip')
+    DriverDailyMileage = apps.get_model('backend', 'DriverDailyMileage')
+    rows = Trip.objects.values('driver', 'date').annotate(miles=Sum('mileage'), count=Count('id')).order_by()
+    DriverDailyMileage.objects.bulk_create(
+        [DriverDailyMileage(driver_id=r['driver'], date=r['date'], mileage=r['miles'] or 0, trips=r['count']) for r in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0009_approvalrequest_backend_app_supervi_4c8099_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverDailyMileage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('mileage', models.IntegerField(default=0)),
+                ('trips', models.IntegerField(default=0)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_mileage', to='backend.driver')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'driver'], name='backend_dri_date_0a0775_idx')],
+                'constraints': [models.UniqueConstraint(fields=('driver', 'date'), name='uniq_driver_daily_mileage')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_mileage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+import json
+import math
+
+from django.db import migrations
+
+BATCH_SIZE = 500
+# Frozen copy of the backend.polyline codec (precision 5), so later changes to it cannot alter this migration
+SCALE = 10 ** 5
+_MAX_CHUNKS = 7
+
+
+def _encode(coords) -> str:
+    """[[lat, lng], ...] -> Google encoded polyline. Raises ValueError unless every item is an in-range pair."""
+    chars = []
+    prev = (0, 0)
+    for pair in coords:
+        try:
+            lat, lng = (float(value) for value in pair)
+        except (TypeError, ValueError):
+            raise ValueError('coordinates must be a list of [lat, lng] pairs')
+        if not (math.isfinite(lat) and math.isfinite(lng)) or abs(lat) > 90 or abs(lng) > 180:
+            raise ValueError('coordinates out of range')
+        point = (round(lat * SCALE), round(lng * SCALE))
+        for value, last in zip(point, prev):
+            delta = value - last
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                chars.append(chr((0x20 | (delta & 0x1F)) + 63))
+                delta >>= 5
+            chars.append(chr(delta + 63))
+        prev = point
+    return ''.join(chars)
+
+
+def _decode(encoded: str) -> list:
+    """Google encoded polyline -> [[lat, lng], ...]. Raises ValueError on malformed input."""
+    values, value, shift = [], 0, 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        if not 0 <= chunk <= 63 or shift >= 5 * _MAX_CHUNKS:
+            raise ValueError('invalid polyline')
+        value |= (chunk & 0x1F) << shift
+        shift += 5
+        if not chunk & 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    if shift or len(values) % 2:
+        raise ValueError('invalid polyline')
+    coords, lat, lng = [], 0, 0
+    for dlat, dlng in zip(values[::2], values[1::2]):
+        lat, lng = lat + dlat, lng + dlng
+        coords.append([lat / SCALE, lng / SCALE])
+    return coords
+
+
+def _rewrite(rows, convert):
+    """Store convert(polyline) for each row, skipping values it cannot read."""
+    batch = []
+    for trip in rows.only('id', 'polyline').iterator(chunk_size=BATCH_SIZE):
+        try:
+            trip.polyline = convert(trip.polyline)
+        except ValueError:
+            continue
+        batch.append(trip)
+        if len(batch) >= BATCH_SIZE:
+            rows.model.objects.bulk_update(batch, ['polyline'])
+            batch = []
+    if batch:
+        rows.model.objects.bulk_update(batch, ['polyline'])
+
+
+def _json_to_encoded(text):
+    value = json.loads(text)
+    if not isinstance(value, list):
+        raise ValueError('polyline is not a coordinate list')
+    return _encode(value) or None
+
+
+def encode_trip_polylines(apps, schema_editor):
+    """Rewrite JSON [[lat, lng], ...] polylines as Google encoded polylines; unreadable values are left as is."""
+    Trip = apps.get_model('backend', 'Trip')
+    _rewrite(Trip.objects.filter(polyline__startswith='['), _json_to_encoded)
+
+
+def decode_trip_polylines(apps, schema_editor):
+    """Reverse: rewrite encoded polylines as the JSON [[lat, lng], ...] text stored before (coordinates at 1e-5 degrees)."""
+    Trip = apps.get_model('backend', 'Trip')
+    rows = Trip.objects.exclude(polyline__isnull=True).exclude(polyline='').exclude(polyline__startswith='[')
+    _rewrite(rows, lambda encoded: json.dumps(_decode(encoded)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_trip_polylines, decode_trip_polylines),
+    ]
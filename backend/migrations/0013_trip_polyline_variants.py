@@ -0,0 +1,124 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:54
+
+import numpy as np
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+# Frozen copies of the backend.polyline codec and simplifier as of this migration
+SCALE = 10 ** 5
+_MAX_CHUNKS = 7
+ZOOM_LEVELS = (4, 6, 8, 10, 12)
+
+
+def _encode(points) -> str:
+    chars = []
+    prev = (0, 0)
+    for lat, lng in points:
+        point = (round(lat * SCALE), round(lng * SCALE))
+        for value, last in zip(point, prev):
+            delta = value - last
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                chars.append(chr((0x20 | (delta & 0x1F)) + 63))
+                delta >>= 5
+            chars.append(chr(delta + 63))
+        prev = point
+    return ''.join(chars)
+
+
+def _decode(encoded: str) -> list:
+    values, value, shift = [], 0, 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        if not 0 <= chunk <= 63 or shift >= 5 * _MAX_CHUNKS:
+            raise ValueError('invalid polyline')
+        value |= (chunk & 0x1F) << shift
+        shift += 5
+        if not chunk & 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    if shift or len(values) % 2:
+        raise ValueError('invalid polyline')
+    coords, lat, lng = [], 0, 0
+    for dlat, dlng in zip(values[::2], values[1::2]):
+        lat, lng = lat + dlat, lng + dlng
+        coords.append([lat / SCALE, lng / SCALE])
+    return coords
+
+
+def _simplify(points, tolerance: float) -> np.ndarray:
+    """Douglas-Peucker within `tolerance` degrees, longitudes scaled by cos(latitude)."""
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return points
+    xy = np.column_stack((points[:, 1] * np.cos(np.radians(points[:, 0].mean())), points[:, 0]))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        span = xy[first + 1:last]
+        ab = b - a
+        length_sq = ab @ ab
+        if length_sq == 0:
+            dist = np.hypot(*(span - a).T)
+        else:
+            t = np.clip((span - a) @ ab / length_sq, 0.0, 1.0)
+            dist = np.hypot(*(span - (a + t[:, None] * ab)).T)
+        i = int(dist.argmax())
+        if dist[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def simplified_variants(encoded) -> dict:
+    """{str(zoom): encoded} for ZOOM_LEVELS, omitting levels where simplification drops no points."""
+    try:
+        points = _decode(encoded)
+    except ValueError:
+        return {}
+    variants = {}
+    for zoom in ZOOM_LEVELS:
+        reduced = _simplify(points, 360.0 / (256 * 2 ** zoom))
+        if len(reduced) < len(points):
+            variants[str(zoom)] = _encode(reduced.tolist())
+    return variants
+
+
+def backfill_polyline_variants(apps, schema_editor):
+    Trip = apps.get_model('backend', 'Trip')
+    rows = Trip.objects.exclude(polyline__isnull=True).exclude(polyline='').only('id', 'polyline').iterator(chunk_size=BATCH_SIZE)
+    batch = []
+    for trip in rows:
+        trip.polyline_variants = simplified_variants(trip.polyline)
+        if trip.polyline_variants:
+            batch.append(trip)
+        if len(batch) >= BATCH_SIZE:
+            Trip.objects.bulk_update(batch, ['polyline_variants'])
+            batch = []
+    if batch:
+        Trip.objects.bulk_update(batch, ['polyline_variants'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_encode_trip_polylines'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='polyline_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        # Dropping the column undoes the backfill
+        migrations.RunPython(backfill_polyline_variants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:01
+
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+# Frozen copies of the polyline decoder and the backend.spatial grid as of this migration
+SCALE = 10 ** 5
+_MAX_CHUNKS = 7
+CELL_DEGREES = 0.1
+_ROWS = int(round(180 / CELL_DEGREES))
+_COLS = int(round(360 / CELL_DEGREES))
+
+
+def _points(encoded):
+    """(n, 2) array of a stored polyline, or None when it is unreadable or empty."""
+    values, value, shift = [], 0, 0
+    for char in encoded or '':
+        chunk = ord(char) - 63
+        if not 0 <= chunk <= 63 or shift >= 5 * _MAX_CHUNKS:
+            return None
+        value |= (chunk & 0x1F) << shift
+        shift += 5
+        if not chunk & 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    if shift or len(values) % 2 or not values:
+        return None
+    return np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / SCALE
+
+
+def route_bbox(points) -> dict:
+    if points is None:
+        return {'min_lat': None, 'min_lng': None, 'max_lat': None, 'max_lng': None}
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    return {'min_lat': float(lo[0]), 'min_lng': float(lo[1]), 'max_lat': float(hi[0]), 'max_lng': float(hi[1])}
+
+
+def _cell_ids(lat, lng) -> np.ndarray:
+    rows = np.clip(np.floor((np.asarray(lat) + 90) / CELL_DEGREES).astype(np.int64), 0, _ROWS - 1)
+    cols = np.clip(np.floor((np.asarray(lng) + 180) / CELL_DEGREES).astype(np.int64), 0, _COLS - 1)
+    return rows * _COLS + cols
+
+
+def route_cells(points) -> list:
+    """Ids of the grid cells the route passes through, sampling each segment every quarter cell."""
+    if points is None:
+        return []
+    if len(points) == 1:
+        return _cell_ids(points[:, 0], points[:, 1]).tolist()
+    start, delta = points[:-1], np.diff(points, axis=0)
+    steps = np.maximum(1, np.ceil(np.abs(delta).max(axis=1) / (CELL_DEGREES / 4))).astype(np.int64)
+    seg = np.repeat(np.arange(len(start)), steps)
+    offsets = np.arange(len(seg)) - np.repeat(np.cumsum(steps) - steps, steps)
+    samples = start[seg] + delta[seg] * (offsets / steps[seg])[:, None]
+    samples = np.vstack((samples, points[-1:]))
+    return np.unique(_cell_ids(samples[:, 0], samples[:, 1])).tolist()
+
+
+def backfill_spatial_index(apps, schema_editor):
+    Trip = apps.get_model('backend', 'Trip')
+    TripCell = apps.get_model('backend', 'TripCell')
+    rows = Trip.objects.exclude(polyline__isnull=True).exclude(polyline='').only('id', 'polyline').iterator(chunk_size=BATCH_SIZE)
+    batch, cells = [], []
+    for trip in rows:
+        points = _points(trip.polyline)
+        for name, value in route_bbox(points).items():
+            setattr(trip, name, value)
+        batch.append(trip)
+        cells.extend(TripCell(trip_id=trip.id, cell=cell) for cell in route_cells(points))
+        if len(batch) >= BATCH_SIZE:
+            Trip.objects.bulk_update(batch, ['min_lat', 'min_lng', 'max_lat', 'max_lng'])
+            TripCell.objects.bulk_create(cells, batch_size=2000)
+            batch, cells = [], []
+    if batch:
+        Trip.objects.bulk_update(batch, ['min_lat', 'min_lng', 'max_lat', 'max_lng'])
+        TripCell.objects.bulk_create(cells, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0013_trip_polyline_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='max_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='max_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='min_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='min_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['min_lat', 'max_lat'], name='backend_tri_min_lat_3fc229_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['min_lng', 'max_lng'], name='backend_tri_min_lng_919ffa_idx'),
+        ),
+        migrations.AddField(
+            model_name='tripcell',
+            name='trip',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cells', to='backend.trip'),
+        ),
+        migrations.AddConstraint(
+            model_name='tripcell',
+            constraint=models.UniqueConstraint(fields=('cell', 'trip'), name='uniq_trip_cell'),
+        ),
+        # Dropping the columns and the TripCell table undoes the backfill
+        migrations.RunPython(backfill_spatial_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:06
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_reported_mileage(apps, schema_editor):
+    # Existing trips were stored as reported; route miles are measured by `manage.py recompute_trip_mileage`
+    Trip = apps.get_model('backend', 'Trip')
+    Trip.objects.update(reportedMileage=F('mileage'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0014_trip_spatial_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='reportedMileage',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='routeMileage',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_reported_mileage, migrations.RunPython.noop),
+    ]
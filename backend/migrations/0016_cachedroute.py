@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0015_trip_reported_route_mileage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedRoute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('request', models.TextField()),
+                ('response', models.TextField()),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='backend_cac_expires_7edd5d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:15
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def dedupe_trip_geometry(apps, schema_editor):
+    """Move each distinct Trip.polyline into one RouteGeometry (keeping its variants) and point trips at it."""
+    Trip = apps.get_model('backend', 'Trip')
+    RouteGeometry = apps.get_model('backend', 'RouteGeometry')
+    ids_by_digest = {}
+    rows = (
+        Trip.objects.exclude(polyline__isnull=True).exclude(polyline='')
+        .only('id', 'polyline', 'polyline_variants').iterator(chunk_size=BATCH_SIZE)
+    )
+    batch = []
+
+    def flush():
+        new = {}
+        for trip in batch:
+            digest = hashlib.sha256(trip.polyline.encode('utf-8')).hexdigest()
+            trip.digest = digest
+            if digest not in ids_by_digest and digest not in new:
+                new[digest] = RouteGeometry(digest=digest, polyline=trip.polyline, polyline_variants=trip.polyline_variants or {})
+        if new:
+            RouteGeometry.objects.bulk_create(new.values())
+            ids_by_digest.update(RouteGeometry.objects.filter(digest__in=list(new)).values_list('digest', 'id'))
+        for trip in batch:
+            trip.geometry_id = ids_by_digest[trip.digest]
+        Trip.objects.bulk_update(batch, ['geometry'])
+
+    for trip in rows:
+        batch.append(trip)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+            batch = []
+    if batch:
+        flush()
+
+
+def restore_trip_polylines(apps, schema_editor):
+    Trip = apps.get_model('backend', 'Trip')
+    rows = Trip.objects.filter(geometry__isnull=False).select_related('geometry').iterator(chunk_size=BATCH_SIZE)
+    batch = []
+    for trip in rows:
+        trip.polyline = trip.geometry.polyline
+        trip.polyline_variants = trip.geometry.polyline_variants
+        batch.append(trip)
+        if len(batch) >= BATCH_SIZE:
+            Trip.objects.bulk_update(batch, ['polyline', 'polyline_variants'])
+            batch = []
+    if batch:
+        Trip.objects.bulk_update(batch, ['polyline', 'polyline_variants'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0016_cachedroute'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouteGeometry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('polyline', models.TextField()),
+                ('polyline_variants', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='geometry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='trips', to='backend.routegeometry'),
+        ),
+        migrations.RunPython(dedupe_trip_geometry, restore_trip_polylines),
+        migrations.RemoveField(
+            model_name='trip',
+            name='polyline',
+        ),
+        migrations.RemoveField(
+            model_name='trip',
+            name='polyline_variants',
+        ),
+    ]
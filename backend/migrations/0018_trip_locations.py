@@ -0,0 +1,126 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:18
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+# Frozen copies of the backend.locations key and coordinate helpers as of this migration
+MAX_NAME_LENGTH = 128
+_COORDS_RE = re.compile(r'Lat:\s*(-?[\d.]+),\s*Lng:\s*(-?[\d.]+)', re.IGNORECASE)
+
+
+def location_key(name) -> str:
+    return ' '.join(str(name or '').split()).casefold()[:MAX_NAME_LENGTH]
+
+
+def stop_name(stop):
+    if isinstance(stop, dict):
+        return stop.get('name')
+    return stop if isinstance(stop, str) else None
+
+
+def place_coords(name, stop=None):
+    coords = stop.get('coords') if isinstance(stop, dict) else None
+    if isinstance(coords, (list, tuple)) and len(coords) == 2:
+        try:
+            lat, lng = float(coords[0]), float(coords[1])
+        except (TypeError, ValueError):
+            lat = lng = None
+        if lat is not None and -90 <= lat <= 90 and -180 <= lng <= 180:
+            return lat, lng
+    match = _COORDS_RE.search(name or '')
+    if match:
+        lat, lng = float(match.group(1)), float(match.group(2))
+        if -90 <= lat <= 90 and -180 <= lng <= 180:
+            return lat, lng
+    return None
+
+
+def backfill_trip_locations(apps, schema_editor):
+    Trip = apps.get_model('backend', 'Trip')
+    Location = apps.get_model('backend', 'Location')
+    ids = {}
+    uses = Counter()
+
+    def location_id(name, stop=None):
+        key = location_key(name)
+        if not key:
+            return None
+        if key not in ids:
+            coords = place_coords(name, stop)
+            ids[key] = Location.objects.create(
+                key=key, name=' '.join(str(name).split())[:MAX_NAME_LENGTH],
+                lat=coords[0] if coords else None, lng=coords[1] if coords else None,
+            ).id
+        uses[ids[key]] += 1
+        return ids[key]
+
+    last_id = 0
+    while True:
+        batch = list(Trip.objects.filter(id__gt=last_id).order_by('id').only('id', 'start', 'end', 'stops')[:BATCH_SIZE])
+        if not batch:
+            break
+        for trip in batch:
+            trip.start_location_id = location_id(trip.start)
+            trip.end_location_id = location_id(trip.end)
+            stop_ids = [location_id(stop_name(stop), stop) for stop in trip.stops or []]
+            trip.stop_ids = [loc_id for loc_id in stop_ids if loc_id is not None]
+        Trip.objects.bulk_update(batch, ['start_location', 'end_location', 'stop_ids'])
+        last_id = batch[-1].id
+    for loc_id, count in uses.items():
+        Location.objects.filter(id=loc_id).update(trip_count=count)
+
+
+def clear_trip_locations(apps, schema_editor):
+    """Reverse: drop the references and dictionary rows; the trips' place strings were never changed."""
+    Trip = apps.get_model('backend', 'Trip')
+    Location = apps.get_model('backend', 'Location')
+    Trip.objects.update(start_location=None, end_location=None, stop_ids=[])
+    Location.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0017_route_geometry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='stop_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=128, unique=True)),
+                ('name', models.CharField(max_length=128)),
+                ('lat', models.FloatField(blank=True, null=True)),
+                ('lng', models.FloatField(blank=True, null=True)),
+                ('trip_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-trip_count', 'key'], name='backend_loc_trip_co_3088f2_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='end_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='trips_ended', to='backend.location'),
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='start_location',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='trips_started', to='backend.location'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['start_location', 'end_location'], name='backend_tri_start_l_96cd68_idx'),
+        ),
+        migrations.RunPython(backfill_trip_locations, clear_trip_locations),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:23
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0018_trip_locations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eldlog',
+            name='date',
+            field=models.DateField(default=datetime.date.today),
+        ),
+    ]
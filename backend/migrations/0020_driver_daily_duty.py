@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:29
+
+import math
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+# Frozen copy of the backend.hos day totals as of this migration
+HOURS_PER_DAY = 24
+ON_DUTY_STATUSES = ('Driving', 'On Duty')
+
+
+def _hour(value):
+    try:
+        hour = float(value)
+    except (TypeError, ValueError):
+        return None
+    return hour if math.isfinite(hour) else None
+
+
+def day_totals(entries) -> dict:
+    """DriverDailyDuty hours for one day's segments: on-duty and driving totals, off-duty before and after."""
+    on_duty = driving = 0.0
+    first_on, last_on = float(HOURS_PER_DAY), 0.0
+    for seg in entries:
+        if not isinstance(seg, dict) or seg.get('status') not in ON_DUTY_STATUSES:
+            continue
+        start, end = _hour(seg.get('start')), _hour(seg.get('end'))
+        if start is None or end is None:
+            continue
+        hours = max(end - start, 0.0)
+        on_duty += hours
+        if seg['status'] == 'Driving':
+            driving += hours
+        first_on = min(first_on, min(max(start, 0.0), HOURS_PER_DAY))
+        last_on = max(last_on, min(max(end, 0.0), HOURS_PER_DAY))
+    worked = on_duty > 0
+    return {
+        'onDutyHours': on_duty,
+        'drivingHours': driving,
+        'offDutyBefore': first_on if worked else float(HOURS_PER_DAY),
+        'offDutyAfter': HOURS_PER_DAY - last_on if worked else float(HOURS_PER_DAY),
+    }
+
+
+def backfill_daily_duty(apps, schema_editor):
+    ELDLog = apps.get_model('backend', 'ELDLog')
+    DriverDailyDuty = apps.get_model('backend', 'DriverDailyDuty')
+    entries = defaultdict(list)
+    rows = ELDLog.objects.order_by('driver_id', 'date').values_list('driver_id', 'date', 'logEntries').iterator(chunk_size=BATCH_SIZE)
+    for driver_id, day, log_entries in rows:
+        if isinstance(log_entries, list):
+            entries[(driver_id, day)].extend(log_entries)
+    keys = list(entries)
+    for offset in range(0, len(keys), BATCH_SIZE):
+        DriverDailyDuty.objects.bulk_create([
+            DriverDailyDuty(driver_id=driver_id, date=day, **day_totals(entries[(driver_id, day)]))
+            for driver_id, day in keys[offset:offset + BATCH_SIZE]
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0019_eldlog_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverDailyDuty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('onDutyHours', models.FloatField(default=0)),
+                ('drivingHours', models.FloatField(default=0)),
+                ('offDutyBefore', models.FloatField(default=24)),
+                ('offDutyAfter', models.FloatField(default=24)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_duty', to='backend.driver')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'driver'], name='backend_dri_date_8cb0e2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('driver', 'date'), name='uniq_driver_daily_duty')],
+            },
+        ),
+        # Dropping the table undoes the backfill
+        migrations.RunPython(backfill_daily_duty, migrations.RunPython.noop),
+    ]
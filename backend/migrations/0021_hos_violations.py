@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0020_driver_daily_duty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('scanned_until', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='eldlog',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='HOSViolation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('rule', models.CharField(choices=[('driving', 'Driving limit'), ('window', 'On-duty window'), ('break', 'Break required'), ('cycle', 'Cycle limit')], max_length=16)),
+                ('value', models.FloatField()),
+                ('limit', models.FloatField()),
+                ('detected_at', models.DateTimeField(auto_now=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hos_violations', to='backend.driver')),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hos_violations', to='backend.eldlog')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['driver', '-date', '-id'], name='backend_hos_driver__6759f1_idx'), models.Index(fields=['rule', '-date', '-id'], name='backend_hos_rule_0b9e56_idx'), models.Index(fields=['-date', '-id'], name='backend_hos_date_e93eb5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('log', 'rule'), name='uniq_hos_violation_rule')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+# Frozen copy of backend.segments.segment_fields and its status codes as of this migration
+HOURS_PER_DAY = 24
+STATUS_CODES = {'Off Duty': 0, 'Sleeper Berth': 1, 'Driving': 2, 'On Duty': 3}
+
+
+def segment_fields(entries) -> list:
+    fields = []
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or entry.get('status') not in STATUS_CODES:
+            continue
+        try:
+            start = min(max(float(entry.get('start')), 0.0), HOURS_PER_DAY)
+            end = min(max(float(entry.get('end')), 0.0), HOURS_PER_DAY)
+        except (TypeError, ValueError):
+            continue
+        if end > start:
+            fields.append({'start': start, 'end': end, 'hours': end - start, 'status': STATUS_CODES[entry['status']]})
+    fields.sort(key=lambda f: f['start'])
+    return fields
+
+
+def backfill_duty_segments(apps, schema_editor):
+    ELDLog = apps.get_model('backend', 'ELDLog')
+    DutySegment = apps.get_model('backend', 'DutySegment')
+    rows = ELDLog.objects.order_by('id').values_list('id', 'driver_id', 'date', 'logEntries').iterator(chunk_size=BATCH_SIZE)
+    batch = []
+    for log_id, driver_id, day, log_entries in rows:
+        batch.extend(
+            DutySegment(log_id=log_id, driver_id=driver_id, date=day, **fields) for fields in segment_fields(log_entries)
+        )
+        if len(batch) >= BATCH_SIZE:
+            DutySegment.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        DutySegment.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0021_hos_violations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DutySegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start', models.FloatField()),
+                ('end', models.FloatField()),
+                ('hours', models.FloatField()),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'Off Duty'), (1, 'Sleeper Berth'), (2, 'Driving'), (3, 'On Duty')])),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duty_segments', to='backend.driver')),
+                ('log', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='backend.eldlog')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'date', 'hours'], name='backend_dut_status_478457_idx'), models.Index(fields=['date', 'status', 'start'], name='backend_dut_date_3370b5_idx'), models.Index(fields=['driver', '-date', '-id'], name='backend_dut_driver__ed2f41_idx')],
+            },
+        ),
+        # Dropping the table undoes the backfill
+        migrations.RunPython(backfill_duty_segments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+"""
+Server-side trip mileage.
+
+Clients report a trip's miles with the submit. When the trip carries route geometry, the backend
+also measures the route (haversine over every segment, vectorized with numpy) and reconciles the two:
+- no geometry: the reported value is used as before
+- nothing (or zero) reported: the measured route is used
+- within MILEAGE_TOLERANCE of each other: the reported value is kept (odometer/road distance)
+- otherwise the measured route wins
+Trip.reportedMileage and Trip.routeMileage keep both inputs; Trip.mileage is the reconciled value
+that feeds Driver.mileage and the leaderboards.
+
+This module does not import models, so `measure_routes` can run in worker processes
+(see submissions.recompute_trip_mileage).
+"""
+import numpy as np
+from django.conf import settings
+
+from .polyline import decode
+
+EARTH_RADIUS_MILES = 3958.8
+
+
+def mileage_tolerance():
+    """(fraction, miles): routes and reports may differ by the larger of fraction * route and miles."""
+    tolerance = getattr(settings, 'TRIP_MILEAGE_TOLERANCE', {})
+    return float(tolerance.get('fraction', 0.1)), float(tolerance.get('miles', 2.0))
+
+
+def haversine_miles(points) -> float:
+    """Great-circle length of a [[lat, lng], ...] path in miles, all segments at once."""
+    points = np.radians(np.asarray(points, dtype=np.float64))
+    if len(points) < 2:
+        return 0.0
+    lat, lng = points[:, 0], points[:, 1]
+    dlat, dlng = np.diff(lat), np.diff(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlng / 2) ** 2
+    return float(2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))).sum())
+
+
+def route_miles(encoded):
+    """Length of a stored polyline in miles (rounded to 0.01), or None without usable geometry (fewer than 2 points)."""
+    if not encoded:
+        return None
+    try:
+        points = decode(encoded)
+    except ValueError:
+        return None
+    # A single point measures nothing; the reported miles must not be reconciled against 0
+    if len(points) < 2:
+        return None
+    return round(haversine_miles(points), 2)
+
+
+def reconcile_mileage(reported, route) -> int:
+    """Trip.mileage from the client's reported miles (int or None) and the measured route (float or None)."""
+    if route is None:
+        return reported or 0
+    if not reported or reported < 0:
+        return int(round(route))
+    fraction, miles = mileage_tolerance()
+    if abs(reported - route) <= max(fraction * route, miles):
+        return reported
+    return int(round(route))
+
+
+def measure_routes(rows) -> list:
+    """[(id, encoded), ...] -> [(id, route miles or None), ...]; the unit of work for recompute workers."""
+    return [(row_id, route_miles(encoded)) for row_id, encoded in rows]
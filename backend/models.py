@@ -1,6 +1,9 @@
 
+from datetime import date
+
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Prefetch, Q, Window
+from django.db.models.functions import RowNumber
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
 
@@ -80,30 +83,177 @@ class Supervisor(models.Model):
     def __str__(self) -> str:
         return f"Supervisor:{self.user.username}"
 
+class Location(models.Model):
+    """
+    Dictionary of places used as trip start/end/stops, one row per normalized name (see locations.py).
+    trip_count counts the trip references to the place and ranks autocomplete suggestions.
+    """
+    key = models.CharField(max_length=128, unique=True)
+    name = models.CharField(max_length=128)
+    lat = models.FloatField(null=True, blank=True)
+    lng = models.FloatField(null=True, blank=True)
+    trip_count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trip_count', 'key']),
+        ]
+
+    def __str__(self) -> str:
+        return f"Location:{self.name}"
+
+
 class Trip(models.Model):
     driver = models.ForeignKey(Driver, on_delete=models.CASCADE)
     start = models.CharField(max_length=128)
     end = models.CharField(max_length=128)
     stops = models.JSONField(default=list)
+    # The same places as Location references: lanes, search and autocomplete join on these ids
+    start_location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, blank=True, related_name='trips_started')
+    end_location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, blank=True, related_name='trips_ended')
+    # Location ids of `stops`, in order
+    stop_ids = models.JSONField(default=list, blank=True)
     date = models.DateField(auto_now_add=True)
+    # Reconciled miles counted towards Driver.mileage and the leaderboards (see mileage.py)
     mileage = models.IntegerField(default=0)
+    # Miles as submitted by the client, and as measured from the route geometry
+    reportedMileage = models.IntegerField(null=True, blank=True)
+    routeMileage = models.FloatField(null=True, blank=True)
     cycleUsed = models.IntegerField(default=0)
     status = models.CharField(max_length=32, default='Pending')
-    # Optional encoded polyline (OSRM/Google-like) for the route geometry
-    polyline = models.TextField(blank=True, null=True)
+    # Optional route geometry, shared by every trip on the same lane (see geometry.py)
+    geometry = models.ForeignKey('RouteGeometry', on_delete=models.PROTECT, null=True, blank=True, related_name='trips')
+    # Route bounding box for region queries (see spatial.py); null without geometry
+    min_lat = models.FloatField(null=True, blank=True)
+    min_lng = models.FloatField(null=True, blank=True)
+    max_lat = models.FloatField(null=True, blank=True)
+    max_lng = models.FloatField(null=True, blank=True)
 
     class Meta:
         indexes = [
             models.Index(fields=['driver']),
             models.Index(fields=['date']),
             models.Index(fields=['status']),
+            # Keyset pagination per driver: WHERE driver = ? AND (date, id) < (?, ?) ORDER BY date DESC, id DESC
+            models.Index(fields=['driver', '-date', '-id']),
+            models.Index(fields=['min_lat', 'max_lat']),
+            models.Index(fields=['min_lng', 'max_lng']),
+            # Per-lane analytics: GROUP BY start_location, end_location
+            models.Index(fields=['start_location', 'end_location']),
         ]
 
     def __str__(self) -> str:
         return f"Trip:{self.driver.user.username}@{self.date} {self.start}->{self.end}"
+
+    @property
+    def polyline(self):
+        """Encoded route of the trip's shared geometry, or None."""
+        return self.geometry.polyline if self.geometry_id else None
+
+
+class RouteGeometry(models.Model):
+    """
+    Route geometry stored once per distinct lane and referenced by every Trip that drove it.
+    Keyed by the sha256 of the normalized Google encoded polyline (precision 5, i.e. coordinates
+    quantized to 1e-5 degrees); see geometry.py.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    polyline = models.TextField()
+    # Douglas-Peucker simplified polylines per zoom level {"4": "...", ...}, computed when first stored
+    polyline_variants = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"RouteGeometry:{self.digest[:12]}"
+
+
+class TripCell(models.Model):
+    """Grid cell (see spatial.CELL_DEGREES) that a trip's route passes through; one row per trip and cell."""
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name='cells')
+    cell = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cell', 'trip'], name='uniq_trip_cell'),
+        ]
+
+    def __str__(self) -> str:
+        return f"TripCell:{self.trip_id}@{self.cell}"
+
+
+class DriverDailyMileage(models.Model):
+    """
+    Per-driver per-day trip mileage rollup, maintained on trip submit (see leaderboard.record_trip_mileage).
+    Period leaderboards sum at most <days in period> rows per driver instead of joining all trips.
+    Rebuild from Trip with `manage.py rebuild_mileage_rollup`.
+    """
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='daily_mileage')
+    date = models.DateField()
+    mileage = models.IntegerField(default=0)
+    trips = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['driver', 'date'], name='uniq_driver_daily_mileage'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'driver']),
+        ]
+
+    def __str__(self) -> str:
+        return f"DailyMileage:{self.driver_id}@{self.date} {self.mileage}mi"
+
+
+class DriverDailyDuty(models.Model):
+    """
+    Per-driver per-day duty hours from ELD logs, maintained whenever a log is written (see cycle.py).
+    offDutyBefore / offDutyAfter are the off-duty hours before the day's first and after its last on-duty
+    segment, so 34-hour restarts spanning midnight are found without reading logEntries again.
+    The rolling 70h/8-day cycle reads at most 8 rows per driver; rebuild with `manage.py rebuild_duty_rollup`.
+    """
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='daily_duty')
+    date = models.DateField()
+    onDutyHours = models.FloatField(default=0)
+    drivingHours = models.FloatField(default=0)
+    offDutyBefore = models.FloatField(default=24)
+    offDutyAfter = models.FloatField(default=24)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['driver', 'date'], name='uniq_driver_daily_duty'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'driver']),
+        ]
+
+    def __str__(self) -> str:
+        return f"DailyDuty:{self.driver_id}@{self.date} {self.onDutyHours}h"
+
+
+def latest_approval_prefetch(prefix: str = '') -> Prefetch:
+    """
+    Prefetch only the newest ApprovalRequest (by date, id) per ELD log, with its supervisor user.
+    A ROW_NUMBER window keeps it to one query regardless of how many approvals a log has.
+    The result lands on each log as `latest_approvals` (a list of zero or one items).
+    Pass prefix='eldlog__' to prefetch through a relation pointing at ELDLog.
+    """
+    latest = (
+        ApprovalRequest.objects.select_related('supervisor__user')
+        .annotate(_rank=Window(RowNumber(), partition_by=[F('eldlog_id')], order_by=[F('date').desc(), F('id').desc()]))
+        .filter(_rank=1)
+    )
+    return Prefetch(f'{prefix}approvalrequest_set', queryset=latest, to_attr='latest_approvals')
+
+
+class ELDLogQuerySet(models.QuerySet):
+    def with_latest_approval(self):
+        return self.prefetch_related(latest_approval_prefetch())
+
+
 class ELDLog(models.Model):
     driver = models.ForeignKey(Driver, on_delete=models.CASCADE)
-    date = models.DateField(auto_now_add=True)
+    # Defaults to today; backfilled logs carry the day they record
+    date = models.DateField(default=date.today)
     logEntries = models.JSONField(default=list)  # [{start, end, status}]
     trip = models.ForeignKey(Trip, on_delete=models.SET_NULL, null=True, blank=True, related_name='eldlogs')
     STATUS_CHOICES = (
@@ -112,6 +262,10 @@ class ELDLog(models.Model):
         ('Completed', 'Completed'),
     )
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default='Submitted')
+    # Watermark for the HOS violation scan (see violations.py); queryset .update() calls must set it too
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ELDLogQuerySet.as_manager()
 
     class Meta:
         indexes = [
@@ -119,11 +273,86 @@ class ELDLog(models.Model):
             models.Index(fields=['date']),
             models.Index(fields=['status']),
             models.Index(fields=['trip']),
+            models.Index(fields=['driver', '-date', '-id']),
         ]
 
     def __str__(self) -> str:
         return f"ELDLog:{self.driver.user.username}@{self.date} [{self.status}]"
 
+class DutySegment(models.Model):
+    """
+    One {start, end, status} entry of an ELD log as an indexed row (see segments.py), so time-range and
+    status questions run in SQL. Written with every log write; ELDLog.logEntries stays the API format.
+    start / end are hours from the log day's midnight (0-24).
+    """
+    OFF_DUTY, SLEEPER_BERTH, DRIVING, ON_DUTY = range(4)
+    STATUS_CHOICES = (
+        (OFF_DUTY, 'Off Duty'),
+        (SLEEPER_BERTH, 'Sleeper Berth'),
+        (DRIVING, 'Driving'),
+        (ON_DUTY, 'On Duty'),
+    )
+    log = models.ForeignKey(ELDLog, on_delete=models.CASCADE, related_name='segments')
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='duty_segments')
+    date = models.DateField()
+    start = models.FloatField()
+    end = models.FloatField()
+    hours = models.FloatField()
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'date', 'hours']),
+            models.Index(fields=['date', 'status', 'start']),
+            models.Index(fields=['driver', '-date', '-id']),
+        ]
+
+    def __str__(self) -> str:
+        return f"DutySegment:{self.driver_id}@{self.date} {self.start}-{self.end} {self.get_status_display()}"
+
+
+class HOSViolation(models.Model):
+    """
+    An HOS check a log failed, written by `manage.py scan_hos_violations` (see violations.py).
+    value is the measured hours and limit the allowed hours of the rule.
+    """
+    RULE_CHOICES = (
+        ('driving', 'Driving limit'),
+        ('window', 'On-duty window'),
+        ('break', 'Break required'),
+        ('cycle', 'Cycle limit'),
+    )
+    log = models.ForeignKey(ELDLog, on_delete=models.CASCADE, related_name='hos_violations')
+    driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='hos_violations')
+    date = models.DateField()
+    rule = models.CharField(max_length=16, choices=RULE_CHOICES)
+    value = models.FloatField()
+    limit = models.FloatField()
+    detected_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['log', 'rule'], name='uniq_hos_violation_rule'),
+        ]
+        indexes = [
+            models.Index(fields=['driver', '-date', '-id']),
+            models.Index(fields=['rule', '-date', '-id']),
+            models.Index(fields=['-date', '-id']),
+        ]
+
+    def __str__(self) -> str:
+        return f"HOSViolation:{self.driver_id}@{self.date} {self.rule}"
+
+
+class ScanWatermark(models.Model):
+    """How far a periodic scan has processed rows by updated_at; one row per scan name."""
+    name = models.CharField(max_length=64, unique=True)
+    scanned_until = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"ScanWatermark:{self.name}@{self.scanned_until.isoformat()}"
+
+
 class ApprovalRequest(models.Model):
     trip = models.ForeignKey('Trip', on_delete=models.CASCADE)
     eldlog = models.ForeignKey(ELDLog, on_delete=models.CASCADE)
@@ -136,6 +365,8 @@ class ApprovalRequest(models.Model):
             models.Index(fields=['supervisor']),
             models.Index(fields=['status']),
             models.Index(fields=['date']),
+            # Supervisor queue (by-supervisor?status=...) in keyset order
+            models.Index(fields=['supervisor', 'status', '-date', '-id']),
         ]
         constraints = [
             # Prevent multiple Pending approvals for the same trip/log pair
@@ -148,3 +379,52 @@ class ApprovalRequest(models.Model):
 
     def __str__(self) -> str:
         return f"Approval:{self.eldlog_id}->{self.supervisor.user.username} [{self.status}]"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response of a submit made with an Idempotency-Key header, replayed for retries of the same request.
+    A row with status_code=None is a claim held by a request still in progress.
+    Expired rows are removed by `manage.py purge_idempotency_keys` (see idempotency.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    # sha256 of the request body: a key reused for a different payload is rejected, not replayed
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='uniq_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self) -> str:
+        return f"IdempotencyKey:{self.scope}:{self.key} [{self.status_code}]"
+
+
+class CachedRoute(models.Model):
+    """
+    Upstream OSRM response for a normalized (quantized) route request: the persistent tier of the
+    /api/route/ proxy (see routing.py). Expired rows are refetched and overwritten on next use.
+    """
+    # sha256 of `request`
+    key = models.CharField(max_length=64, unique=True)
+    request = models.TextField()
+    response = models.TextField()
+    fetched_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self) -> str:
+        return f"CachedRoute:{self.request[:80]}"
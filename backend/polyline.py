@@ -0,0 +1,253 @@
+"""
+Route geometry codec.
+
+Trips store their route as a Google encoded polyline (precision 5, ~1 m), which is several times
+smaller than the JSON [[lat, lng], ...] text OSRM returns. Incoming geometry in either form is
+normalized with `normalize_polyline`; responses render it in the format the client asks for:
+- 'encoded': the stored Google polyline string (default)
+- 'delta': base64 of little-endian int32 (lat, lng) deltas in 1e-5 degrees, for typed-array clients
+- 'coords': [[lat, lng], ...] for clients without a decoder
+
+Encoding and decoding are vectorized with numpy, so long OSRM `overview=full` routes do not loop
+per point in Python.
+
+Map views ask for ?zoom=<level> or ?simplify=<tolerance in degrees> to get a Douglas-Peucker simplified
+route. Variants for ZOOM_LEVELS are computed once when a route is first stored (on its shared
+RouteGeometry row, see backend/geometry.py); other tolerances are simplified on demand and cached
+by geometry hash.
+"""
+import base64
+import hashlib
+import json
+
+import numpy as np
+from django.core.cache import cache
+
+PRECISION = 5
+SCALE = 10 ** PRECISION
+POLYLINE_FORMATS = ('encoded', 'delta', 'coords')
+DEFAULT_POLYLINE_FORMAT = 'encoded'
+# A zigzagged 32-bit delta needs at most 7 five-bit chunks
+_MAX_CHUNKS = 7
+_SHIFTS = np.arange(_MAX_CHUNKS, dtype=np.int64) * 5
+
+
+def _as_points(coords) -> np.ndarray:
+    points = np.asarray(coords, dtype=np.float64)
+    if points.size == 0:
+        return points.reshape(0, 2)
+    if points.ndim != 2 or points.shape[1] != 2 or not np.isfinite(points).all():
+        raise ValueError('coordinates must be a list of [lat, lng] pairs')
+    if (np.abs(points[:, 0]) > 90).any() or (np.abs(points[:, 1]) > 180).any():
+        raise ValueError('coordinates out of range')
+    return points
+
+
+def _deltas(points: np.ndarray) -> np.ndarray:
+    ints = np.round(points * SCALE).astype(np.int64)
+    return np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+
+
+def encode(coords) -> str:
+    """[[lat, lng], ...] -> Google encoded polyline."""
+    points = _as_points(coords)
+    if not len(points):
+        return ''
+    deltas = _deltas(points).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    # Chunks needed per value: 1 + number of 5-bit boundaries it crosses
+    lengths = 1 + (values[:, None] >= (np.int64(1) << _SHIFTS[1:])).sum(axis=1)
+    chunks = (values[:, None] >> _SHIFTS) & 0x1F
+    index = np.arange(_MAX_CHUNKS)
+    # Every chunk but a value's last carries the 0x20 continuation bit
+    chunks = chunks | np.where(index < (lengths[:, None] - 1), 0x20, 0)
+    chars = (chunks + 63)[index < lengths[:, None]]
+    return chars.astype(np.uint8).tobytes().decode('ascii')
+
+
+def decode(encoded: str) -> np.ndarray:
+    """Google encoded polyline -> float array of shape (n, 2). Raises ValueError on malformed input."""
+    if not encoded:
+        return np.zeros((0, 2))
+    try:
+        raw = np.frombuffer(encoded.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    except UnicodeEncodeError:
+        raise ValueError('polyline must be ASCII')
+    if (raw < 0).any() or (raw > 63).any():
+        raise ValueError('invalid polyline character')
+    ends = (raw & 0x20) == 0
+    if not ends[-1]:
+        raise ValueError('truncated polyline')
+    starts = np.flatnonzero(np.concatenate(([True], ends[:-1])))
+    position = np.arange(len(raw)) - np.repeat(starts, np.diff(np.append(starts, len(raw))))
+    if (position >= _MAX_CHUNKS).any():
+        raise ValueError('polyline value too large')
+    values = np.add.reduceat((raw & 0x1F) << (position * 5), starts)
+    if len(values) % 2:
+        raise ValueError('polyline has an odd number of values')
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1).reshape(-1, 2)
+    return np.cumsum(deltas, axis=0) / SCALE
+
+
+def encode_deltas(coords) -> str:
+    """[[lat, lng], ...] -> base64 packed int32 delta buffer."""
+    return base64.b64encode(_deltas(_as_points(coords)).astype('<i4').tobytes()).decode('ascii')
+
+
+def decode_deltas(packed: str) -> np.ndarray:
+    deltas = np.frombuffer(base64.b64decode(packed), dtype='<i4').astype(np.int64).reshape(-1, 2)
+    return np.cumsum(deltas, axis=0) / SCALE
+
+
+def normalize_polyline(value):
+    """
+    Store form (Google encoded) of submitted geometry: a JSON text or list of [lat, lng] pairs, or an
+    already encoded polyline. Empty input gives None; anything else unreadable raises ValueError.
+    """
+    if value is None or value == '' or value == []:
+        return None
+    if isinstance(value, str):
+        text = value.strip()
+        if not text.startswith('['):
+            decode(text)
+            return text
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            raise ValueError('polyline is neither a coordinate list nor an encoded polyline')
+    if not isinstance(value, (list, tuple)):
+        raise ValueError('polyline is neither a coordinate list nor an encoded polyline')
+    return encode(value) or None
+
+
+def render_polyline(encoded, output: str = DEFAULT_POLYLINE_FORMAT):
+    """Stored polyline in the requested output format (see POLYLINE_FORMATS)."""
+    if not encoded or output == 'encoded':
+        return encoded
+    try:
+        points = decode(encoded)
+    except ValueError:
+        # Rows not yet normalized by the data migration are passed through untouched
+        return encoded
+    if output == 'delta':
+        return encode_deltas(points)
+    return np.round(points, PRECISION).tolist()
+
+
+# --- Simplification ---
+
+# Zoom levels whose simplified variants are precomputed at submit (thumbnail to city scale)
+ZOOM_LEVELS = (4, 6, 8, 10, 12)
+MAX_ZOOM = 22
+SIMPLIFY_CACHE_KEY = 'polyline:simplify:{digest}:{tolerance}'
+SIMPLIFY_CACHE_TTL = 24 * 3600
+
+
+def zoom_tolerance(zoom: int) -> float:
+    """About one screen pixel, in degrees, at a web-map zoom level (256 px tiles)."""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def simplify(points, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker: keep the points needed to stay within `tolerance` degrees of the route.
+    Each split measures all points of a span against its chord in one numpy pass; longitudes are
+    scaled by cos(latitude) so the tolerance is roughly isotropic.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return points
+    xy = np.column_stack((points[:, 1] * np.cos(np.radians(points[:, 0].mean())), points[:, 0]))
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        span = xy[first + 1:last]
+        ab = b - a
+        length_sq = ab @ ab
+        if length_sq == 0:
+            dist = np.hypot(*(span - a).T)
+        else:
+            # Distance to the chord segment (projection clamped to its endpoints)
+            t = np.clip((span - a) @ ab / length_sq, 0.0, 1.0)
+            dist = np.hypot(*(span - (a + t[:, None] * ab)).T)
+        i = int(dist.argmax())
+        if dist[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def simplified_variants(encoded) -> dict:
+    """{str(zoom): encoded} for ZOOM_LEVELS, omitting levels where simplification drops no points."""
+    if not encoded:
+        return {}
+    try:
+        points = decode(encoded)
+    except ValueError:
+        return {}
+    variants = {}
+    for zoom in ZOOM_LEVELS:
+        reduced = simplify(points, zoom_tolerance(zoom))
+        if len(reduced) < len(points):
+            variants[str(zoom)] = encode(reduced)
+    return variants
+
+
+def _simplify_cached(encoded: str, tolerance: float) -> str:
+    digest = hashlib.sha1(encoded.encode('ascii', 'replace')).hexdigest()
+    key = SIMPLIFY_CACHE_KEY.format(digest=digest, tolerance=f'{tolerance:.8g}')
+    result = cache.get(key)
+    if result is None:
+        try:
+            result = encode(simplify(decode(encoded), tolerance))
+        except ValueError:
+            result = encoded
+        cache.set(key, result, timeout=SIMPLIFY_CACHE_TTL)
+    return result
+
+
+def select_geometry(encoded, variants, detail=None):
+    """
+    Encoded polyline to render for a `detail` request (see geometry_detail_from_request):
+    ('zoom', z) uses the nearest precomputed level at or above z, so it is never coarser than asked;
+    ('tolerance', t) is simplified on demand (cached); None is the full route.
+    """
+    if not encoded or detail is None:
+        return encoded
+    kind, value = detail
+    if kind == 'zoom':
+        levels = [zoom for zoom in ZOOM_LEVELS if zoom >= value]
+        if not levels:
+            return encoded
+        # Levels without a stored variant had nothing to drop at that tolerance
+        return (variants or {}).get(str(levels[0]), encoded)
+    return _simplify_cached(encoded, value)
+
+
+def geometry_detail_from_request(request):
+    """('zoom', level) from ?zoom=, ('tolerance', degrees) from ?simplify=, else None (full resolution)."""
+    params = getattr(request, 'query_params', {}) if request is not None else {}
+    try:
+        if params.get('zoom') not in (None, ''):
+            return 'zoom', max(0, min(MAX_ZOOM, int(params['zoom'])))
+        if params.get('simplify') not in (None, ''):
+            tolerance = float(params['simplify'])
+            if tolerance > 0 and np.isfinite(tolerance):
+                return 'tolerance', tolerance
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def polyline_format_from_request(request) -> str:
+    """?polyline_format=encoded|delta|coords; unknown values fall back to the default."""
+    value = (request.query_params.get('polyline_format') or '').lower().strip() if request is not None else ''
+    return value if value in POLYLINE_FORMATS else DEFAULT_POLYLINE_FORMAT
@@ -0,0 +1,216 @@
+"""
+Ordered rank index for leaderboards.
+
+Each board ('all', 'week:<start>', 'month:<start>', optionally suffixed with ':<scope>:<value>'
+for supervisor/office/terminal boards) is a set of (driver id, miles) ordered by
+(-miles, id). It answers "top N" and "rank of driver X" in O(log n) without scanning Driver/rollup rows:
+- RedisRankIndex: one sorted set per board, used when REDIS_URL is configured (django-redis)
+- LocalRankIndex: in-process bisect-ordered lists; boards are rebuilt from SQL when another
+  process has changed them (a per-board generation counter is kept in the shared cache). Every
+  write bumps that counter, including writes to boards this process has not loaded.
+
+An increment for a member the board was built without (a driver added since) invalidates the
+board, which is then rebuilt from SQL on its next read.
+
+Rank is competition style, matching SQL `1 + COUNT(miles > mine)`: tied drivers share a rank.
+"""
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'rankindex'
+# Redis scores pack (miles, id) into one double: miles * ID_SPACE + (ID_SPACE - 1 - id).
+# Higher miles sort first, then lower ids, which is the leaderboard order; exact up to 2**33 miles.
+ID_SPACE = 1 << 20
+# Period boards are keyed by their start date, so yesterday's boards simply age out
+PERIOD_BOARD_TTL = 2 * 24 * 3600
+
+
+def is_lifetime_board(board: str) -> bool:
+    return board == 'all' or board.startswith('all:')
+
+
+class LocalRankIndex:
+    def __init__(self):
+        self._boards = {}
+        self._lock = threading.RLock()
+
+    def _gen_key(self, board):
+        return f'{KEY_PREFIX}:gen:{board}'
+
+    def _current(self, board):
+        data = self._boards.get(board)
+        if data is None:
+            return None
+        # Another process bumped the generation: our copy is stale
+        if cache.get(self._gen_key(board), 0) != data['gen']:
+            del self._boards[board]
+            return None
+        return data
+
+    def _bump(self, board, data=None):
+        """Advance the shared generation so other processes drop their copy; `data` (if loaded here) keeps up."""
+        key = self._gen_key(board)
+        cache.add(key, 0, timeout=None)
+        try:
+            gen = cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+            gen = 1
+        if data is not None:
+            data['gen'] = gen
+
+    def has(self, board) -> bool:
+        with self._lock:
+            return self._current(board) is not None
+
+    def load(self, board, scores: dict) -> None:
+        with self._lock:
+            data = {
+                'scores': dict(scores),
+                'keys': sorted((-miles, member) for member, miles in scores.items()),
+                'gen': 0,
+            }
+            self._bump(board, data)
+            self._boards[board] = data
+
+    def _put(self, data, member, miles):
+        old = data['scores'].get(member)
+        if old is not None:
+            keys = data['keys']
+            del keys[bisect_left(keys, (-old, member))]
+        data['scores'][member] = miles
+        insort(data['keys'], (-miles, member))
+
+    def set(self, board, member: int, miles: int) -> None:
+        with self._lock:
+            data = self._current(board)
+            if data is not None:
+                self._put(data, member, miles)
+            self._bump(board, data)
+
+    def incr(self, board, member: int, delta: int) -> None:
+        with self._lock:
+            data = self._current(board)
+            if data is not None and member in data['scores']:
+                self._put(data, member, data['scores'][member] + delta)
+            else:
+                # Unknown member's total is not known here: rebuild the board from SQL on next read
+                self._boards.pop(board, None)
+                data = None
+            self._bump(board, data)
+
+    def rank(self, board, member: int):
+        """(miles, rank) or None when the board or member is not indexed."""
+        with self._lock:
+            data = self._current(board)
+            if data is None or member not in data['scores']:
+                return None
+            miles = data['scores'][member]
+            return miles, bisect_left(data['keys'], (-miles,)) + 1
+
+    def remove(self, board, member: int) -> None:
+        with self._lock:
+            data = self._current(board)
+            if data is not None and member in data['scores']:
+                old = data['scores'].pop(member)
+                keys = data['keys']
+                del keys[bisect_left(keys, (-old, member))]
+            self._bump(board, data)
+
+    def top(self, board, n: int):
+        with self._lock:
+            data = self._current(board)
+            if data is None:
+                return []
+            return [(member, -neg) for neg, member in data['keys'][:n]]
+
+    def drop(self, board) -> None:
+        with self._lock:
+            self._boards.pop(board, None)
+            cache.delete(self._gen_key(board))
+
+
+class RedisRankIndex:
+    def __init__(self, client):
+        self.client = client
+
+    def _key(self, board):
+        return f'{KEY_PREFIX}:{board}'
+
+    @staticmethod
+    def _score(member, miles):
+        return miles * ID_SPACE + (ID_SPACE - 1 - member)
+
+    @staticmethod
+    def _miles(score):
+        return int(score) // ID_SPACE
+
+    def has(self, board) -> bool:
+        return bool(self.client.exists(self._key(board)))
+
+    def load(self, board, scores: dict) -> None:
+        key = self._key(board)
+        tmp = f'{key}:building'
+        pipe = self.client.pipeline()
+        pipe.delete(tmp)
+        if scores:
+            pipe.zadd(tmp, {str(m): self._score(m, miles) for m, miles in scores.items()})
+            # Swap in atomically so readers never see a half-built board
+            pipe.rename(tmp, key)
+            if not is_lifetime_board(board):
+                pipe.expire(key, PERIOD_BOARD_TTL)
+        else:
+            pipe.delete(key)
+        pipe.execute()
+
+    def set(self, board, member: int, miles: int) -> None:
+        key = self._key(board)
+        if self.client.exists(key):
+            self.client.zadd(key, {str(member): self._score(member, miles)})
+
+    def incr(self, board, member: int, delta: int) -> None:
+        # XX: only touch members already on the board; the id component of the score is preserved
+        key = self._key(board)
+        if self.client.zadd(key, {str(member): delta * ID_SPACE}, xx=True, incr=True) is None:
+            # Not on the board (a driver added since it was built): rebuild from SQL on next read
+            self.client.delete(key)
+
+    def rank(self, board, member: int):
+        key = self._key(board)
+        score = self.client.zscore(key, str(member))
+        if score is None:
+            return None
+        miles = self._miles(score)
+        higher = self.client.zcount(key, (miles + 1) * ID_SPACE, '+inf')
+        return miles, higher + 1
+
+    def remove(self, board, member: int) -> None:
+        self.client.zrem(self._key(board), str(member))
+
+    def top(self, board, n: int):
+        rows = self.client.zrevrange(self._key(board), 0, n - 1, withscores=True)
+        return [(int(member), self._miles(score)) for member, score in rows]
+
+    def drop(self, board) -> None:
+        self.client.delete(self._key(board))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_rank_index():
+    """Redis-backed index when REDIS_URL is configured, otherwise the in-process fallback."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                if getattr(settings, 'REDIS_URL', None):
+                    from django_redis import get_redis_connection
+                    _index = RedisRankIndex(get_redis_connection('default'))
+                else:
+                    _index = LocalRankIndex()
+    return _index
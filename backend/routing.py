@@ -0,0 +1,217 @@
+"""
+Caching proxy for OSRM-compatible route requests.
+
+The frontend asks /api/route/v1/<profile>/<lng,lat;lng,lat...>?overview=&geometries= instead of
+calling the public OSRM server from every browser. Lookups go through three tiers:
+- an in-process LRU of recent responses (ROUTE_CACHE_MEMORY_ENTRIES)
+- the CachedRoute table, shared by all workers and surviving restarts
+- the upstream server at settings.OSRM_URL (a local OSRM or a stub in tests)
+Coordinates are rounded to ROUTE_QUANTIZE_DIGITS decimals (4 is ~11 m) before keying and before the
+upstream call, so the same depot-to-depot lane maps to one entry. Identical lookups in flight at the
+same time are coalesced: one thread asks the database and upstream, the others wait for its answer.
+Only successful ('Ok') responses are cached; upstream errors are passed through (or 502 when unreachable).
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import timedelta
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import CachedRoute
+
+MAX_ROUTE_POINTS = 25
+# Query options forwarded upstream, with the values accepted for each
+ROUTE_OPTIONS = {
+    'overview': ('simplified', 'full', 'false'),
+    'geometries': ('polyline', 'polyline6', 'geojson'),
+    'steps': ('true', 'false'),
+    'alternatives': ('true', 'false'),
+}
+_PROFILE_RE = re.compile(r'^[a-z][a-z0-9_-]{0,31}$')
+# Seconds a coalesced lookup waits for the thread fetching it
+COALESCE_WAIT_SECONDS = 30
+
+
+class RouteQueryError(ValueError):
+    """The request cannot be proxied (bad coordinates, profile or options)."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def quantize_coordinates(text: str, digits: int) -> str:
+    """'lng,lat;lng,lat' with each value rounded to `digits` decimals. Raises RouteQueryError."""
+    pairs = [p for p in text.split(';') if p]
+    if not 2 <= len(pairs) <= MAX_ROUTE_POINTS:
+        raise RouteQueryError(f'between 2 and {MAX_ROUTE_POINTS} coordinates are required')
+    out = []
+    for pair in pairs:
+        try:
+            lng, lat = (float(v) for v in pair.split(','))
+        except ValueError:
+            raise RouteQueryError(f'invalid coordinate {pair!r}; expected lng,lat')
+        if not (-180 <= lng <= 180 and -90 <= lat <= 90):
+            raise RouteQueryError(f'coordinate {pair!r} out of range')
+        out.append(f'{round(lng, digits):.{digits}f},{round(lat, digits):.{digits}f}')
+    return ';'.join(out)
+
+
+def route_request_path(profile: str, coordinates: str, params) -> str:
+    """Normalized 'route/v1/<profile>/<quantized coords>?<sorted options>' for a request. Raises RouteQueryError."""
+    if not _PROFILE_RE.match(profile or ''):
+        raise RouteQueryError('invalid profile')
+    coords = quantize_coordinates(coordinates, int(_setting('ROUTE_QUANTIZE_DIGITS', 4)))
+    options = {}
+    for name, allowed in ROUTE_OPTIONS.items():
+        value = params.get(name)
+        if value in (None, ''):
+            continue
+        if value not in allowed:
+            raise RouteQueryError(f'{name} must be one of: {", ".join(allowed)}')
+        options[name] = value
+    query = f'?{urlencode(sorted(options.items()))}' if options else ''
+    return f'route/v1/{profile}/{coords}{query}'
+
+
+def route_cache_key(path: str) -> str:
+    return hashlib.sha256(path.encode('ascii')).hexdigest()
+
+
+class RouteMemoryCache:
+    """Thread-safe LRU of {key: (body, expires at monotonic time)}."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, body: str, ttl: float) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (body, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SingleFlight:
+    """Run one call per key at a time; callers arriving while it runs share its result (or exception)."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """(result, shared): shared is True when another caller's call produced the result."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(timeout=timeout), True
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+_memory = None
+_memory_lock = threading.Lock()
+_in_flight = SingleFlight()
+
+
+def route_memory() -> RouteMemoryCache:
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = RouteMemoryCache(int(_setting('ROUTE_CACHE_MEMORY_ENTRIES', 512)))
+        return _memory
+
+
+def _fetch_upstream(path: str):
+    """(status, body text) from the upstream server; raises URLError/OSError when it cannot be reached."""
+    url = f"{_setting('OSRM_URL', 'https://router.project-osrm.org').rstrip('/')}/{path}"
+    request = Request(url, headers={'Accept': 'application/json', 'User-Agent': 'tripviser-route-proxy'})
+    try:
+        with urlopen(request, timeout=float(_setting('OSRM_TIMEOUT', 10))) as res:
+            return res.status, res.read().decode('utf-8')
+    except HTTPError as exc:
+        # OSRM reports NoRoute/InvalidQuery as 400 with a JSON body; pass those through
+        return exc.code, exc.read().decode('utf-8', 'replace')
+
+
+def _is_ok(status: int, body: str) -> bool:
+    if status != 200:
+        return False
+    try:
+        return json.loads(body).get('code') == 'Ok'
+    except (ValueError, AttributeError):
+        return False
+
+
+def _lookup(key: str, path: str):
+    """(status, body, source) from the database tier, else upstream (storing successes in both tiers)."""
+    ttl = int(_setting('ROUTE_CACHE_TTL', 7 * 24 * 3600))
+    now = timezone.now()
+    stored = CachedRoute.objects.filter(key=key, expires_at__gt=now).values_list('response', flat=True).first()
+    if stored is not None:
+        route_memory().set(key, stored, ttl)
+        return 200, stored, 'db'
+    try:
+        status, body = _fetch_upstream(path)
+    except (URLError, OSError) as exc:
+        return 502, json.dumps({'code': 'UpstreamError', 'message': f'routing service unavailable: {exc}'}), 'upstream'
+    if _is_ok(status, body):
+        CachedRoute.objects.update_or_create(
+            key=key, defaults={'request': path, 'response': body, 'expires_at': now + timedelta(seconds=ttl)}
+        )
+        route_memory().set(key, body, ttl)
+    return status, body, 'upstream'
+
+
+def get_route(profile: str, coordinates: str, params):
+    """
+    (status, JSON body text, source) for a route request; source is 'memory', 'db', 'upstream' or
+    'coalesced' (answered by a concurrent identical lookup). Raises RouteQueryError for bad input.
+    """
+    path = route_request_path(profile, coordinates, params)
+    key = route_cache_key(path)
+    body = route_memory().get(key)
+    if body is not None:
+        return 200, body, 'memory'
+    (status, body, source), shared = _in_flight.do(key, lambda: _lookup(key, path), timeout=COALESCE_WAIT_SECONDS)
+    return status, body, 'coalesced' if shared else source
@@ -0,0 +1,67 @@
+"""
+Duty-status segments of ELD logs as indexed DutySegment rows.
+
+ELDLog.logEntries stays the API format; every log write also replaces the log's DutySegment rows
+(one delete, one bulk insert for a whole batch of logs). Questions such as "Driving segments over 4h
+this week" or "who is on duty right now" are then filtered in SQL on (status, date, hours) and
+(date, status, start) instead of decoding every log's JSON in Python.
+
+Entries the log screen cannot draw (unknown status, unreadable or empty hour ranges) get no row.
+`manage.py backfill_duty_segments` rebuilds the rows for existing logs.
+"""
+from django.db import transaction
+
+from .eldlogs import DUTY_STATUSES, HOURS_PER_DAY
+from .models import DutySegment, ELDLog
+
+STATUS_CODES = {name: code for code, name in enumerate(DUTY_STATUSES)}
+
+
+def segment_fields(entries) -> list:
+    """[{start, end, hours, status code}] for one log's entries, clipped to the day and in time order."""
+    fields = []
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or entry.get('status') not in STATUS_CODES:
+            continue
+        try:
+            start = min(max(float(entry.get('start')), 0.0), HOURS_PER_DAY)
+            end = min(max(float(entry.get('end')), 0.0), HOURS_PER_DAY)
+        except (TypeError, ValueError):
+            continue
+        if end > start:
+            fields.append({'start': start, 'end': end, 'hours': end - start, 'status': STATUS_CODES[entry['status']]})
+    fields.sort(key=lambda f: f['start'])
+    return fields
+
+
+def _segments(logs) -> list:
+    return [
+        DutySegment(log_id=log.id, driver_id=log.driver_id, date=log.date, **fields)
+        for log in logs
+        for fields in segment_fields(log.logEntries)
+    ]
+
+
+def write_duty_segments(logs) -> None:
+    """Replace the DutySegment rows of the given logs from their logEntries. Call inside the write transaction."""
+    logs = list(logs)
+    if not logs:
+        return
+    DutySegment.objects.filter(log_id__in=[log.id for log in logs]).delete()
+    DutySegment.objects.bulk_create(_segments(logs))
+
+
+def backfill_duty_segments(batch_size: int = 500) -> int:
+    """Rebuild the rows of every log, keyset-paged by id; returns logs processed."""
+    done = 0
+    last_id = 0
+    while True:
+        batch = list(
+            ELDLog.objects.filter(id__gt=last_id).order_by('id').only('id', 'driver_id', 'date', 'logEntries')[:batch_size]
+        )
+        if not batch:
+            return done
+        with transaction.atomic():
+            write_duty_segments(batch)
+        done += len(batch)
+        last_id = batch[-1].id
@@ -1,13 +1,247 @@
+from django.db.models import OuterRef, Q, Subquery
 from rest_framework import serializers
-from .models import User, Driver, Supervisor, Trip, ELDLog, ApprovalRequest
+from .models import User, Driver, Supervisor, Trip, ELDLog, ApprovalRequest, Location, HOSViolation, DutySegment
+from .geometry import attach_geometries
+from .cycle import log_hos
+from .locations import attach_locations
+from .polyline import DEFAULT_POLYLINE_FORMAT, normalize_polyline, render_polyline, select_geometry
+from .spatial import trip_geometry_fields
 
-class UserSerializer(serializers.ModelSerializer):
+
+def _with_geometry(qs, prefix: str = ''):
+    # Trips sharing a lane get the same prefetched RouteGeometry, read once per queryset
+    return qs.prefetch_related(prefix + 'geometry')
+
+
+def render_trip_polyline(t: Trip, context):
+    """
+    Trip geometry at the requested detail (?zoom= / ?simplify=) in the requested format.
+    With a 'rendered_geometry' dict in the context, each shared geometry is rendered once per response.
+    """
+    if t.geometry_id is None:
+        return None
+    rendered = context.get('rendered_geometry')
+    if rendered is not None and t.geometry_id in rendered:
+        return rendered[t.geometry_id]
+    geometry = t.geometry
+    encoded = select_geometry(geometry.polyline, geometry.polyline_variants, context.get('geometry_detail'))
+    value = render_polyline(encoded, context.get('polyline_format', DEFAULT_POLYLINE_FORMAT))
+    if rendered is not None:
+        rendered[t.geometry_id] = value
+    return value
+
+
+def _trip_summary(t: Trip, context=None, with_polyline: bool = True):
+    summary = {
+        'id': t.id,
+        'start': t.start,
+        'end': t.end,
+        'stops': t.stops or [],
+        'date': t.date,
+        'mileage': t.mileage,
+        'cycleUsed': t.cycleUsed,
+        'status': t.status,
+    }
+    if with_polyline:
+        summary['polyline'] = render_trip_polyline(t, context or {})
+    return summary
+
+
+def resolve_eldlog_trips(logs, with_geometry: bool = True):
+    """
+    Map ELDLog id -> Trip for a batch of logs using a bounded number of queries.
+    Resolution order per log matches the original per-row lookup:
+    1) explicit trip FK
+    2) latest Approved, else latest Pending, approval request's trip (one query)
+    3) nearest trip for the same driver on/before the log date, else on/after (one query)
+    with_geometry=True prefetches the shared route geometry of the fetched trips.
+    """
+    resolved = {log.id: None for log in logs}
+    pending = []
+    for log in logs:
+        if log.trip_id is not None:
+            resolved[log.id] = log.trip
+        else:
+            pending.append(log)
+    if not pending:
+        return resolved
+
+    # Approval-linked trips for every unresolved log in one query
+    linked = {}
+    approvals = (
+        ApprovalRequest.objects.filter(eldlog_id__in=[log.id for log in pending], status__in=['Approved', 'Pending'])
+        .select_related('trip')
+        .order_by('eldlog_id', '-date', '-id')
+    )
+    if with_geometry:
+        approvals = _with_geometry(approvals, 'trip__')
+    for ar in approvals:
+        current = linked.get(ar.eldlog_id)
+        # First row per log is the latest; an Approved row always wins over Pending
+        if current is None or (current.status != 'Approved' and ar.status == 'Approved'):
+            linked[ar.eldlog_id] = ar
+    remaining = []
+    for log in pending:
+        ar = linked.get(log.id)
+        if ar is not None and ar.trip is not None:
+            resolved[log.id] = ar.trip
+        else:
+            remaining.append(log)
+    if not remaining:
+        return resolved
+
+    # Nearest trips: each log contributes the closest trip on/before and on/after its date.
+    # Both are correlated subqueries, so all candidates come back in a single statement.
+    windows = ELDLog.objects.filter(id__in=[log.id for log in remaining])
+    before = Trip.objects.filter(driver=OuterRef('driver'), date__lte=OuterRef('date')).order_by('-date', '-id').values('id')[:1]
+    after = Trip.objects.filter(driver=OuterRef('driver'), date__gte=OuterRef('date')).order_by('date', 'id').values('id')[:1]
+    candidates = Trip.objects.filter(
+        Q(id__in=windows.annotate(t=Subquery(before)).values('t'))
+        | Q(id__in=windows.annotate(t=Subquery(after)).values('t'))
+    )
+    if with_geometry:
+        candidates = _with_geometry(candidates)
+    by_driver = {}
+    for t in candidates:
+        by_driver.setdefault(t.driver_id, []).append(t)
+    for log in remaining:
+        trips = by_driver.get(log.driver_id, [])
+        # The candidate set always contains each log's true neighbours, so max/min over it is exact
+        on_or_before = [t for t in trips if t.date <= log.date]
+        if on_or_before:
+            resolved[log.id] = max(on_or_before, key=lambda t: (t.date, t.id))
+            continue
+        on_or_after = [t for t in trips if t.date >= log.date]
+        if on_or_after:
+            resolved[log.id] = min(on_or_after, key=lambda t: (t.date, t.id))
+    return resolved
+
+
+class FieldSelection:
+    """
+    Parsed ?fields= and ?expand= query parameters (comma-separated, dotted for nesting).
+    - expand=trip,trip.driver swaps the ID of a nested relation for the full object
+    - fields=id,status,trip.start limits output per level; naming a sub-field implies expanding its parent
+    With no parameters every field is rendered and nested relations are IDs.
+    """
+    def __init__(self, fields=None, expand=()):
+        self.fields = set(fields) if fields is not None else None
+        self.expand = set(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        params = getattr(request, 'query_params', {}) if request is not None else {}
+
+        def split(value):
+            return [part.strip() for part in (value or '').split(',') if part.strip()]
+        fields = split(params.get('fields'))
+        return cls(fields=fields or None, expand=split(params.get('expand')))
+
+    def names_under(self, path: str):
+        """Field names requested directly beneath `path` ('' is the top level), or None if unrestricted."""
+        if self.fields is None:
+            return None
+        prefix = f'{path}.' if path else ''
+        names = {f[len(prefix):].split('.')[0] for f in self.fields if f.startswith(prefix)}
+        return names or None
+
+    def expands(self, path: str) -> bool:
+        prefix = f'{path}.'
+        if path in self.expand or any(e.startswith(prefix) for e in self.expand):
+            return True
+        return any(f.startswith(prefix) for f in (self.fields or ()))
+
+    def requests(self, path: str) -> bool:
+        """Whether `path` was named explicitly in ?fields= or ?expand= (opts in to list-excluded fields)."""
+        return path in self.expand or path in (self.fields or ())
+
+    def includes(self, path: str) -> bool:
+        """Whether `path` is rendered at all: every ancestor must be expanded and kept by ?fields=."""
+        parent, _, name = path.rpartition('.')
+        if parent and not (self.includes(parent) and self.expands(parent)):
+            return False
+        names = self.names_under(parent)
+        return names is None or name in names
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin applying the request's FieldSelection (from context['selection']).
+    Relations listed in `expandable_fields` render as their declared ID field unless expanded.
+    Fields in `list_excluded_fields` are left out of list responses unless named in ?fields=/?expand=.
+    Works at any nesting depth; the dotted path is derived from the parent chain.
+    """
+    expandable_fields = {}
+    list_excluded_fields = ()
+
+    @property
+    def selection(self) -> FieldSelection:
+        return self.context.get('selection') or FieldSelection()
+
+    @property
+    def field_path(self) -> str:
+        parts = []
+        node = self
+        while node is not None:
+            if node.field_name:
+                parts.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(parts))
+
+    def child_path(self, name: str) -> str:
+        path = self.field_path
+        return f'{path}.{name}' if path else name
+
+    def is_expanded(self, name: str) -> bool:
+        return self.selection.expands(self.child_path(name))
+
+    @property
+    def in_list(self) -> bool:
+        node = self.parent
+        while node is not None:
+            if isinstance(node, serializers.ListSerializer):
+                return True
+            node = node.parent
+        return False
+
+    def omits_in_list(self, name: str) -> bool:
+        """True for a list-excluded field (dotted name below this serializer) that was not asked for."""
+        return self.in_list and not self.selection.requests(self.child_path(name))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.list_excluded_fields:
+            if name in fields and self.omits_in_list(name):
+                del fields[name]
+        for name, serializer_class in self.expandable_fields.items():
+            if name in fields and self.is_expanded(name):
+                fields[name] = serializer_class(read_only=True)
+        names = self.selection.names_under(self.field_path)
+        if names is not None:
+            fields = {name: field for name, field in fields.items() if name in names}
+        return fields
+
+
+class ELDLogListSerializer(serializers.ListSerializer):
+    """Resolve trips for the whole page before serializing individual rows."""
+    def to_representation(self, data):
+        logs = list(data.all() if hasattr(data, 'all') else data)
+        if 'trip' in self.child.fields:
+            with_geometry = self.child.is_expanded('trip') and not self.child.omits_in_list('trip.polyline')
+            self.child.context['eldlog_trips'] = resolve_eldlog_trips(logs, with_geometry=with_geometry)
+        if 'hos' in self.child.fields:
+            # One vectorized evaluation for the page's uncached logs (see hos.py)
+            self.child.context['eldlog_hos'] = log_hos(logs)
+        return super().to_representation(logs)
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'role']
 
-class DriverSerializer(serializers.ModelSerializer):
-    user = UserSerializer()
+class DriverSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
     name = serializers.SerializerMethodField()
     email = serializers.SerializerMethodField()
 
@@ -18,112 +252,138 @@ class DriverSerializer(serializers.ModelSerializer):
     def get_email(self, obj):
         return obj.user.email
 
+    expandable_fields = {'user': UserSerializer}
+
     class Meta:
         model = Driver
         fields = ['id', 'user', 'name', 'email', 'license', 'truck', 'trailer', 'office', 'terminal', 'status', 'mileage', 'cycleUsed', 'tripsToday', 'phone', 'recentTrips']
 
-class SupervisorSerializer(serializers.ModelSerializer):
-    user = UserSerializer()
+class SupervisorSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    expandable_fields = {'user': UserSerializer}
+
     class Meta:
         model = Supervisor
         fields = ['id', 'user', 'office', 'email']
 
-class TripSerializer(serializers.ModelSerializer):
-    driver = DriverSerializer()
+class PolylineField(serializers.Field):
+    """
+    Stored as a shared RouteGeometry (see geometry.py) plus derived trip columns (bounding box, length);
+    rendered at the context's geometry detail and polyline format (see polyline.py).
+    """
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def validate_empty_values(self, data):
+        # source='*' merges the returned dict into validated data, so null must clear the derived columns too
+        if data is None:
+            return True, trip_geometry_fields(None)
+        return super().validate_empty_values(data)
+
+    def to_representation(self, trip):
+        return render_trip_polyline(trip, self.context)
+
+    def to_internal_value(self, data):
+        try:
+            polyline = normalize_polyline(data)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return trip_geometry_fields(polyline)
+
+
+class TripSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    driver = serializers.PrimaryKeyRelatedField(read_only=True)
+    polyline = PolylineField(required=False)
+    # Location dictionary ids (see locations.py), resolved from start/end on every write
+    startLocation = serializers.PrimaryKeyRelatedField(source='start_location', read_only=True)
+    endLocation = serializers.PrimaryKeyRelatedField(source='end_location', read_only=True)
+    expandable_fields = {'driver': DriverSerializer}
+    # Lists ship without routes; fetch them from /trips/{id}/geometry/ or opt in with ?expand=polyline
+    list_excluded_fields = ('polyline',)
+
     class Meta:
         model = Trip
-        fields = ['id', 'driver', 'start', 'end', 'stops', 'date', 'mileage', 'cycleUsed', 'status', 'polyline']
+        fields = [
+            'id', 'driver', 'start', 'end', 'stops', 'date', 'mileage', 'reportedMileage', 'routeMileage',
+            'cycleUsed', 'status', 'polyline', 'startLocation', 'endLocation',
+        ]
+        # Set by the submit-time reconciliation (see mileage.py); routeMileage follows polyline edits
+        read_only_fields = ['reportedMileage', 'routeMileage']
+
+    def create(self, validated_data):
+        return super().create(attach_locations(attach_geometries([validated_data]))[0])
+
+    def update(self, instance, validated_data):
+        return super().update(instance, attach_locations(attach_geometries([validated_data]))[0])
+
+
+class LocationSerializer(serializers.ModelSerializer):
+    tripCount = serializers.IntegerField(source='trip_count', read_only=True)
 
-class ELDLogSerializer(serializers.ModelSerializer):
-    driver = DriverSerializer()
+    class Meta:
+        model = Location
+        fields = ['id', 'name', 'lat', 'lng', 'tripCount']
+
+class ELDLogSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    driver = serializers.PrimaryKeyRelatedField(read_only=True)
+    # Resolved (FK, approval or nearest-date) trip: its id by default, a summary when expanded
     trip = serializers.SerializerMethodField()
     approvalStatus = serializers.SerializerMethodField()
     approvalInfo = serializers.SerializerMethodField()
+    # Hours-of-service metrics and violations; only rendered when the context asks for them (?hos=1)
+    hos = serializers.SerializerMethodField()
+    expandable_fields = {'driver': DriverSerializer}
 
     class Meta:
         model = ELDLog
-        fields = ['id', 'driver', 'date', 'logEntries', 'trip', 'status', 'approvalStatus', 'approvalInfo']
+        fields = ['id', 'driver', 'date', 'logEntries', 'trip', 'status', 'approvalStatus', 'approvalInfo', 'hos']
+        # The recorded day is set by submit / bulk-submit, not by edits
+        read_only_fields = ['date']
+        list_serializer_class = ELDLogListSerializer
 
-    def get_trip(self, obj: ELDLog):
-        # Prefer explicit FK linkage when available
-        try:
-            t = getattr(obj, 'trip', None)
-            if t is not None:
-                return {
-                    'id': t.id,
-                    'start': t.start,
-                    'end': t.end,
-                    'stops': t.stops or [],
-                    'date': t.date,
-                    'mileage': t.mileage,
-                    'cycleUsed': t.cycleUsed,
-                    'status': t.status,
-                    'polyline': t.polyline,
-                }
-        except Exception:
-            pass
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get('hos'):
+            fields.pop('hos', None)
+        return fields
 
-        # Try to locate an explicitly linked trip via ApprovalRequest (prefer Approved)
-        try:
-            ar = obj.approvalrequest_set.select_related('trip').filter(status='Approved').order_by('-date', '-id').first()
-            if not ar:
-                ar = obj.approvalrequest_set.select_related('trip').filter(status='Pending').order_by('-date', '-id').first()
-            if ar and ar.trip:
-                t = ar.trip
-                return {
-                    'id': t.id,
-                    'start': t.start,
-                    'end': t.end,
-                    'stops': t.stops or [],
-                    'date': t.date,
-                    'mileage': t.mileage,
-                    'cycleUsed': t.cycleUsed,
-                    'status': t.status,
-                    'polyline': t.polyline,
-                }
-        except Exception:
-            pass
+    def get_hos(self, obj: ELDLog):
+        resolved = self.context.get('eldlog_hos')
+        if resolved is None or obj.id not in resolved:
+            resolved = log_hos([obj])
+        return resolved[obj.id]
 
-        # Fallback: nearest trip for same driver on or before the log date
-        try:
-            t = (
-                Trip.objects.filter(driver=obj.driver, date__lte=obj.date)
-                .order_by('-date', '-id')
-                .first()
-            )
-            if not t:
-                t = (
-                    Trip.objects.filter(driver=obj.driver, date__gte=obj.date)
-                    .order_by('date', 'id')
-                    .first()
-                )
-            if t:
-                return {
-                    'id': t.id,
-                    'start': t.start,
-                    'end': t.end,
-                    'stops': t.stops or [],
-                    'date': t.date,
-                    'mileage': t.mileage,
-                    'cycleUsed': t.cycleUsed,
-                    'status': t.status,
-                    'polyline': t.polyline,
-                }
-        except Exception:
-            pass
-        return None
+    def get_trip(self, obj: ELDLog):
+        # List serializers resolve the whole page up front; single objects resolve on demand
+        resolved = self.context.get('eldlog_trips')
+        if resolved is None or obj.id not in resolved:
+            resolved = resolve_eldlog_trips([obj])
+        t = resolved.get(obj.id)
+        if t is None:
+            return None
+        if not self.is_expanded('trip'):
+            return t.id
+        return _trip_summary(t, self.context, with_polyline=not self.omits_in_list('trip.polyline'))
+
+    def _latest_approval(self, obj: ELDLog):
+        # Use the window-prefetched row when the queryset provides it (see latest_approval_prefetch)
+        latest = getattr(obj, 'latest_approvals', None)
+        if latest is not None:
+            return latest[0] if latest else None
+        return obj.approvalrequest_set.select_related('supervisor__user').order_by('-date', '-id').first()
 
     def get_approvalStatus(self, obj: ELDLog):
         try:
             # Prefer latest approval status
-            ar = obj.approvalrequest_set.order_by('-date', '-id').first()
+            ar = self._latest_approval(obj)
             return ar.status if ar else None
         except Exception:
             return None
 
     def get_approvalInfo(self, obj: ELDLog):
         try:
-            ar = obj.approvalrequest_set.select_related('supervisor__user').order_by('-date', '-id').first()
+            ar = self._latest_approval(obj)
             if not ar:
                 return None
             sup_user = getattr(ar.supervisor, 'user', None)
@@ -138,10 +398,41 @@ class ELDLogSerializer(serializers.ModelSerializer):
         except Exception:
             return None
 
-class ApprovalRequestSerializer(serializers.ModelSerializer):
-    trip = TripSerializer()
-    eldlog = ELDLogSerializer()
-    supervisor = SupervisorSerializer()
+class HOSViolationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    driver = serializers.PrimaryKeyRelatedField(read_only=True)
+    detectedAt = serializers.DateTimeField(source='detected_at', read_only=True)
+    expandable_fields = {'driver': DriverSerializer}
+
+    class Meta:
+        model = HOSViolation
+        fields = ['id', 'log', 'driver', 'date', 'rule', 'value', 'limit', 'detectedAt']
+
+class DutySegmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    driver = serializers.PrimaryKeyRelatedField(read_only=True)
+    status = serializers.CharField(source='get_status_display', read_only=True)
+    expandable_fields = {'driver': DriverSerializer}
+
+    class Meta:
+        model = DutySegment
+        fields = ['id', 'log', 'driver', 'date', 'start', 'end', 'hours', 'status']
+
+class ApprovalRequestListSerializer(serializers.ListSerializer):
+    """Resolve trips for the nested ELD logs of a whole page in one pass."""
+    def to_representation(self, data):
+        approvals = list(data.all() if hasattr(data, 'all') else data)
+        if self.child.is_expanded('eldlog') and self.child.selection.includes(self.child.child_path('eldlog.trip')):
+            with_geometry = not self.child.omits_in_list('eldlog.trip.polyline')
+            self.child.context['eldlog_trips'] = resolve_eldlog_trips([ar.eldlog for ar in approvals], with_geometry=with_geometry)
+        return super().to_representation(approvals)
+
+
+class ApprovalRequestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    trip = serializers.PrimaryKeyRelatedField(read_only=True)
+    eldlog = serializers.PrimaryKeyRelatedField(read_only=True)
+    supervisor = serializers.PrimaryKeyRelatedField(read_only=True)
+    expandable_fields = {'trip': TripSerializer, 'eldlog': ELDLogSerializer, 'supervisor': SupervisorSerializer}
+
     class Meta:
         model = ApprovalRequest
         fields = ['id', 'trip', 'eldlog', 'supervisor', 'status', 'date']
+        list_serializer_class = ApprovalRequestListSerializer
@@ -181,6 +181,23 @@ else:
 # Tunable TTL (seconds) for leaderboard cache
 LEADERBOARD_CACHE_TTL = int(os.getenv('LEADERBOARD_CACHE_TTL', '120'))
 
+# How long (seconds) a submit's Idempotency-Key is remembered and its response replayed
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+
+# Reported trip miles are kept when within max(fraction * route, miles) of the measured route (see mileage.py)
+TRIP_MILEAGE_TOLERANCE = {
+    'fraction': float(os.getenv('TRIP_MILEAGE_TOLERANCE_FRACTION', '0.1')),
+    'miles': float(os.getenv('TRIP_MILEAGE_TOLERANCE_MILES', '2')),
+}
+
+# Route proxy (/api/route/, see routing.py): upstream OSRM-compatible server and cache tiers
+OSRM_URL = os.getenv('OSRM_URL', 'https://router.project-osrm.org')
+OSRM_TIMEOUT = float(os.getenv('OSRM_TIMEOUT', '10'))
+ROUTE_CACHE_TTL = int(os.getenv('ROUTE_CACHE_TTL', str(7 * 24 * 3600)))
+ROUTE_CACHE_MEMORY_ENTRIES = int(os.getenv('ROUTE_CACHE_MEMORY_ENTRIES', '512'))
+# Decimals kept from request coordinates (4 is ~11 m), so nearby points share a cache entry
+ROUTE_QUANTIZE_DIGITS = int(os.getenv('ROUTE_QUANTIZE_DIGITS', '4'))
+
 # CORS configuration
 from corsheaders.defaults import default_headers, default_methods
 # In hosted environments, set CORS_ALLOWED_ORIGINS to the exact frontend origins (comma-separated)
@@ -189,6 +206,7 @@ CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_HEADERS = list(default_headers) + [
     'authorization',
     'content-type',
+    'idempotency-key',
 ]
 CORS_ALLOW_METHODS = list(default_methods)
 
@@ -0,0 +1,227 @@
+"""
+Spatial index over trip routes, for "which trips passed through this area" queries without PostGIS.
+
+Two levels narrow the candidates before any route is decoded:
+- Trip.min_lat/max_lat/min_lng/max_lng: the route's bounding box, in indexed columns
+- TripCell: the grid cells (CELL_DEGREES on a side) the route passes through, indexed by cell id
+Survivors stay a lazy queryset read in keyset chunks; each chunk gets the exact, vectorized check
+against its segments (rectangle clipping for ?bbox=, point-to-segment distance for ?near=&radius=),
+once per shared route geometry, until a page of matching trips is filled.
+
+Cells are found by sampling each segment at a quarter cell, so a route crossing a cell always has
+a sample in that cell or a neighbour; queries therefore look one cell beyond their bounding box.
+"""
+import math
+
+import numpy as np
+
+from .mileage import route_miles
+from .models import RouteGeometry, Trip, TripCell
+from .polyline import decode
+
+CELL_DEGREES = 0.1
+_ROWS = int(round(180 / CELL_DEGREES))
+_COLS = int(round(360 / CELL_DEGREES))
+# Queries covering more cells than this filter on the bounding-box columns only
+MAX_QUERY_CELLS = 2500
+MILES_PER_DEGREE_LAT = 69.09
+
+
+def _points(encoded):
+    if not encoded:
+        return None
+    try:
+        points = decode(encoded)
+    except ValueError:
+        return None
+    return points if len(points) else None
+
+
+def route_bbox(encoded) -> dict:
+    """Bounding-box column values for a stored polyline (all None without usable geometry)."""
+    points = _points(encoded)
+    if points is None:
+        return {'min_lat': None, 'min_lng': None, 'max_lat': None, 'max_lng': None}
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    return {'min_lat': float(lo[0]), 'min_lng': float(lo[1]), 'max_lat': float(hi[0]), 'max_lng': float(hi[1])}
+
+
+def _cell_ids(lat, lng) -> np.ndarray:
+    rows = np.clip(np.floor((np.asarray(lat) + 90) / CELL_DEGREES).astype(np.int64), 0, _ROWS - 1)
+    cols = np.clip(np.floor((np.asarray(lng) + 180) / CELL_DEGREES).astype(np.int64), 0, _COLS - 1)
+    return rows * _COLS + cols
+
+
+def route_cells(encoded) -> list:
+    """Sorted ids of the grid cells a stored polyline passes through."""
+    points = _points(encoded)
+    if points is None:
+        return []
+    if len(points) == 1:
+        return _cell_ids(points[:, 0], points[:, 1]).tolist()
+    start, delta = points[:-1], np.diff(points, axis=0)
+    steps = np.maximum(1, np.ceil(np.abs(delta).max(axis=1) / (CELL_DEGREES / 4))).astype(np.int64)
+    seg = np.repeat(np.arange(len(start)), steps)
+    # Fraction along each segment for every sample: 0, 1/steps, ..., (steps-1)/steps
+    offsets = np.arange(len(seg)) - np.repeat(np.cumsum(steps) - steps, steps)
+    samples = start[seg] + delta[seg] * (offsets / steps[seg])[:, None]
+    samples = np.vstack((samples, points[-1:]))
+    return np.unique(_cell_ids(samples[:, 0], samples[:, 1])).tolist()
+
+
+def query_cells(min_lat, min_lng, max_lat, max_lng):
+    """Cell ids covering a box plus a one-cell margin, or None when that exceeds MAX_QUERY_CELLS."""
+    r0, r1 = (_cell_ids([min_lat, max_lat], [min_lng, min_lng]) // _COLS).tolist()
+    c0, c1 = (_cell_ids([min_lat, min_lat], [min_lng, max_lng]) % _COLS).tolist()
+    rows = np.arange(max(0, r0 - 1), min(_ROWS - 1, r1 + 1) + 1)
+    cols = np.arange(max(0, c0 - 1), min(_COLS - 1, c1 + 1) + 1)
+    if len(rows) * len(cols) > MAX_QUERY_CELLS:
+        return None
+    return (rows[:, None] * _COLS + cols[None, :]).ravel().tolist()
+
+
+def route_crosses_bbox(encoded, min_lat, min_lng, max_lat, max_lng) -> bool:
+    """Exact test: does any segment of the route touch the box? (Liang-Barsky clipping, all segments at once.)"""
+    points = _points(encoded)
+    if points is None:
+        return False
+    lat, lng = points[:, 0], points[:, 1]
+    inside = (lat >= min_lat) & (lat <= max_lat) & (lng >= min_lng) & (lng <= max_lng)
+    if inside.any() or len(points) < 2:
+        return bool(inside.any())
+    p0, d = points[:-1], np.diff(points, axis=0)
+    t_enter = np.zeros(len(d))
+    t_exit = np.ones(len(d))
+    ok = np.ones(len(d), dtype=bool)
+    for axis, lo, hi in ((0, min_lat, max_lat), (1, min_lng, max_lng)):
+        start, step = p0[:, axis], d[:, axis]
+        flat = step == 0
+        # Segments parallel to this axis' edges must already lie between them
+        ok &= ~flat | ((start >= lo) & (start <= hi))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ta, tb = (lo - start) / step, (hi - start) / step
+        t_enter = np.where(flat, t_enter, np.maximum(t_enter, np.minimum(ta, tb)))
+        t_exit = np.where(flat, t_exit, np.minimum(t_exit, np.maximum(ta, tb)))
+    return bool((ok & (t_enter <= t_exit)).any())
+
+
+def route_distance_miles(encoded, lat: float, lng: float) -> float:
+    """
+    Shortest distance from a point to the route, in miles. Segments are measured in a local
+    equirectangular projection around the point, which is accurate well beyond incident-review radii.
+    """
+    points = _points(encoded)
+    if points is None:
+        return math.inf
+    scale = np.array([MILES_PER_DEGREE_LAT, MILES_PER_DEGREE_LAT * math.cos(math.radians(lat))])
+    xy = (points - [lat, lng]) * scale
+    if len(xy) == 1:
+        return float(np.hypot(*xy[0]))
+    a, ab = xy[:-1], np.diff(xy, axis=0)
+    length_sq = (ab * ab).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(length_sq > 0, -(a * ab).sum(axis=1) / length_sq, 0.0)
+    closest = a + np.clip(t, 0.0, 1.0)[:, None] * ab
+    return float(np.hypot(closest[:, 0], closest[:, 1]).min())
+
+
+def radius_bbox(lat: float, lng: float, radius_miles: float):
+    """(min_lat, min_lng, max_lat, max_lng) enclosing a circle, for the index stage of ?near= queries."""
+    dlat = radius_miles / MILES_PER_DEGREE_LAT
+    dlng = radius_miles / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return max(-90.0, lat - dlat), max(-180.0, lng - dlng), min(90.0, lat + dlat), min(180.0, lng + dlng)
+
+
+# --- Index maintenance and queries ---
+
+def trip_geometry_fields(encoded) -> dict:
+    """
+    Trip values derived from a (normalized) polyline: bbox and length, plus the polyline itself,
+    which geometry.attach_geometries swaps for the shared RouteGeometry before the trip is saved.
+    """
+    return {'polyline': encoded, 'routeMileage': route_miles(encoded), **route_bbox(encoded)}
+
+
+def _geometries(geometry_ids) -> dict:
+    """{geometry id: encoded polyline}, each shared geometry read once."""
+    ids = {gid for gid in geometry_ids if gid is not None}
+    return dict(RouteGeometry.objects.filter(id__in=ids).values_list('id', 'polyline')) if ids else {}
+
+
+def index_trip_cells(trips) -> None:
+    """(Re)write the TripCell rows for trips whose geometry was just stored. Call inside the write transaction."""
+    trips = [t for t in trips if t.pk is not None]
+    if not trips:
+        return
+    cells = {}
+    for t in trips:
+        if t.geometry_id is not None and t.geometry_id not in cells:
+            cells[t.geometry_id] = route_cells(t.polyline)
+    TripCell.objects.filter(trip__in=trips).delete()
+    TripCell.objects.bulk_create(
+        [TripCell(trip_id=t.pk, cell=cell) for t in trips for cell in cells.get(t.geometry_id, ())],
+        batch_size=2000,
+    )
+
+
+def rebuild_spatial_index(batch_size: int = 500) -> int:
+    """Recompute bounding boxes and cells for every trip; returns trips processed."""
+    done = 0
+    last_id = 0
+    while True:
+        batch = list(Trip.objects.filter(id__gt=last_id).order_by('id').only('id', 'geometry_id')[:batch_size])
+        if not batch:
+            return done
+        polylines = _geometries(t.geometry_id for t in batch)
+        boxes = {gid: route_bbox(encoded) for gid, encoded in polylines.items()}
+        cells = {gid: route_cells(encoded) for gid, encoded in polylines.items()}
+        for trip in batch:
+            for name, value in boxes.get(trip.geometry_id, route_bbox(None)).items():
+                setattr(trip, name, value)
+        Trip.objects.bulk_update(batch, ['min_lat', 'min_lng', 'max_lat', 'max_lng'])
+        TripCell.objects.filter(trip__in=batch).delete()
+        TripCell.objects.bulk_create(
+            [TripCell(trip_id=t.pk, cell=cell) for t in batch for cell in cells.get(t.geometry_id, ())],
+            batch_size=2000,
+        )
+        done += len(batch)
+        last_id = batch[-1].id
+
+
+def _matching(qs, min_lat, min_lng, max_lat, max_lng, matches):
+    """
+    (candidates, exact) for a region query. candidates is `qs` narrowed by the bbox columns and,
+    for small regions, a TripCell subquery; nothing is loaded, so callers order and page through it in SQL.
+    exact(trips) keeps the given trips whose route satisfies matches(encoded); verdicts are remembered
+    across calls, so each shared geometry is tested once however many chunks it is called on.
+    """
+    qs = qs.filter(min_lat__lte=max_lat, max_lat__gte=min_lat, min_lng__lte=max_lng, max_lng__gte=min_lng)
+    cells = query_cells(min_lat, min_lng, max_lat, max_lng)
+    if cells is not None:
+        qs = qs.filter(id__in=TripCell.objects.filter(cell__in=cells).values('trip_id'))
+
+    verdicts = {}
+
+    def exact(trips) -> list:
+        trips = list(trips)
+        unknown = {t.geometry_id for t in trips if t.geometry_id not in verdicts}
+        verdicts.update((gid, matches(encoded)) for gid, encoded in _geometries(unknown).items())
+        return [t for t in trips if verdicts.get(t.geometry_id)]
+
+    return qs, exact
+
+
+def trips_within_bbox(qs, min_lat, min_lng, max_lat, max_lng):
+    """(candidates, exact) for trips in `qs` whose route touches the box; see _matching."""
+    return _matching(
+        qs, min_lat, min_lng, max_lat, max_lng,
+        lambda encoded: route_crosses_bbox(encoded, min_lat, min_lng, max_lat, max_lng),
+    )
+
+
+def trips_near(qs, lat, lng, radius_miles):
+    """(candidates, exact) for trips in `qs` whose route comes within radius_miles of (lat, lng); see _matching."""
+    return _matching(
+        qs, *radius_bbox(lat, lng, radius_miles),
+        lambda encoded: route_distance_miles(encoded, lat, lng) <= radius_miles,
+    )
@@ -0,0 +1,255 @@
+"""
+Trip submission shared by the single and bulk submit actions.
+
+Driver aggregates are applied with one UPDATE per driver using F()/Greatest, so concurrent
+submits add up instead of overwriting each other. recentTrips is a JSON list that SQL cannot
+prepend to portably; it is rebuilt once per driver from the row locked with select_for_update.
+"""
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .geometry import attach_geometries
+from .leaderboard import driver_scopes, index_mileage_corrected, index_trip_recorded, record_trip_mileage
+from .locations import attach_locations, count_location_uses, trip_location_ids
+from .mileage import measure_routes, reconcile_mileage
+from .models import Driver, DriverDailyDuty, RouteGeometry, Trip
+from .polyline import normalize_polyline
+from .spatial import index_trip_cells, trip_geometry_fields
+
+RECENT_TRIPS_KEPT = 5
+# Upper bound on items accepted by one bulk-submit request
+BULK_SUBMIT_MAX_ITEMS = 500
+
+
+def _int_or_none(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _int_or_zero(value) -> int:
+    return _int_or_none(value) or 0
+
+
+def parse_trip_item(data):
+    """
+    Normalize one submitted trip (same fields and aliases as /trips/submit/).
+    Returns (fields, None) or (None, error message). fields carries the encoded 'polyline' and
+    place names; pass it through attach_references before creating the Trip.
+    """
+    if not isinstance(data, dict):
+        return None, 'each trip must be an object'
+    username = data.get('username')
+    start = data.get('start') or data.get('pickupLocation')
+    end = data.get('end') or data.get('dropoffLocation')
+    if not username or not start or not end:
+        return None, 'username, start, and end are required'
+    try:
+        polyline = normalize_polyline(data.get('polyline'))
+    except ValueError as exc:
+        return None, f'polyline: {exc}'
+    stops = data.get('stops')
+    if stops is None:
+        current_loc = data.get('currentLocation')
+        stops = [current_loc] if current_loc else []
+    geometry = trip_geometry_fields(polyline)
+    reported = _int_or_none(data.get('mileage'))
+    return {
+        'username': username,
+        'start': start,
+        'end': end,
+        'stops': stops,
+        # Reconciled with the miles measured from the route, when there is one
+        'mileage': reconcile_mileage(reported, geometry['routeMileage']),
+        'reportedMileage': reported,
+        'cycleUsed': _int_or_zero(data.get('cycleUsed')),
+        **geometry,
+    }, None
+
+
+def attach_references(items: list) -> list:
+    """Swap the polyline and place names of trip field dicts for shared RouteGeometry / Location references."""
+    return attach_locations(attach_geometries(items))
+
+
+def _recent_line(trip) -> str:
+    return f"{trip.start} -> {trip.end} - {trip.date.isoformat()}"
+
+
+def apply_driver_trips(trips_by_driver: dict) -> dict:
+    """
+    Fold newly inserted trips ({driver_id: [Trip, ...]} in submission order) into the driver
+    aggregates, the daily mileage rollup, the spatial index and location usage counts.
+    Call inside the submit transaction. Returns {driver_id: mileage after the update}.
+    """
+    if not trips_by_driver:
+        return {}
+    created = [trip for trips in trips_by_driver.values() for trip in trips]
+    index_trip_cells(created)
+    count_location_uses(added=[loc_id for trip in created for loc_id in trip_location_ids(trip)])
+    locked = Driver.objects.select_for_update().only('id', 'recentTrips').in_bulk(list(trips_by_driver))
+    # Drivers with ELD logs get cycleUsed from the duty rollup (see cycle.py), not from trip reports
+    logged = set(DriverDailyDuty.objects.filter(driver_id__in=list(trips_by_driver)).values_list('driver_id', flat=True).distinct())
+    for driver_id, trips in trips_by_driver.items():
+        recent = list(locked[driver_id].recentTrips or [])
+        # Latest submission first, as if the trips had been submitted one by one
+        for trip in trips:
+            line = _recent_line(trip)
+            recent = [line] + [r for r in recent if r != line]
+        totals = {
+            'mileage': F('mileage') + sum(t.mileage for t in trips),
+            'tripsToday': F('tripsToday') + len(trips),
+            'recentTrips': recent[:RECENT_TRIPS_KEPT],
+        }
+        if driver_id not in logged:
+            totals['cycleUsed'] = Greatest('cycleUsed', Value(max(t.cycleUsed for t in trips)))
+        Driver.objects.filter(pk=driver_id).update(**totals)
+        daily = defaultdict(lambda: [0, 0])
+        for trip in trips:
+            daily[trip.date][0] += trip.mileage
+            daily[trip.date][1] += 1
+        for day, (miles, count) in daily.items():
+            record_trip_mileage(driver_id, day, miles, count)
+    return dict(Driver.objects.filter(pk__in=list(trips_by_driver)).values_list('id', 'mileage'))
+
+
+def index_submitted_trips(drivers: dict, trips_by_driver: dict, totals: dict) -> None:
+    """After commit: move each driver on the lifetime, period and scoped rank boards."""
+    for driver_id, trips in trips_by_driver.items():
+        index_trip_recorded(
+            driver_id, int(totals.get(driver_id) or 0), sum(t.mileage for t in trips), driver_scopes(drivers[driver_id])
+        )
+
+
+def bulk_create_trips(items):
+    """
+    Validate and insert many trips for many drivers.
+    Returns (created, errors, drivers, trips_by_driver) where created is [(index, Trip)] and errors
+    is [{'index': i, 'detail': ...}]. Invalid items are skipped; the valid ones are inserted with a
+    single bulk_create. Call inside a transaction, followed by apply_driver_trips.
+    """
+    parsed = []
+    errors = []
+    for idx, data in enumerate(items):
+        fields, error = parse_trip_item(data)
+        if error:
+            errors.append({'index': idx, 'detail': error})
+        else:
+            parsed.append((idx, fields))
+
+    usernames = {fields['username'] for _, fields in parsed}
+    drivers_by_username = {
+        d.user.username: d for d in Driver.objects.select_related('user').filter(user__username__in=usernames)
+    }
+    pending = []
+    for idx, fields in parsed:
+        driver = drivers_by_username.get(fields.pop('username'))
+        if driver is None:
+            errors.append({'index': idx, 'detail': 'Driver not found'})
+            continue
+        pending.append((idx, driver, fields))
+    # Lanes and places repeated within the batch (or already stored) share one row each
+    attach_references([fields for _, _, fields in pending])
+    pending = [(idx, Trip(driver=driver, **fields)) for idx, driver, fields in pending]
+
+    created = list(zip(
+        [idx for idx, _ in pending],
+        Trip.objects.bulk_create([trip for _, trip in pending]),
+    ))
+    trips_by_driver = defaultdict(list)
+    for _, trip in created:
+        trips_by_driver[trip.driver_id].append(trip)
+    drivers = {d.pk: d for d in drivers_by_username.values()}
+    errors.sort(key=lambda e: e['index'])
+    return created, errors, drivers, dict(trips_by_driver)
+
+
+# --- Mileage audit ---
+
+def _geometry_batches(batch_size: int):
+    """
+    Keyset-paged ([(id, driver_id, date, reportedMileage, mileage, geometry_id)], [(geometry_id, polyline)])
+    for trips with geometry; each shared geometry appears once per batch.
+    """
+    last_id = 0
+    trips = Trip.objects.filter(geometry__isnull=False).order_by('id')
+    while True:
+        batch = list(
+            trips.filter(id__gt=last_id)
+            .values_list('id', 'driver_id', 'date', 'reportedMileage', 'mileage', 'geometry_id')[:batch_size]
+        )
+        if not batch:
+            return
+        routes = list(RouteGeometry.objects.filter(id__in={row[5] for row in batch}).values_list('id', 'polyline'))
+        yield batch, routes
+        last_id = batch[-1][0]
+
+
+def _measured_batches(batches, workers: int):
+    """(batch, {geometry_id: route miles}) per batch; measured in `workers` processes, a few batches in flight."""
+    if workers <= 1:
+        for batch, routes in batches:
+            yield batch, dict(measure_routes(routes))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch, routes in batches:
+            pending.append((batch, pool.submit(measure_routes, routes)))
+            if len(pending) >= 2 * workers:
+                batch, future = pending.popleft()
+                yield batch, dict(future.result())
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, dict(future.result())
+
+
+def _apply_measured(batch, measured, dry_run: bool, stats: dict, drivers_changed: set) -> None:
+    updates = []
+    driver_deltas = defaultdict(int)
+    daily_deltas = defaultdict(int)
+    for trip_id, driver_id, day, reported, mileage, geometry_id in batch:
+        route = measured.get(geometry_id)
+        # Trips stored before reportedMileage existed were taken at the client's word
+        claimed = mileage if reported is None else reported
+        reconciled = reconcile_mileage(claimed, route)
+        if route is not None and claimed and reconciled != claimed:
+            stats['mismatched'] += 1
+        if reconciled != mileage:
+            stats['changed'] += 1
+            driver_deltas[driver_id] += reconciled - mileage
+            daily_deltas[(driver_id, day)] += reconciled - mileage
+        updates.append(Trip(id=trip_id, routeMileage=route, mileage=reconciled))
+    stats['trips'] += len(batch)
+    if dry_run:
+        return
+    with transaction.atomic():
+        Trip.objects.bulk_update(updates, ['routeMileage', 'mileage'])
+        for driver_id, delta in driver_deltas.items():
+            if delta:
+                Driver.objects.filter(pk=driver_id).update(mileage=F('mileage') + delta)
+        for (driver_id, day), delta in daily_deltas.items():
+            if delta:
+                record_trip_mileage(driver_id, day, delta, 0)
+    drivers_changed.update(driver_id for driver_id, delta in driver_deltas.items() if delta)
+
+
+def recompute_trip_mileage(batch_size: int = 1000, workers: int = 1, dry_run: bool = False) -> dict:
+    """
+    Re-measure every trip with geometry and re-apply the submit-time reconciliation. Routes are
+    measured in a process pool (numpy only, no database access in the workers); the parent writes
+    routeMileage/mileage per batch and moves Driver.mileage and the daily rollup by the difference.
+    Rank boards of affected drivers are dropped and reload from SQL on next read.
+    Returns {'trips', 'changed', 'mismatched'} counts; dry_run only counts.
+    """
+    stats = {'trips': 0, 'changed': 0, 'mismatched': 0}
+    drivers_changed = set()
+    for batch, measured in _measured_batches(_geometry_batches(batch_size), workers):
+        _apply_measured(batch, measured, dry_run, stats, drivers_changed)
+    if drivers_changed:
+        index_mileage_corrected(Driver.objects.filter(pk__in=drivers_changed))
+    return stats
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, DriverDailyMileage, Trip
+
+URL = "/api/v1/trips/bulk-submit/"
+
+
+class BulkTripSubmitTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.drivers = []
+        for i in range(1, 4):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            self.drivers.append(Driver.objects.create(
+                user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}", mileage=100, cycleUsed=5, recentTrips=['old'],
+            ))
+        self.client.force_authenticate(user=self.drivers[0].user)
+
+    def test_bulk_submit_updates_aggregates_once_per_driver(self):
+        items = [
+            {'username': 'driver1', 'start': 'A', 'end': 'B', 'mileage': 10, 'cycleUsed': 3},
+            {'username': 'driver1', 'start': 'B', 'end': 'C', 'mileage': 20, 'cycleUsed': 9},
+            {'username': 'driver2', 'pickupLocation': 'X', 'dropoffLocation': 'Y', 'mileage': 7},
+        ]
+        res = self.client.post(URL, {'trips': items}, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual([c['index'] for c in res.json()['created']], [0, 1, 2])
+        self.assertEqual(Trip.objects.count(), 3)
+
+        d1 = Driver.objects.get(pk=self.drivers[0].pk)
+        self.assertEqual((d1.mileage, d1.tripsToday, d1.cycleUsed), (130, 2, 9))
+        today = timezone.now().date().isoformat()
+        self.assertEqual(d1.recentTrips, [f"B -> C - {today}", f"A -> B - {today}", 'old'])
+        d2 = Driver.objects.get(pk=self.drivers[1].pk)
+        self.assertEqual((d2.mileage, d2.tripsToday, d2.cycleUsed), (107, 1, 5))
+        rollup = DriverDailyMileage.objects.get(driver=d1)
+        self.assertEqual((rollup.mileage, rollup.trips), (30, 2))
+
+    def test_per_item_errors_and_partial_success(self):
+        items = [
+            {'username': 'driver1', 'start': 'A', 'end': 'B', 'mileage': 10},
+            {'username': 'driver1', 'start': 'A'},
+            {'username': 'ghost', 'start': 'A', 'end': 'B'},
+            'not an object',
+        ]
+        res = self.client.post(URL, items, format='json')
+        self.assertEqual(res.status_code, 207)
+        data = res.json()
+        self.assertEqual([c['index'] for c in data['created']], [0])
+        self.assertEqual([e['index'] for e in data['errors']], [1, 2, 3])
+        self.assertEqual(data['errors'][1]['detail'], 'Driver not found')
+
+        res = self.client.post(URL, [{'username': 'ghost', 'start': 'A', 'end': 'B'}], format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.client.post(URL, [], format='json').status_code, 400)
+
+    def test_query_count_does_not_grow_with_trips_per_driver(self):
+        def run(n):
+            items = [{'username': f'driver{i}', 'start': 'A', 'end': 'B', 'mileage': 1} for i in (1, 2) for _ in range(n)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.post(URL, items, format='json').status_code, 201)
+            return len(ctx.captured_queries)
+
+        run(1)
+        self.assertEqual(run(2), run(10))
+
+    def test_bulk_submit_moves_leaderboard(self):
+        self.client.get("/api/v1/drivers/leaderboard/")
+        res = self.client.post(URL, [{'username': 'driver3', 'start': 'A', 'end': 'B', 'mileage': 500}], format='json')
+        self.assertEqual(res.status_code, 201)
+        top = self.client.get("/api/v1/drivers/leaderboard/").json()['top']
+        self.assertEqual((top[0]['username'], top[0]['mileage']), ('driver3', 600))
@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from backend.cycle import cycle_hours
+from backend.models import User, Driver, DriverDailyDuty, ELDLog
+
+# 10 on-duty hours, 06:00-16:00
+WORK_DAY = [
+    {'start': 0, 'end': 6, 'status': 'Off Duty'},
+    {'start': 6, 'end': 7, 'status': 'On Duty'},
+    {'start': 7, 'end': 15, 'status': 'Driving'},
+    {'start': 15, 'end': 16, 'status': 'On Duty'},
+    {'start': 16, 'end': 24, 'status': 'Sleeper Berth'},
+]
+
+
+class CycleHoursTests(SimpleTestCase):
+    def test_restarts(self):
+        work = (10, 6, 8)
+        self.assertEqual(cycle_hours([work] * 8), 80)
+        # Missing days are off duty; two of them complete a restart
+        self.assertEqual(cycle_hours([work, work, None, None, work, work]), 20)
+        self.assertEqual(cycle_hours([work, None, work]), 10)
+        # 2 + 24 + 6 = 32 off-duty hours fall short of a restart
+        self.assertEqual(cycle_hours([(10, 6, 2), None, work]), 20)
+        # 20h off after one day plus 14h before the next spans midnight
+        self.assertEqual(cycle_hours([work, (10, 6, 20), (10, 14, 0)]), 10)
+        # A restart still under way at the end of the window
+        self.assertEqual(cycle_hours([work, (10, 6, 12), None]), 0)
+
+
+class DutyRollupTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.drivers = []
+        for i in (1, 2):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            self.drivers.append(Driver.objects.create(user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}", cycleUsed=3))
+        self.client.force_authenticate(user=self.drivers[0].user)
+        self.today = date.today()
+
+    def _day(self, days_ago):
+        return (self.today - timedelta(days=days_ago)).isoformat()
+
+    def _backfill(self, username, days_ago):
+        items = [{'username': username, 'date': self._day(n), 'logEntries': WORK_DAY} for n in days_ago]
+        self.assertEqual(self.client.post("/api/v1/eldlogs/bulk-submit/", items, format='json').status_code, 201)
+
+    def test_logs_maintain_rollup_and_cycle_used(self):
+        self._backfill('driver1', range(8, -1, -1))
+        row = DriverDailyDuty.objects.get(driver=self.drivers[0], date=self.today)
+        self.assertEqual((row.onDutyHours, row.drivingHours, row.offDutyBefore, row.offDutyAfter), (10, 8, 6, 8))
+        self.assertEqual(Driver.objects.get(pk=self.drivers[0].pk).cycleUsed, 80)
+
+        # Today's log is emptied, then deleted: the rollup follows
+        today_log = ELDLog.objects.get(driver=self.drivers[0], date=self.today)
+        self.client.patch(f"/api/v1/eldlogs/{today_log.id}/", {'logEntries': WORK_DAY[:2]}, format='json')
+        self.assertEqual(Driver.objects.get(pk=self.drivers[0].pk).cycleUsed, 71)
+        self.client.delete(f"/api/v1/eldlogs/{today_log.id}/")
+        self.assertFalse(DriverDailyDuty.objects.filter(date=self.today).exists())
+        self.assertEqual(Driver.objects.get(pk=self.drivers[0].pk).cycleUsed, 70)
+
+        # Reported trip cycle hours no longer override the log-based value
+        self.client.post("/api/v1/trips/submit/", {'username': 'driver1', 'start': 'A', 'end': 'B', 'cycleUsed': 99}, format='json')
+        self.assertEqual(Driver.objects.get(pk=self.drivers[0].pk).cycleUsed, 70)
+
+    def test_hours_available_and_hos_cycle_check(self):
+        self._backfill('driver1', range(7, 0, -1))
+        self._backfill('driver2', [7, 6, 5, 1])
+        with CaptureQueriesContext(connection) as ctx:
+            rows = self.client.get("/api/v1/drivers/hours-available/").json()['results']
+        self.assertEqual([(r['username'], r['cycleHours'], r['available']) for r in rows], [('driver1', 70, 0), ('driver2', 10, 60)])
+        self.assertLessEqual(len(ctx.captured_queries), 3)
+
+        res = self.client.post("/api/v1/eldlogs/submit/", {'username': 'driver1', 'date': self._day(0), 'logEntries': WORK_DAY}, format='json')
+        result = self.client.get(f"/api/v1/eldlogs/{res.json()['id']}/hos/").json()
+        self.assertEqual((result['cycleUsed'], result['cycleTotal'], result['violations']), (70, 80, ['cycle']))
+
+    def test_rebuild_command(self):
+        self._backfill('driver1', [2, 1])
+        DriverDailyDuty.objects.all().delete()
+        call_command('rebuild_duty_rollup', stdout=StringIO())
+        self.assertEqual(DriverDailyDuty.objects.count(), 2)
+        self.assertEqual(Driver.objects.get(pk=self.drivers[0].pk).cycleUsed, 20)
@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, ELDLog, Trip
+
+URL = "/api/v1/eldlogs/bulk-submit/"
+DAY = [
+    {'start': 0, 'end': 6, 'status': 'Off Duty'},
+    {'start': 7, 'end': 11, 'status': 'Driving'},
+    {'start': 6, 'end': 7, 'status': 'On Duty'},
+]
+
+
+class BulkELDLogSubmitTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.drivers = []
+        for i in (1, 2):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            self.drivers.append(Driver.objects.create(user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}"))
+        self.trip = Trip.objects.create(driver=self.drivers[0], start='A', end='B')
+        self.client.force_authenticate(user=self.drivers[0].user)
+
+    def _day(self, days_ago):
+        return (date.today() - timedelta(days=days_ago)).isoformat()
+
+    def test_backfilled_logs_keep_their_dates(self):
+        items = [{'username': 'driver1', 'date': self._day(n), 'logEntries': DAY} for n in range(7, 0, -1)]
+        items.append({'username': 'driver2', 'date': self._day(3), 'logEntries': DAY})
+        items[0]['tripId'] = self.trip.pk
+        res = self.client.post(URL, {'logs': items}, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual([c['date'] for c in res.json()['created']], [item['date'] for item in items])
+
+        logs = ELDLog.objects.filter(driver=self.drivers[0]).order_by('date')
+        self.assertEqual([log.date.isoformat() for log in logs], [self._day(n) for n in range(7, 0, -1)])
+        self.assertEqual(logs[0].trip_id, self.trip.pk)
+        # Segments are stored in time order
+        self.assertEqual([s['start'] for s in logs[0].logEntries], [0, 6, 7])
+
+    def test_invalid_logs_are_reported_by_index(self):
+        items = [
+            {'username': 'driver1', 'date': self._day(1), 'logEntries': DAY},
+            {'username': 'driver1', 'date': self._day(1), 'logEntries': []},
+            {'username': 'driver1', 'date': self._day(2), 'logEntries': [{'start': 5, 'end': 3, 'status': 'Driving'}]},
+            {'username': 'driver1', 'date': self._day(2), 'logEntries': [{'start': 0, 'end': 5, 'status': 'Napping'}]},
+            {'username': 'driver1', 'date': self._day(2), 'logEntries': [{'start': 0, 'end': 5, 'status': 'Driving'}, {'start': 4, 'end': 25, 'status': 'On Duty'}]},
+            {'username': 'driver1', 'date': self._day(2), 'logEntries': [{'start': 0, 'end': 5, 'status': 'Driving'}, {'start': 4, 'end': 6, 'status': 'On Duty'}]},
+            {'username': 'driver1', 'date': self._day(-1)},
+            {'username': 'driver2', 'date': self._day(1), 'tripId': self.trip.pk},
+            {'username': 'ghost', 'date': self._day(1)},
+        ]
+        res = self.client.post(URL, items, format='json')
+        self.assertEqual(res.status_code, 207)
+        details = {e['index']: e['detail'] for e in res.json()['errors']}
+        self.assertEqual(sorted(details), list(range(1, 9)))
+        self.assertTrue(details[1].startswith('Duplicate log'))
+        self.assertIn('overlap', details[5])
+        self.assertEqual(details[6], 'date cannot be in the future')
+        self.assertEqual(details[7], 'Trip not found for this driver')
+        self.assertEqual(ELDLog.objects.count(), 1)
+        self.assertEqual(self.client.post(URL, items[2:], format='json').status_code, 400)
+
+    def test_query_count_does_not_grow_with_logs(self):
+        def run(days):
+            items = [
+                {'username': f'driver{i}', 'date': self._day(n), 'logEntries': DAY, 'tripId': self.trip.pk if i == 1 else None}
+                for i in (1, 2) for n in range(days)
+            ]
+            ELDLog.objects.all().delete()
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.post(URL, items, format='json').status_code, 201)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(run(2), run(14))
+
+    def test_single_submit_accepts_a_date(self):
+        res = self.client.post("/api/v1/eldlogs/submit/", {'username': 'driver1', 'date': self._day(3), 'logEntries': DAY}, format='json')
+        self.assertEqual(res.json()['date'], self._day(3))
+        self.assertEqual(self.client.post("/api/v1/eldlogs/submit/", {'username': 'driver1'}, format='json').json()['date'], self._day(0))
+
+    def test_single_submit_validates_segments(self):
+        overlapping = [{'start': 0, 'end': 8, 'status': 'Off Duty'}, {'start': 6, 'end': 10, 'status': 'Driving'}]
+        for entries in (overlapping, [{'start': 5, 'end': 2, 'status': 'Driving'}], 'Driving'):
+            res = self.client.post("/api/v1/eldlogs/submit/", {'username': 'driver1', 'logEntries': entries}, format='json')
+            self.assertEqual(res.status_code, 400, entries)
+            self.assertIn('logEntries', res.json()['detail'])
+        self.assertFalse(ELDLog.objects.exists())
@@ -0,0 +1,48 @@
+import csv
+import io
+import json
+
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Supervisor, Trip, ELDLog
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sup_user = User.objects.create_user(username="s1", email="s1@ex.com", password="pass1234", role='supervisor')
+        self.supervisor = Supervisor.objects.create(user=self.sup_user, office="HQ", email="s1@ex.com")
+        self.d1_user = User.objects.create_user(username="d1", email="d1@ex.com", password="pass1234", role='driver')
+        self.d1 = Driver.objects.create(user=self.d1_user, license="L1", truck="T1", trailer="TR1", supervisor=self.supervisor)
+        self.d2_user = User.objects.create_user(username="d2", email="d2@ex.com", password="pass1234", role='driver')
+        self.d2 = Driver.objects.create(user=self.d2_user, license="L2", truck="T2", trailer="TR2")
+        Trip.objects.create(driver=self.d1, start="A", end="B", stops=["X"], mileage=10, status='Approved')
+        Trip.objects.create(driver=self.d1, start="B", end="C", stops=[], mileage=20)
+        Trip.objects.create(driver=self.d2, start="C", end="D", stops=[], mileage=30)
+        ELDLog.objects.create(driver=self.d1, logEntries=[{'start': 0, 'end': 8, 'status': 'Driving'}])
+
+    def _body(self, res):
+        self.assertEqual(res.status_code, 200)
+        return b''.join(res.streaming_content).decode()
+
+    def test_ndjson_trip_export_is_scoped_to_supervisor(self):
+        self.client.force_authenticate(user=self.sup_user)
+        res = self.client.get("/api/v1/trips/export/")
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self._body(res).splitlines()]
+        self.assertEqual([r['mileage'] for r in rows], [10, 20])
+        self.assertEqual(rows[0]['stops'], ["X"])
+        self.assertNotIn('polyline', rows[0])
+
+    def test_csv_export_with_status_filter(self):
+        self.client.force_authenticate(user=self.d1_user)
+        res = self.client.get("/api/v1/trips/export/?output=csv&status=Approved")
+        rows = list(csv.DictReader(io.StringIO(self._body(res))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['driver'], 'd1')
+
+    def test_eldlog_export_and_bad_params(self):
+        self.client.force_authenticate(user=self.d1_user)
+        rows = [json.loads(line) for line in self._body(self.client.get("/api/v1/eldlogs/export/")).splitlines()]
+        self.assertEqual(rows[0]['logEntries'][0]['status'], 'Driving')
+        self.assertEqual(self.client.get("/api/v1/eldlogs/export/?from=yesterday").status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/eldlogs/export/?output=xml").status_code, 400)
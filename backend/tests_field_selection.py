@@ -0,0 +1,51 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Supervisor, Trip, ELDLog, ApprovalRequest
+from backend.geometry import store_geometry
+from backend.polyline import encode
+
+
+class FieldSelectionTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sup_user = User.objects.create_user(username="s1", email="s1@ex.com", password="pass1234", role='supervisor')
+        self.supervisor = Supervisor.objects.create(user=self.sup_user, office="HQ", email="s1@ex.com")
+        self.driver_user = User.objects.create_user(username="d1", email="d1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=self.driver_user, license="L1", truck="T1", trailer="TR1", supervisor=self.supervisor)
+        self.trip = Trip.objects.create(driver=self.driver, start="A", end="B", stops=[], mileage=10, geometry=store_geometry(encode([[1, 2], [3, 4]])))
+        self.eld = ELDLog.objects.create(driver=self.driver, trip=self.trip)
+        self.ar = ApprovalRequest.objects.create(trip=self.trip, eldlog=self.eld, supervisor=self.supervisor, status='Pending')
+        self.client.force_authenticate(user=self.sup_user)
+
+    def test_nested_relations_default_to_ids(self):
+        res = self.client.get("/api/v1/approvalrequests/")
+        row = res.json()['results'][0]
+        self.assertEqual(row['trip'], self.trip.id)
+        self.assertEqual(row['eldlog'], self.eld.id)
+        self.assertEqual(row['supervisor'], self.supervisor.id)
+
+    def test_expand_nested_paths(self):
+        res = self.client.get("/api/v1/approvalrequests/?expand=trip.driver.user")
+        trip = res.json()['results'][0]['trip']
+        self.assertEqual(trip['start'], "A")
+        self.assertEqual(trip['driver']['user']['username'], "d1")
+
+    def test_fields_limits_each_level(self):
+        url = (
+            f"/api/v1/approvalrequests/by-supervisor/{self.sup_user.username}/"
+            "?fields=id,status,trip.id,trip.start,trip.driver.name"
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        row = res.json()['results'][0]
+        self.assertEqual(set(row), {'id', 'status', 'trip'})
+        self.assertEqual(row['trip'], {'id': self.trip.id, 'start': "A", 'driver': {'name': "d1"}})
+        # The ELD log and supervisor were not requested, so they are never joined
+        self.assertFalse(any('"backend_eldlog"' in q['sql'] for q in ctx.captured_queries))
+
+    def test_eldlog_trip_expansion(self):
+        res = self.client.get("/api/v1/eldlogs/?fields=id,trip")
+        self.assertEqual(res.json()['results'][0], {'id': self.eld.id, 'trip': self.trip.id})
+        res = self.client.get("/api/v1/eldlogs/?fields=id,trip&expand=trip")
+        self.assertEqual(res.json()['results'][0]['trip']['end'], "B")
@@ -0,0 +1,107 @@
+import importlib
+import json
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from backend import serializers
+from backend.models import User, Driver, Trip, RouteGeometry
+from backend.polyline import encode
+
+LANE = [[41.88, -87.63], [42.3, -87.85], [43.04, -87.91]]
+OTHER_LANE = [[39.74, -104.99], [39.10, -94.58]]
+LANE_ENCODED = encode(LANE)
+
+
+class SharedGeometryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        u = User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=u, license="LIC1", truck="T1", trailer="TR1")
+        self.client.force_authenticate(user=u)
+
+    def _submit(self, route):
+        body = {'username': 'driver1', 'start': 'A', 'end': 'B', 'polyline': route}
+        return self.client.post("/api/v1/trips/submit/", body, format='json').json()['id']
+
+    def test_repeated_lanes_share_one_row(self):
+        # Same lane as coordinates and as an encoded string
+        first, second = self._submit(LANE), self._submit(LANE_ENCODED)
+        self._submit(OTHER_LANE)
+        items = [{'username': 'driver1', 'start': 'A', 'end': 'B', 'polyline': LANE} for _ in range(3)]
+        self.assertEqual(self.client.post("/api/v1/trips/bulk-submit/", items, format='json').status_code, 201)
+        self.assertEqual(RouteGeometry.objects.count(), 2)
+        self.assertEqual(Trip.objects.get(pk=first).geometry_id, Trip.objects.get(pk=second).geometry_id)
+        self.assertEqual(RouteGeometry.objects.get(trips=first).trips.count(), 5)
+
+    def test_lists_read_and_render_each_geometry_once(self):
+        for route in (LANE, LANE, LANE, OTHER_LANE):
+            self._submit(route)
+        with mock.patch.object(serializers, 'render_polyline', wraps=serializers.render_polyline) as render:
+            with CaptureQueriesContext(connection) as ctx:
+                rows = self.client.get("/api/v1/trips/?expand=polyline").json()['results']
+        self.assertEqual([row['polyline'] for row in rows].count(LANE_ENCODED), 3)
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(sum('"backend_routegeometry"' in q['sql'] for q in ctx.captured_queries), 1)
+
+    def test_prune_keeps_referenced_geometry(self):
+        kept = Trip.objects.get(pk=self._submit(LANE))
+        Trip.objects.get(pk=self._submit(OTHER_LANE)).delete()
+        call_command('prune_route_geometry', stdout=StringIO())
+        self.assertEqual(list(RouteGeometry.objects.values_list('id', flat=True)), [kept.geometry_id])
+
+
+class GeometryMigrationTests(TransactionTestCase):
+    before = [('backend', '0016_cachedroute')]
+    after = [('backend', '0017_route_geometry')]
+
+    def _migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_polylines_are_encoded_then_deduplicated(self):
+        old_apps = self._migrate(self.before)
+        HistoricalUser = old_apps.get_model('backend', 'User')
+        HistoricalDriver = old_apps.get_model('backend', 'Driver')
+        HistoricalTrip = old_apps.get_model('backend', 'Trip')
+        user = HistoricalUser.objects.create(username='driver1', email='driver1@ex.com', password='', role='driver')
+        driver = HistoricalDriver.objects.create(user=user, license='LIC1', truck='T1', trailer='TR1')
+        json_trip = HistoricalTrip.objects.create(driver=driver, start='A', end='B', polyline=json.dumps(LANE))
+        same_lane = HistoricalTrip.objects.create(driver=driver, start='A', end='B', polyline=LANE_ENCODED)
+        broken = HistoricalTrip.objects.create(driver=driver, start='A', end='B', polyline='[broken')
+        empty = HistoricalTrip.objects.create(driver=driver, start='A', end='B', polyline=None)
+
+        # Rows left as JSON by older clients are encoded; unreadable ones are kept as they are
+        encode_migration = importlib.import_module('backend.migrations.0012_encode_trip_polylines')
+        encode_migration.encode_trip_polylines(old_apps, None)
+        self.assertEqual(HistoricalTrip.objects.get(pk=json_trip.pk).polyline, LANE_ENCODED)
+        self.assertEqual(HistoricalTrip.objects.get(pk=broken.pk).polyline, '[broken')
+        # The reverse restores JSON coordinates, and re-applying it is lossless at 1e-5 degrees
+        encode_migration.decode_trip_polylines(old_apps, None)
+        self.assertEqual(json.loads(HistoricalTrip.objects.get(pk=json_trip.pk).polyline), LANE)
+        self.assertEqual(HistoricalTrip.objects.get(pk=broken.pk).polyline, '[broken')
+        encode_migration.encode_trip_polylines(old_apps, None)
+        self.assertEqual(HistoricalTrip.objects.get(pk=same_lane.pk).polyline, LANE_ENCODED)
+
+        new_apps = self._migrate(self.after)
+        Trip = new_apps.get_model('backend', 'Trip')
+        RouteGeometry = new_apps.get_model('backend', 'RouteGeometry')
+        self.assertEqual(RouteGeometry.objects.count(), 2)
+        lane = Trip.objects.get(pk=json_trip.pk).geometry
+        self.assertEqual(lane.polyline, LANE_ENCODED)
+        self.assertEqual(Trip.objects.get(pk=same_lane.pk).geometry_id, lane.id)
+        self.assertEqual(Trip.objects.get(pk=broken.pk).geometry.polyline, '[broken')
+        self.assertIsNone(Trip.objects.get(pk=empty.pk).geometry_id)
@@ -0,0 +1,134 @@
+import struct
+import zlib
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase, APIClient
+from backend import grid
+from backend.models import User, Driver, Supervisor, ELDLog
+
+DAY = [
+    {'start': 0, 'end': 6, 'status': 'Off Duty'},
+    {'start': 6, 'end': 11, 'status': 'Driving'},
+    {'start': 11, 'end': 12, 'status': 'On Duty'},
+    {'start': 12, 'end': 24, 'status': 'Sleeper Berth'},
+]
+
+
+def _png_chunks(body):
+    """[(kind, data)] of a PNG, checking signature and CRCs."""
+    assert body[:8] == b'\x89PNG\r\n\x1a\n'
+    chunks, offset = [], 8
+    while offset < len(body):
+        length, = struct.unpack('>I', body[offset:offset + 4])
+        kind, data = body[offset + 4:offset + 8], body[offset + 8:offset + 8 + length]
+        crc, = struct.unpack('>I', body[offset + 8 + length:offset + 12 + length])
+        assert crc == zlib.crc32(kind + data) & 0xffffffff
+        chunks.append((kind, data))
+        offset += 12 + length
+    return chunks
+
+
+class GridRenderingTests(SimpleTestCase):
+    def test_png_is_a_valid_palette_image(self):
+        chunks = dict(_png_chunks(grid.render_grid(DAY, 'png')))
+        width, height, depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+        self.assertEqual((width, height, depth, color_type), (grid.GRID_WIDTH, grid.GRID_HEIGHT, 8, 3))
+        pixels = zlib.decompress(chunks[b'IDAT'])
+        self.assertEqual(len(pixels), height * (width + 1))
+        # The duty line crosses the Driving row at 8:00
+        row = grid._row_y(2)
+        self.assertEqual(pixels[row * (width + 1) + 1 + grid._x(8)], grid.LINE)
+
+    def test_svg_draws_segments_and_totals(self):
+        svg = grid.render_grid(DAY, 'svg')
+        self.assertTrue(svg.startswith('<svg xmlns="http://www.w3.org/2000/svg"'))
+        self.assertIn('M160 66L260 66', svg)
+        self.assertIn('>12h</text>', svg)
+
+    def test_report_stacks_days(self):
+        days = [('2026-01-01 driver1', DAY), ('2026-01-02 driver1', DAY[:2]), ('2026-01-03 <x>', [])]
+        chunks = dict(_png_chunks(grid.render_report(days, 'png')))
+        _, height = struct.unpack('>II', chunks[b'IHDR'][:8])
+        self.assertEqual(height, 3 * (grid.BAND_HEIGHT + grid.GRID_HEIGHT))
+        self.assertEqual(len(zlib.decompress(chunks[b'IDAT'])), height * (grid.GRID_WIDTH + 1))
+        svg = grid.render_report(days, 'svg')
+        self.assertIn('2026-01-02 driver1', svg)
+        self.assertIn('&lt;x&gt;', svg)
+
+
+class GridEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        sup_user = User.objects.create_user(username="sup1", email="sup1@ex.com", password="pass1234", role='supervisor')
+        self.supervisor = Supervisor.objects.create(user=sup_user, office="HQ", email="s1@ex.com")
+        self.drivers = []
+        for i in (1, 2):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            self.drivers.append(Driver.objects.create(
+                user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}", supervisor=self.supervisor if i == 1 else None,
+            ))
+        today = date.today()
+        self.logs = [
+            ELDLog.objects.create(driver=self.drivers[0], date=today - timedelta(days=n), logEntries=DAY)
+            for n in (3, 2, 1)
+        ]
+        self.other = ELDLog.objects.create(driver=self.drivers[1], date=today, logEntries=DAY)
+
+    def test_grid_svg_and_png_with_etag(self):
+        self.client.force_authenticate(user=self.drivers[0].user)
+        res = self.client.get(f"/api/v1/eldlogs/{self.logs[0].id}/grid.svg")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('image/svg+xml'))
+        self.assertIn(b'<svg', res.content)
+        etag = res['ETag']
+
+        res = self.client.get(f"/api/v1/eldlogs/{self.logs[1].id}/grid.svg", HTTP_IF_NONE_MATCH=etag)
+        # Same entries, same rendering: content-addressed tag
+        self.assertEqual(res.status_code, 304)
+
+        png = self.client.get(f"/api/v1/eldlogs/{self.logs[0].id}/grid.png")
+        self.assertEqual(png['Content-Type'], 'image/png')
+        self.assertTrue(png.content.startswith(b'\x89PNG'))
+        self.assertNotEqual(png['ETag'], etag)
+
+        self.logs[0].logEntries = DAY[:2]
+        self.logs[0].save()
+        res = self.client.get(f"/api/v1/eldlogs/{self.logs[0].id}/grid.svg", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+        res = self.client.get(f"/api/v1/eldlogs/{self.other.id + 100}/grid.svg")
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res['Content-Type'], 'application/json')
+
+    def test_renderings_are_cached(self):
+        self.client.force_authenticate(user=self.drivers[0].user)
+        with mock.patch.dict(grid.RENDER_DAY, svg=mock.Mock(wraps=grid._svg_day)) as render_day:
+            self.client.get(f"/api/v1/eldlogs/{self.logs[0].id}/grid.svg")
+            self.client.get(f"/api/v1/eldlogs/{self.logs[1].id}/grid.svg")
+            self.client.get("/api/v1/eldlogs/report.svg")
+            self.assertEqual(render_day['svg'].call_count, 1)
+
+    def test_report(self):
+        self.client.force_authenticate(user=self.supervisor.user)
+        res = self.client.get("/api/v1/eldlogs/report.png", {'driver': 'driver1'})
+        self.assertEqual(res.status_code, 200)
+        chunks = dict(_png_chunks(res.content))
+        _, height = struct.unpack('>II', chunks[b'IHDR'][:8])
+        self.assertEqual(height, 3 * (grid.BAND_HEIGHT + grid.GRID_HEIGHT))
+
+        res = self.client.get("/api/v1/eldlogs/report.svg")
+        body = res.content.decode()
+        dates = [log.date.isoformat() for log in self.logs]
+        self.assertLess(body.index(dates[0]), body.index(dates[2]))
+        # driver2 is not assigned to this supervisor
+        self.assertNotIn('driver2', body)
+        self.assertEqual(self.client.get("/api/v1/eldlogs/report.svg", HTTP_IF_NONE_MATCH=res['ETag']).status_code, 304)
+
+        self.assertEqual(self.client.get("/api/v1/eldlogs/report.svg", {'from': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/eldlogs/report.svg", {'driver': 'driver2'}).status_code, 404)
+        with mock.patch('backend.views.MAX_REPORT_LOGS', 2):
+            self.assertEqual(self.client.get("/api/v1/eldlogs/report.svg").status_code, 400)
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase, APIClient
+from backend import hos
+from backend.models import User, Driver, ELDLog
+
+LONG_DAY = [
+    {'start': 0, 'end': 6, 'status': 'Off Duty'},
+    {'start': 6, 'end': 7, 'status': 'On Duty'},
+    {'start': 7, 'end': 16, 'status': 'Driving'},
+    {'start': 16, 'end': 17, 'status': 'On Duty'},
+    {'start': 17, 'end': 20, 'status': 'Driving'},
+    {'start': 20, 'end': 24, 'status': 'Off Duty'},
+]
+LEGAL_DAY = [
+    {'start': 6, 'end': 10, 'status': 'Driving'},
+    {'start': 10, 'end': 10.5, 'status': 'Off Duty'},
+    {'start': 10.5, 'end': 15, 'status': 'Driving'},
+]
+
+
+class HOSEngineTests(SimpleTestCase):
+    def test_checks_match_the_log_screen(self):
+        long_day, legal_day, empty = hos.evaluate_entries([LONG_DAY, list(reversed(LEGAL_DAY)), []])
+        self.assertEqual(
+            (long_day['totalDriving'], long_day['totalOnDuty'], long_day['dutyWindow'], long_day['maxContinuousDriving']),
+            (12, 14, 14, 9),
+        )
+        self.assertEqual(long_day['violations'], ['driving', 'break'])
+        self.assertEqual((legal_day['maxContinuousDriving'], legal_day['dutyWindow'], legal_day['violations']), (4.5, 9, []))
+        self.assertEqual((empty['totalOnDuty'], empty['violations']), (0, []))
+
+    def test_cycle_and_unreadable_segments(self):
+        day = [{'start': 0, 'end': 5, 'status': 'Driving'}, {'status': 'On Duty'}, {'start': 5, 'end': 6, 'status': 'Yard'}, {'start': 6, 'end': 9, 'status': 'Driving'}]
+        result, = hos.evaluate_entries([day], cycle_used=[66])
+        # The unknown status still splits the driving run
+        self.assertEqual((result['totalOnDuty'], result['maxContinuousDriving'], result['cycleTotal']), (8, 5, 74))
+        self.assertEqual(result['violations'], ['cycle'])
+
+    def test_batch_matches_one_by_one(self):
+        days = [LONG_DAY, LEGAL_DAY, LONG_DAY[:3], LEGAL_DAY[1:]] * 50
+        self.assertEqual(hos.evaluate_entries(days), [hos.evaluate_entries([d])[0] for d in days])
+
+
+class HOSEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        u = User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=u, license="LIC1", truck="T1", trailer="TR1")
+        self.client.force_authenticate(user=u)
+        self.long = ELDLog.objects.create(driver=self.driver, logEntries=LONG_DAY)
+        self.legal = ELDLog.objects.create(driver=self.driver, logEntries=LEGAL_DAY)
+
+    def test_detail_and_list_annotation(self):
+        res = self.client.get(f"/api/v1/eldlogs/{self.long.id}/hos/")
+        self.assertEqual((res.status_code, res.json()['violations']), (200, ['driving', 'break']))
+
+        rows = self.client.get("/api/v1/eldlogs/?hos=1").json()['results']
+        self.assertEqual({row['id']: row['hos']['violations'] for row in rows}, {self.long.id: ['driving', 'break'], self.legal.id: []})
+        self.assertNotIn('hos', self.client.get("/api/v1/eldlogs/").json()['results'][0])
+        self.assertEqual(set(self.client.get(f"/api/v1/eldlogs/{self.legal.id}/?hos=1&fields=id,hos").json()), {'id', 'hos'})
+
+    def test_results_are_cached_until_the_log_changes(self):
+        with mock.patch.object(hos, 'evaluate_entries', wraps=hos.evaluate_entries) as evaluate:
+            self.client.get("/api/v1/eldlogs/?hos=1")
+            self.client.get("/api/v1/eldlogs/?hos=1")
+            self.client.get(f"/api/v1/eldlogs/{self.long.id}/hos/")
+            self.assertEqual(evaluate.call_count, 1)
+            self.client.patch(f"/api/v1/eldlogs/{self.long.id}/", {'logEntries': LEGAL_DAY}, format='json')
+            rows = self.client.get("/api/v1/eldlogs/?hos=1").json()['results']
+        self.assertEqual(evaluate.call_count, 2)
+        # Only the edited log was evaluated again
+        self.assertEqual(len(evaluate.call_args.args[0]), 1)
+        self.assertEqual([row['hos']['violations'] for row in rows], [[], []])
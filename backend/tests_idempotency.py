@@ -0,0 +1,81 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from backend.idempotency import _fingerprint
+from backend.models import User, Driver, Trip, ELDLog, IdempotencyKey
+
+
+class IdempotentSubmitTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        u = User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=u, license="LIC1", truck="T1", trailer="TR1")
+        self.client.force_authenticate(user=u)
+        self.trip = {'username': 'driver1', 'start': 'A', 'end': 'B', 'mileage': 40}
+
+    def _post(self, url, body, key):
+        return self.client.post(url, body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_trip_without_writing_again(self):
+        first = self._post("/api/v1/trips/submit/", self.trip, 'k1')
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as ctx:
+            retry = self._post("/api/v1/trips/submit/", self.trip, 'k1')
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(Trip.objects.count(), 1)
+        self.assertEqual(Driver.objects.get(pk=self.driver.pk).mileage, 40)
+
+        # Replay still works from the key table once the cached copy is gone
+        cache.clear()
+        self.assertEqual(self._post("/api/v1/trips/submit/", self.trip, 'k1').json()['id'], first.json()['id'])
+        self.assertEqual(Trip.objects.count(), 1)
+
+    def test_key_reuse_with_other_body_and_in_progress_claims(self):
+        self._post("/api/v1/trips/submit/", self.trip, 'k1')
+        self.assertEqual(self._post("/api/v1/trips/submit/", dict(self.trip, mileage=41), 'k1').status_code, 422)
+        # Keys are per endpoint, and requests without a key are unaffected
+        self.assertEqual(self._post("/api/v1/eldlogs/submit/", {'username': 'driver1', 'logEntries': []}, 'k1').status_code, 201)
+        self.assertEqual(self.client.post("/api/v1/trips/submit/", self.trip, format='json').status_code, 201)
+
+        IdempotencyKey.objects.create(
+            user=self.driver.user, scope='trips.submit', key='busy', fingerprint=_fingerprint(self.trip),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.assertEqual(self._post("/api/v1/trips/submit/", self.trip, 'busy').status_code, 409)
+
+    def test_failed_request_releases_key(self):
+        bad = {'username': 'ghost', 'start': 'A', 'end': 'B'}
+        self.assertEqual(self._post("/api/v1/trips/submit/", bad, 'k2').status_code, 404)
+        self.assertFalse(IdempotencyKey.objects.filter(key='k2').exists())
+
+    def test_eldlog_and_bulk_submits_are_idempotent(self):
+        body = {'username': 'driver1', 'logEntries': [{'start': 6, 'end': 8, 'status': 'On Duty'}]}
+        first = self._post("/api/v1/eldlogs/submit/", body, 'e1')
+        self.assertEqual(self._post("/api/v1/eldlogs/submit/", body, 'e1').json()['id'], first.json()['id'])
+        self.assertEqual(ELDLog.objects.count(), 1)
+
+        self._post("/api/v1/trips/bulk-submit/", [self.trip, self.trip], 'b1')
+        res = self._post("/api/v1/trips/bulk-submit/", [self.trip, self.trip], 'b1')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(Trip.objects.count(), 2)
+
+    def test_purge_removes_only_expired_keys(self):
+        self._post("/api/v1/trips/submit/", self.trip, 'fresh')
+        IdempotencyKey.objects.create(
+            user=self.driver.user, scope='trips.submit', key='old', fingerprint='x', status_code=201,
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+        out = StringIO()
+        call_command('purge_idempotency_keys', stdout=out)
+        self.assertIn('Purged 1', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['fresh'])
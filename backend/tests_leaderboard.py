@@ -1,9 +1,17 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
 from rest_framework.test import APITestCase, APIClient
-from backend.models import User, Driver
+from backend.models import User, Driver, DriverDailyMileage, Supervisor, Trip
+from backend.leaderboard import invalidate_top
+from backend.ranking import LocalRankIndex, get_rank_index
 
 
 class LeaderboardAPITests(APITestCase):
     def setUp(self):
+        # Drop cached boards (and, via their generation keys, the in-process rank index)
+        cache.clear()
         self.client = APIClient()
         # Create users and drivers with varying mileage
         self.users = []
@@ -43,3 +51,246 @@ class LeaderboardAPITests(APITestCase):
         self.assertEqual(res.status_code, 200)
         data = res.json()
         self.assertIsNone(data['me'])
+
+
+class PeriodLeaderboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.users = []
+        for i in range(1, 4):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            # Lifetime mileage differs from period mileage on purpose
+            Driver.objects.create(user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}", mileage=5000 - i * 1000)
+            self.users.append(u)
+        self.client.force_authenticate(user=self.users[0])
+
+    def _submit(self, user, miles):
+        self.client.force_authenticate(user=user)
+        res = self.client.post("/api/v1/trips/submit/", {'username': user.username, 'start': 'A', 'end': 'B', 'mileage': miles}, format='json')
+        self.assertEqual(res.status_code, 201)
+
+    def test_week_board_reads_submitted_trips_from_rollup(self):
+        self._submit(self.users[2], 300)
+        self._submit(self.users[2], 50)
+        self._submit(self.users[1], 200)
+        self.assertEqual(DriverDailyMileage.objects.get(driver__user=self.users[2]).trips, 2)
+        self.client.force_authenticate(user=self.users[0])
+        data = self.client.get("/api/v1/drivers/leaderboard/?period=week&limit=2").json()
+        self.assertEqual([(r['username'], r['mileage']) for r in data['top']], [('driver3', 350), ('driver2', 200)])
+        self.assertEqual(data['me'], {'username': 'driver1', 'name': 'driver1', 'mileage': 0, 'rank': 3})
+
+    def test_rebuild_matches_incremental_rollup(self):
+        self._submit(self.users[0], 120)
+        self._submit(self.users[1], 80)
+        before = sorted(DriverDailyMileage.objects.values_list('driver_id', 'date', 'mileage', 'trips'))
+        call_command('rebuild_mileage_rollup', stdout=StringIO())
+        after = sorted(DriverDailyMileage.objects.values_list('driver_id', 'date', 'mileage', 'trips'))
+        self.assertEqual(before, after)
+
+    def test_trip_edits_and_deletes_move_the_rollup(self):
+        self._submit(self.users[2], 300)
+        self._submit(self.users[1], 200)
+        self._submit(self.users[1], 50)
+        trips = list(Trip.objects.filter(driver__user=self.users[1]).order_by('id'))
+        self.client.force_authenticate(user=self.users[0])
+        self.assertEqual(self.client.patch(f"/api/v1/trips/{trips[0].id}/", {'mileage': 500}, format='json').status_code, 200)
+        self.assertEqual(self.client.delete(f"/api/v1/trips/{trips[1].id}/").status_code, 204)
+        row = DriverDailyMileage.objects.get(driver__user=self.users[1])
+        self.assertEqual((row.mileage, row.trips), (500, 1))
+        data = self.client.get("/api/v1/drivers/leaderboard/?period=week&limit=2").json()
+        self.assertEqual([(r['username'], r['mileage']) for r in data['top']], [('driver2', 500), ('driver3', 300)])
+
+    def test_loaded_period_board_follows_trip_crud(self):
+        self._submit(self.users[2], 300)
+        self._submit(self.users[1], 200)
+        trip = Trip.objects.get(driver__user=self.users[1])
+        self.client.force_authenticate(user=self.users[0])
+        week = "/api/v1/drivers/leaderboard/?period=week&limit=2"
+        self.assertEqual(self.client.get(week).json()['top'][0]['username'], 'driver3')
+        self.client.patch(f"/api/v1/trips/{trip.id}/", {'mileage': 700}, format='json')
+        self.assertEqual([(r['username'], r['mileage']) for r in self.client.get(week).json()['top']], [('driver2', 700), ('driver3', 300)])
+        self.client.delete(f"/api/v1/trips/{trip.id}/")
+        self.assertEqual([(r['username'], r['mileage']) for r in self.client.get(week).json()['top']], [('driver3', 300), ('driver1', 0)])
+        out = StringIO()
+        call_command('rank_index', '--check', '--period', 'week', stdout=out)
+        self.assertNotIn('mismatch', out.getvalue())
+
+    def test_driver_added_after_board_load_shows_up(self):
+        self._submit(self.users[2], 300)
+        self.client.get("/api/v1/drivers/leaderboard/?period=week")
+        u = User.objects.create_user(username="driver9", email="driver9@ex.com", password="pass1234", role='driver')
+        Driver.objects.create(user=u, license="LIC9", truck="T9", trailer="TR9")
+        self._submit(u, 900)
+        data = self.client.get("/api/v1/drivers/leaderboard/?period=week&limit=1").json()
+        self.assertEqual((data['top'][0]['username'], data['top'][0]['mileage']), ('driver9', 900))
+        self.assertIsNone(data['me'])
+
+    def test_rank_index_follows_submits_and_matches_sql(self):
+        # Build the boards first so later submits exercise the incremental path
+        self.client.get("/api/v1/drivers/leaderboard/")
+        self.client.get("/api/v1/drivers/leaderboard/?period=week")
+        self._submit(self.users[2], 2500)
+        self.client.force_authenticate(user=self.users[2])
+        data = self.client.get("/api/v1/drivers/leaderboard/?period=week&limit=1").json()
+        self.assertEqual(data['top'][0]['username'], 'driver3')
+        out = StringIO()
+        call_command('rank_index', '--check', stdout=out)
+        self.assertNotIn('mismatch', out.getvalue())
+
+
+class LocalRankIndexTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.index = LocalRankIndex()
+        self.index.load('b', {1: 100, 2: 300, 3: 100, 4: 50})
+
+    def test_top_orders_by_miles_then_id(self):
+        self.assertEqual(self.index.top('b', 3), [(2, 300), (1, 100), (3, 100)])
+
+    def test_rank_is_competition_style_and_tracks_updates(self):
+        self.assertEqual(self.index.rank('b', 3), (100, 2))
+        self.assertEqual(self.index.rank('b', 4), (50, 4))
+        self.index.incr('b', 4, 251)
+        self.assertEqual(self.index.rank('b', 4), (301, 1))
+        self.assertEqual(self.index.rank('b', 2), (300, 2))
+        self.assertIsNone(self.index.rank('b', 99))
+
+    def test_generation_change_invalidates_local_copy(self):
+        cache.clear()
+        self.assertFalse(self.index.has('b'))
+
+    def test_writes_from_a_process_without_the_board_invalidate_others(self):
+        other = LocalRankIndex()
+        other.set('b', 1, 500)
+        self.assertFalse(self.index.has('b'))
+        self.index.load('b', {1: 100, 2: 300})
+        other.remove('b', 2)
+        self.assertFalse(self.index.has('b'))
+
+    def test_incr_of_unknown_member_invalidates_board(self):
+        self.index.incr('b', 99, 10)
+        self.assertFalse(self.index.has('b'))
+
+
+class LeaderboardCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.users = []
+        for i, miles in enumerate([900, 800, 700], start=1):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            Driver.objects.create(user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}", mileage=miles)
+            self.users.append(u)
+        self.client.force_authenticate(user=self.users[2])
+
+    def _top(self, query=''):
+        return [r['username'] for r in self.client.get(f"/api/v1/drivers/leaderboard/{query}").json()['top']]
+
+    def test_submit_refreshes_cached_board_immediately(self):
+        self.assertEqual(self._top(), ['driver1', 'driver2', 'driver3'])
+        res = self.client.post("/api/v1/trips/submit/", {'username': 'driver3', 'start': 'A', 'end': 'B', 'mileage': 500}, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self._top(), ['driver3', 'driver1', 'driver2'])
+
+    def test_limits_share_one_cached_list(self):
+        self.assertEqual(self._top('?limit=2'), ['driver1', 'driver2'])
+        self.assertEqual(cache.get('leaderboard:top:all')['top'][2]['username'], 'driver3')
+        self.assertEqual(self._top('?limit=1'), ['driver1'])
+
+    def test_stale_copy_served_while_another_request_recomputes(self):
+        self._top()
+        invalidate_top()
+        # Simulate a concurrent recompute holding the lock
+        cache.add('leaderboard:lock:all', 1)
+        Driver.objects.filter(user=self.users[2]).update(mileage=5000)
+        self.assertEqual(self._top(), ['driver1', 'driver2', 'driver3'])
+        cache.delete('leaderboard:lock:all')
+        get_rank_index().set('all', Driver.objects.get(user=self.users[2]).pk, 5000)
+        self.assertEqual(self._top()[0], 'driver3')
+
+
+class ScopedLeaderboardTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.sups = []
+        for name, office in [('sup1', 'Denver'), ('sup2', 'Austin')]:
+            u = User.objects.create_user(username=name, email=f"{name}@ex.com", password="pass1234", role='supervisor')
+            self.sups.append(Supervisor.objects.create(user=u, office=office, email=f"{name}@ex.com"))
+        self.users = []
+        # driver1/2 report to sup1 (Denver), driver3/4 to sup2 (Austin)
+        for i, miles in enumerate([900, 800, 700, 600], start=1):
+            sup = self.sups[(i - 1) // 2]
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            Driver.objects.create(user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}", mileage=miles, supervisor=sup, office=sup.office)
+            self.users.append(u)
+
+    def _board(self, query):
+        return self.client.get(f"/api/v1/drivers/leaderboard/{query}").json()
+
+    def test_supervisor_scope_ranks_only_the_team(self):
+        self.client.force_authenticate(user=self.users[3])
+        data = self._board('?scope=supervisor')
+        self.assertEqual([r['username'] for r in data['top']], ['driver3', 'driver4'])
+        self.assertEqual([r['rank'] for r in data['top']], [1, 2])
+        # A supervisor without a driver profile gets their own team's board
+        self.client.force_authenticate(user=self.sups[0].user)
+        data = self._board('?scope=supervisor')
+        self.assertEqual([r['username'] for r in data['top']], ['driver1', 'driver2'])
+
+    def test_office_scope_value_and_me_outside_scope(self):
+        self.client.force_authenticate(user=self.users[0])
+        data = self._board('?scope=office&scope_value=Austin')
+        self.assertEqual([r['username'] for r in data['top']], ['driver3', 'driver4'])
+        self.assertIsNone(data['me'])
+        self.client.force_authenticate(user=self.users[1])
+        self.assertEqual(self._board('?scope=office&limit=1')['me']['rank'], 2)
+
+    def test_missing_scope_value_is_rejected(self):
+        self.client.force_authenticate(user=self.users[0])
+        self.assertEqual(self.client.get("/api/v1/drivers/leaderboard/?scope=terminal").status_code, 400)
+
+    def test_new_driver_in_loaded_scope_shows_up(self):
+        self.client.force_authenticate(user=self.sups[1].user)
+        self._board('?scope=supervisor')
+        self._board('?scope=supervisor&period=week')
+        # Created in sup2's team after both boards were loaded, e.g. from the admin
+        admin_user = User.objects.create_superuser(username="root", email="root@ex.com", password="pass1234")
+        self.client.force_login(admin_user)
+        u = User.objects.create_user(username="driver5", email="driver5@ex.com", password="pass1234", role='driver')
+        res = self.client.post("/admin/backend/driver/add/", {
+            'user': u.pk, 'supervisor': self.sups[1].pk, 'license': 'LIC5', 'truck': 'T5', 'trailer': 'TR5',
+            'office': 'Austin', 'status': 'Active', 'mileage': 650, 'cycleUsed': 0, 'tripsToday': 0, 'recentTrips': '[]',
+        })
+        self.assertEqual(res.status_code, 302)
+        self.client.force_authenticate(user=self.sups[1].user)
+        self.assertEqual([r['username'] for r in self._board('?scope=supervisor')['top']], ['driver3', 'driver5', 'driver4'])
+
+        # Their first trip lands on the already-loaded period board too
+        self.client.force_authenticate(user=u)
+        res = self.client.post("/api/v1/trips/submit/", {'username': 'driver5', 'start': 'A', 'end': 'B', 'mileage': 120}, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.client.force_authenticate(user=self.sups[1].user)
+        week = self._board('?scope=supervisor&period=week')['top']
+        self.assertEqual((week[0]['username'], week[0]['mileage']), ('driver5', 120))
+
+    def test_submit_and_reassignment_update_scoped_boards(self):
+        self.client.force_authenticate(user=self.users[3])
+        self._board('?scope=supervisor')
+        self._board('?scope=supervisor&period=week')
+        res = self.client.post("/api/v1/trips/submit/", {'username': 'driver4', 'start': 'A', 'end': 'B', 'mileage': 500}, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self._board('?scope=supervisor')['top'][0]['username'], 'driver4')
+        self.assertEqual(self._board('?scope=supervisor&period=week')['top'][0]['mileage'], 500)
+
+        # Load sup1's board, then move driver4 over to it
+        self.client.force_authenticate(user=self.sups[0].user)
+        self.assertEqual(len(self._board('?scope=supervisor')['top']), 2)
+        res = self.client.post("/api/v1/drivers/driver4/assign-supervisor/", {'supervisor_username': 'sup1'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([r['username'] for r in self._board('?scope=supervisor')['top']], ['driver4', 'driver1', 'driver2'])
+        self.assertEqual([r['username'] for r in self._board('?scope=supervisor&scope_value=sup2')['top']], ['driver3'])
+        out = StringIO()
+        call_command('rank_index', '--check', '--scope', f'supervisor:{self.sups[0].pk}', stdout=out)
+        self.assertIn('all: consistent', out.getvalue())
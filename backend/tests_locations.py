@@ -0,0 +1,84 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Trip, Location
+
+
+class LocationDictionaryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        u = User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=u, license="LIC1", truck="T1", trailer="TR1")
+        self.client.force_authenticate(user=u)
+
+    def _submit(self, start, end, stops=(), mileage=100):
+        body = {'username': 'driver1', 'start': start, 'end': end, 'stops': list(stops), 'mileage': mileage}
+        res = self.client.post("/api/v1/trips/submit/", body, format='json')
+        self.assertEqual(res.status_code, 201)
+        return Trip.objects.get(pk=res.json()['id'])
+
+    def _counts(self):
+        return dict(Location.objects.values_list('key', 'trip_count'))
+
+    def test_places_are_normalized_and_counted(self):
+        trip = self._submit('Chicago, IL', 'Milwaukee, WI', stops=[{'name': 'Kenosha,  WI', 'coords': [42.58, -87.82]}, 'Racine, WI'])
+        items = [
+            {'username': 'driver1', 'start': ' chicago,  il', 'end': 'MILWAUKEE, WI'},
+            {'username': 'driver1', 'start': 'Lat: 41.88, Lng: -87.63', 'end': 'Racine, WI'},
+        ]
+        self.assertEqual(self.client.post("/api/v1/trips/bulk-submit/", items, format='json').status_code, 201)
+
+        self.assertEqual(self._counts(), {
+            'chicago, il': 2, 'milwaukee, wi': 2, 'kenosha, wi': 1, 'racine, wi': 2, 'lat: 41.88, lng: -87.63': 1,
+        })
+        kenosha, racine = Location.objects.get(key='kenosha, wi'), Location.objects.get(key='racine, wi')
+        self.assertEqual(trip.stop_ids, [kenosha.id, racine.id])
+        self.assertEqual((kenosha.name, kenosha.lat, kenosha.lng), ('Kenosha, WI', 42.58, -87.82))
+        self.assertEqual(Location.objects.get(key__startswith='lat:').lat, 41.88)
+        # The submitted text is kept as it was
+        self.assertEqual(Trip.objects.filter(start_location=trip.start_location).count(), 2)
+        self.assertEqual(self.client.get(f"/api/v1/trips/{trip.id}/").json()['startLocation'], trip.start_location_id)
+
+    def test_edits_and_deletes_move_counts(self):
+        trip = self._submit('Chicago, IL', 'Milwaukee, WI')
+        self.client.patch(f"/api/v1/trips/{trip.id}/", {'end': 'Madison, WI'}, format='json')
+        self.assertEqual(self._counts(), {'chicago, il': 1, 'milwaukee, wi': 0, 'madison, wi': 1})
+        self.client.delete(f"/api/v1/trips/{trip.id}/")
+        self.assertEqual(set(self._counts().values()), {0})
+
+    def test_search_autocomplete_and_lanes(self):
+        for _ in range(3):
+            self._submit('Chicago, IL', 'Milwaukee, WI', mileage=90)
+        self._submit('Chicago, IL', 'Madison, WI', mileage=150)
+        self._submit('Denver, CO', 'Kansas City, MO', mileage=600)
+
+        res = self.client.get("/api/v1/trips/?search=MILWAUKEE").json()
+        self.assertEqual(res['count'], 3)
+        self.assertEqual(self.client.get("/api/v1/trips/?search=driver1").json()['count'], 5)
+
+        suggestions = self.client.get("/api/v1/locations/?q=ch").json()
+        self.assertEqual([(s['name'], s['tripCount']) for s in suggestions], [('Chicago, IL', 4)])
+        names = [s['name'] for s in self.client.get("/api/v1/locations/?limit=2").json()]
+        self.assertEqual(names, ['Chicago, IL', 'Milwaukee, WI'])
+
+        lanes = self.client.get("/api/v1/trips/lanes/").json()['results']
+        self.assertEqual(
+            [(lane['start']['name'], lane['end']['name'], lane['trips'], lane['mileage']) for lane in lanes],
+            [('Chicago, IL', 'Milwaukee, WI', 3, 270), ('Chicago, IL', 'Madison, WI', 1, 150), ('Denver, CO', 'Kansas City, MO', 1, 600)],
+        )
+        denver = Location.objects.get(key='denver, co')
+        only = self.client.get(f"/api/v1/trips/lanes/?location={denver.id}").json()['results']
+        self.assertEqual([lane['avgMileage'] for lane in only], [600])
+        self.assertEqual(self.client.get("/api/v1/trips/lanes/?location=x").status_code, 400)
+
+    def test_rebuild_recounts(self):
+        self._submit('Chicago, IL', 'Milwaukee, WI', stops=['Racine, WI'])
+        before = self._counts()
+        Trip.objects.update(start_location=None, end_location=None, stop_ids=[])
+        Location.objects.update(trip_count=7)
+        call_command('rebuild_locations', stdout=StringIO())
+        self.assertEqual(self._counts(), before)
+        self.assertEqual(len(Trip.objects.get().stop_ids), 1)
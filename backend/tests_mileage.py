@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Trip, DriverDailyMileage
+from backend.geometry import store_geometry
+from backend.mileage import haversine_miles, reconcile_mileage, route_miles
+from backend.polyline import encode
+
+# Chicago -> Milwaukee along three legs, about 82 miles
+ROUTE = [[41.8781, -87.6298], [42.3, -87.85], [42.6, -87.9], [43.0389, -87.9065]]
+
+
+class MileageFunctionTests(SimpleTestCase):
+    def test_haversine_matches_known_distances(self):
+        self.assertAlmostEqual(haversine_miles([[0, 0], [1, 0]]), 69.09, places=1)
+        # Los Angeles -> New York great circle
+        self.assertAlmostEqual(haversine_miles([[34.0522, -118.2437], [40.7128, -74.0060]]), 2445.6, delta=1)
+        self.assertEqual(haversine_miles([[10, 10]]), 0.0)
+        self.assertAlmostEqual(route_miles(encode(ROUTE)), 82.5, delta=0.5)
+        self.assertIsNone(route_miles(None))
+        self.assertIsNone(route_miles(encode([[41.8781, -87.6298]])))
+
+    def test_reconcile_prefers_report_within_tolerance(self):
+        self.assertEqual(reconcile_mileage(85, 82.5), 85)
+        self.assertEqual(reconcile_mileage(400, 82.5), 82)
+        self.assertEqual(reconcile_mileage(None, 82.5), 82)
+        self.assertEqual(reconcile_mileage(3, 1.2), 3)
+        self.assertEqual(reconcile_mileage(42, None), 42)
+        self.assertEqual(reconcile_mileage(None, None), 0)
+
+
+class TripMileageTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        u = User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=u, license="LIC1", truck="T1", trailer="TR1")
+        self.client.force_authenticate(user=u)
+
+    def _submit(self, **extra):
+        body = {'username': 'driver1', 'start': 'Chicago', 'end': 'Milwaukee', 'polyline': ROUTE, **extra}
+        return self.client.post("/api/v1/trips/submit/", body, format='json').json()
+
+    def test_submit_stores_reported_and_route_miles(self):
+        kept = self._submit(mileage=85)
+        self.assertEqual((kept['mileage'], kept['reportedMileage']), (85, 85))
+        self.assertAlmostEqual(kept['routeMileage'], 82.5, delta=0.5)
+        inflated = self._submit(mileage='900')
+        self.assertEqual((inflated['mileage'], inflated['reportedMileage']), (82, 900))
+        missing = self._submit(mileage='n/a')
+        self.assertEqual((missing['mileage'], missing['reportedMileage']), (82, None))
+        no_route = self._submit(polyline=None, mileage=12)
+        self.assertEqual((no_route['mileage'], no_route['routeMileage']), (12, None))
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.mileage, 85 + 82 + 82 + 12)
+
+    def test_single_point_route_keeps_reported_miles(self):
+        trip = self._submit(polyline=[[41.8781, -87.6298]], mileage=85)
+        self.assertEqual((trip['mileage'], trip['reportedMileage'], trip['routeMileage']), (85, 85, None))
+
+    def test_recompute_command_corrects_history(self):
+        # Stored before server-side measuring: taken at the client's word
+        trip = Trip.objects.create(driver=self.driver, start="A", end="B", geometry=store_geometry(encode(ROUTE)), mileage=500)
+        Driver.objects.filter(pk=self.driver.pk).update(mileage=500)
+        DriverDailyMileage.objects.create(driver=self.driver, date=trip.date, mileage=500, trips=1)
+
+        url = "/api/v1/drivers/leaderboard/?period=week"
+        self.assertEqual(self.client.get(url).json()['top'][0]['mileage'], 500)
+        out = StringIO()
+        call_command('recompute_trip_mileage', '--dry-run', '--workers', '1', stdout=out)
+        self.assertIn('1 would change', out.getvalue())
+        self.assertEqual(Trip.objects.get(pk=trip.pk).mileage, 500)
+
+        call_command('recompute_trip_mileage', '--workers', '2', '--batch-size', '1', stdout=StringIO())
+        trip.refresh_from_db()
+        self.driver.refresh_from_db()
+        self.assertEqual(trip.mileage, 82)
+        self.assertAlmostEqual(trip.routeMileage, 82.5, delta=0.5)
+        self.assertEqual(self.driver.mileage, 82)
+        self.assertEqual(DriverDailyMileage.objects.get(driver=self.driver).mileage, 82)
+        # Rank boards reload from the corrected totals
+        self.assertEqual(self.client.get(url).json()['top'][0]['mileage'], 82)
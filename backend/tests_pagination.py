@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Trip
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="d1", email="d1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=self.user, license="L1", truck="T1", trailer="TR1")
+        today = timezone.now().date()
+        # Several trips share a date so the id tie-breaker matters
+        for i in range(7):
+            trip = Trip.objects.create(driver=self.driver, start=f"S{i}", end="E", stops=[], mileage=i)
+            Trip.objects.filter(pk=trip.pk).update(date=today - timedelta(days=i // 3))
+        self.client.force_authenticate(user=self.user)
+
+    def _walk(self, url):
+        seen = []
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            data = res.json()
+            self.assertNotIn('count', data)
+            seen.extend(data['results'])
+            url = data['next']
+        return seen
+
+    def test_cursor_pages_cover_all_rows_in_date_id_order(self):
+        rows = self._walk(f"/api/v1/trips/by-username/{self.user.username}/?pagination=cursor&page_size=3")
+        expected = list(Trip.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual([r['id'] for r in rows], expected)
+
+    def test_page_number_mode_is_unchanged(self):
+        res = self.client.get("/api/v1/trips/?page=2&page_size=3")
+        data = res.json()
+        self.assertEqual(data['count'], 7)
+        self.assertEqual(len(data['results']), 3)
+
+    def test_invalid_cursor_is_404(self):
+        res = self.client.get("/api/v1/trips/?cursor=not-a-cursor")
+        self.assertEqual(res.status_code, 404)
@@ -0,0 +1,155 @@
+import json
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Trip, ELDLog
+from backend.geometry import store_geometry
+from backend.polyline import ZOOM_LEVELS, decode, decode_deltas, encode, encode_deltas, normalize_polyline, simplify
+
+ROUTE = [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]]
+ROUTE_ENCODED = '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+class PolylineCodecTests(SimpleTestCase):
+    def test_matches_reference_encoding(self):
+        self.assertEqual(encode(ROUTE), ROUTE_ENCODED)
+        np.testing.assert_allclose(decode(ROUTE_ENCODED), ROUTE)
+
+    def test_round_trips_long_routes_within_precision(self):
+        rng = np.random.default_rng(7)
+        points = np.cumsum(rng.normal(0, 0.01, (2000, 2)), axis=0) + [40, -100]
+        self.assertLess(np.abs(decode(encode(points)) - points).max(), 6e-6)
+        self.assertLess(np.abs(decode_deltas(encode_deltas(points)) - points).max(), 6e-6)
+        self.assertLess(len(encode(points)) * 5, len(json.dumps(points.tolist())))
+
+    def test_normalize_accepts_json_lists_and_encoded_strings(self):
+        self.assertEqual(normalize_polyline(json.dumps(ROUTE)), ROUTE_ENCODED)
+        self.assertEqual(normalize_polyline(ROUTE), ROUTE_ENCODED)
+        self.assertEqual(normalize_polyline(ROUTE_ENCODED), ROUTE_ENCODED)
+        self.assertIsNone(normalize_polyline(''))
+        for bad in ('[[1, 2], [3]]', '[[95, 0]]', '_p~iF~ps|U_', 'not ascii é'):
+            with self.assertRaises(ValueError):
+                normalize_polyline(bad)
+
+
+class PolylineApiTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        u = User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=u, license="LIC1", truck="T1", trailer="TR1")
+        self.client.force_authenticate(user=u)
+
+    def test_submit_stores_encoded_and_renders_requested_format(self):
+        body = {'username': 'driver1', 'start': 'A', 'end': 'B', 'polyline': json.dumps(ROUTE)}
+        res = self.client.post("/api/v1/trips/submit/", body, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.json()['polyline'], ROUTE_ENCODED)
+        trip = Trip.objects.get()
+        self.assertEqual(trip.polyline, ROUTE_ENCODED)
+
+        coords = self.client.get(f"/api/v1/trips/{trip.id}/?polyline_format=coords").json()['polyline']
+        np.testing.assert_allclose(coords, ROUTE)
+        packed = self.client.get(f"/api/v1/trips/{trip.id}/?polyline_format=delta").json()['polyline']
+        np.testing.assert_allclose(decode_deltas(packed), ROUTE)
+
+    def test_invalid_polyline_is_rejected(self):
+        body = {'username': 'driver1', 'start': 'A', 'end': 'B', 'polyline': '[[1, 2], [3]]'}
+        self.assertEqual(self.client.post("/api/v1/trips/submit/", body, format='json').status_code, 400)
+
+
+class PolylineSimplificationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        u = User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver')
+        Driver.objects.create(user=u, license="LIC1", truck="T1", trailer="TR1")
+        self.client.force_authenticate(user=u)
+        # A dense, gently wiggling 3,000-point route
+        lng = np.linspace(-100, -90, 3000)
+        self.route = np.column_stack((40 + 0.3 * np.sin(lng), lng))
+
+    def test_simplify_keeps_route_within_tolerance(self):
+        reduced = simplify(self.route, 0.01)
+        self.assertLess(len(reduced), len(self.route) / 10)
+        np.testing.assert_array_equal(reduced[[0, -1]], self.route[[0, -1]])
+        # Every original point stays close to the simplified line (checked against its interpolation)
+        lat = np.interp(self.route[:, 1], reduced[:, 1], reduced[:, 0])
+        self.assertLess(np.abs(lat - self.route[:, 0]).max(), 0.011)
+
+    def test_zoom_uses_variants_computed_at_submit(self):
+        body = {'username': 'driver1', 'start': 'A', 'end': 'B', 'polyline': self.route.tolist()}
+        trip_id = self.client.post("/api/v1/trips/submit/", body, format='json').json()['id']
+        trip = Trip.objects.get(pk=trip_id)
+        self.assertEqual(sorted(trip.geometry.polyline_variants, key=int), [str(z) for z in ZOOM_LEVELS])
+
+        full = self.client.get(f"/api/v1/trips/{trip_id}/?polyline_format=coords").json()['polyline']
+        thumb = self.client.get(f"/api/v1/trips/{trip_id}/?zoom=5&polyline_format=coords").json()['polyline']
+        self.assertEqual(len(full), 3000)
+        self.assertEqual(thumb, decode(trip.geometry.polyline_variants['6']).tolist())
+        self.assertLess(len(thumb), 100)
+
+        # Arbitrary tolerances are computed once and then served from the cache
+        coarse = self.client.get(f"/api/v1/trips/{trip_id}/?simplify=0.5").json()['polyline']
+        self.assertLess(len(decode(coarse)), len(decode(trip.geometry.polyline_variants['4'])))
+        self.assertEqual(self.client.get(f"/api/v1/trips/{trip_id}/?simplify=0.5").json()['polyline'], coarse)
+
+        logs = self.client.post("/api/v1/eldlogs/submit/", {'username': 'driver1', 'tripId': trip_id}, format='json')
+        eld = self.client.get(f"/api/v1/eldlogs/{logs.json()['id']}/?expand=trip&zoom=12").json()
+        self.assertEqual(eld['trip']['polyline'], trip.geometry.polyline_variants['12'])
+
+    def test_edits_recompute_variants(self):
+        body = {'username': 'driver1', 'start': 'A', 'end': 'B', 'polyline': self.route.tolist()}
+        trip_id = self.client.post("/api/v1/trips/submit/", body, format='json').json()['id']
+        res = self.client.patch(f"/api/v1/trips/{trip_id}/", {'polyline': ROUTE}, format='json')
+        self.assertEqual(res.status_code, 200)
+        trip = Trip.objects.get(pk=trip_id)
+        self.assertEqual((trip.polyline, trip.geometry.polyline_variants), (ROUTE_ENCODED, {}))
+        self.client.patch(f"/api/v1/trips/{trip_id}/", {'polyline': None}, format='json')
+        self.assertIsNone(Trip.objects.get(pk=trip_id).polyline)
+
+
+class GeometryEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        u = User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=u, license="LIC1", truck="T1", trailer="TR1")
+        self.client.force_authenticate(user=u)
+        self.trip = Trip.objects.create(driver=self.driver, start="A", end="B", geometry=store_geometry(ROUTE_ENCODED))
+        ELDLog.objects.create(driver=self.driver, trip=self.trip, logEntries=[])
+
+    def test_lists_leave_out_and_do_not_read_geometry(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rows = self.client.get("/api/v1/trips/").json()['results']
+        self.assertNotIn('polyline', rows[0])
+        self.assertFalse(any('"polyline"' in q['sql'] for q in ctx.captured_queries))
+        rows = self.client.get("/api/v1/trips/by-username/driver1/?expand=polyline").json()['results']
+        self.assertEqual(rows[0]['polyline'], ROUTE_ENCODED)
+
+        with CaptureQueriesContext(connection) as ctx:
+            logs = self.client.get("/api/v1/eldlogs/by-username/driver1/?expand=trip").json()['results']
+        self.assertNotIn('polyline', logs[0]['trip'])
+        self.assertFalse(any('"polyline"' in q['sql'] for q in ctx.captured_queries))
+        logs = self.client.get("/api/v1/eldlogs/by-username/driver1/?expand=trip,trip.polyline").json()['results']
+        self.assertEqual(logs[0]['trip']['polyline'], ROUTE_ENCODED)
+        # Single objects keep their geometry
+        self.assertEqual(self.client.get(f"/api/v1/trips/{self.trip.id}/").json()['polyline'], ROUTE_ENCODED)
+
+    def test_geometry_endpoint_revalidates_with_etag(self):
+        url = f"/api/v1/trips/{self.trip.id}/geometry/"
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['polyline'], ROUTE_ENCODED)
+        etag = res['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Each rendering has its own tag, and editing the route changes it
+        coords = self.client.get(f"{url}?polyline_format=coords", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(coords.status_code, 200)
+        self.assertNotEqual(coords['ETag'], etag)
+        Trip.objects.filter(pk=self.trip.pk).update(geometry=store_geometry(encode(ROUTE[:2])))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Supervisor, Trip, ELDLog, ApprovalRequest
+from backend.serializers import resolve_eldlog_trips
+
+
+class ELDLogTripResolutionTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.sup_user = User.objects.create_user(username="s1", email="s1@ex.com", password="pass1234", role='supervisor')
+        self.supervisor = Supervisor.objects.create(user=self.sup_user, office="HQ", email="s1@ex.com")
+        self.driver_user = User.objects.create_user(username="d1", email="d1@ex.com", password="pass1234", role='driver')
+        self.driver = Driver.objects.create(user=self.driver_user, license="L1", truck="T1", trailer="TR1", supervisor=self.supervisor)
+        self.client.force_authenticate(user=self.driver_user)
+
+    def _add_logs(self, n):
+        # Logs without a trip FK exercise the approval and nearest-date fallbacks
+        for _ in range(n):
+            trip = Trip.objects.create(driver=self.driver, start="A", end="B", stops=[], mileage=10)
+            ELDLog.objects.create(driver=self.driver)
+            eld = ELDLog.objects.create(driver=self.driver)
+            ApprovalRequest.objects.create(trip=trip, eldlog=eld, supervisor=self.supervisor, status='Approved')
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(f"/api/v1/eldlogs/by-username/{self.driver_user.username}/?page_size=100&expand=trip,driver")
+        self.assertEqual(res.status_code, 200)
+        return len(ctx.captured_queries), res.json()['results']
+
+    def test_batch_resolution_uses_two_queries(self):
+        self._add_logs(10)
+        logs = list(ELDLog.objects.select_related('trip'))
+        with self.assertNumQueries(2):
+            resolved = resolve_eldlog_trips(logs)
+        self.assertEqual(len(resolved), 20)
+        self.assertTrue(all(t is not None for t in resolved.values()))
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        self._add_logs(2)
+        small, _ = self._count_list_queries()
+        self._add_logs(10)
+        large, results = self._count_list_queries()
+        self.assertEqual(len(results), 24)
+        self.assertTrue(all(r['trip'] is not None for r in results))
+        self.assertEqual(large, small)
+
+    def test_latest_approval_is_attached_from_prefetch(self):
+        trip = Trip.objects.create(driver=self.driver, start="A", end="B", stops=[], mileage=10)
+        eld = ELDLog.objects.create(driver=self.driver, trip=trip)
+        ApprovalRequest.objects.create(trip=trip, eldlog=eld, supervisor=self.supervisor, status='Rejected')
+        ApprovalRequest.objects.create(trip=trip, eldlog=eld, supervisor=self.supervisor, status='Approved')
+        _, results = self._count_list_queries()
+        self.assertEqual(results[0]['approvalStatus'], 'Approved')
+        self.assertEqual(results[0]['approvalInfo']['supervisor']['username'], self.sup_user.username)
+
+    def test_supervisor_approval_list_query_count_is_flat(self):
+        self.client.force_authenticate(user=self.sup_user)
+        url = f"/api/v1/approvalrequests/by-supervisor/{self.sup_user.username}/?status=Approved&page_size=100&expand=eldlog.driver,trip.driver,supervisor"
+        self._add_logs(2)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self._add_logs(10)
+        with CaptureQueriesContext(connection) as large:
+            res = self.client.get(url)
+        self.assertEqual(len(res.json()['results']), 12)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_resolution_prefers_approval_then_nearest_trip(self):
+        today = timezone.now().date()
+        older = Trip.objects.create(driver=self.driver, start="Old", end="B", stops=[], mileage=5)
+        linked = Trip.objects.create(driver=self.driver, start="Linked", end="B", stops=[], mileage=5)
+        newer = Trip.objects.create(driver=self.driver, start="New", end="B", stops=[], mileage=5)
+        Trip.objects.filter(pk=older.pk).update(date=today - timedelta(days=3))
+        Trip.objects.filter(pk=newer.pk).update(date=today + timedelta(days=3))
+        Trip.objects.filter(pk=linked.pk).update(date=today + timedelta(days=9))
+
+        with_approval = ELDLog.objects.create(driver=self.driver)
+        ApprovalRequest.objects.create(trip=linked, eldlog=with_approval, supervisor=self.supervisor, status='Pending')
+        nearest_before = ELDLog.objects.create(driver=self.driver)
+        nearest_after = ELDLog.objects.create(driver=self.driver)
+        ELDLog.objects.filter(pk=nearest_after.pk).update(date=today - timedelta(days=5))
+
+        _, results = self._count_list_queries()
+        trips = {r['id']: r['trip']['start'] for r in results}
+        self.assertEqual(trips[with_approval.id], "Linked")
+        self.assertEqual(trips[nearest_before.id], "Old")
+        self.assertEqual(trips[nearest_after.id], "Old")
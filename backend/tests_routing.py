@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, CachedRoute
+from backend.routing import SingleFlight, route_memory
+
+OK_ROUTE = {'code': 'Ok', 'routes': [{'distance': 1609.34, 'geometry': {'type': 'LineString', 'coordinates': [[-87.6, 41.8], [-87.9, 43.0]]}}]}
+
+
+class StubOSRM(BaseHTTPRequestHandler):
+    """Answers every path with OK_ROUTE, except coordinates starting at 0,0 (NoRoute)."""
+    paths = []
+
+    def do_GET(self):
+        StubOSRM.paths.append(self.path)
+        no_route = '/0.0000,0.0000;' in self.path
+        body = json.dumps({'code': 'NoRoute', 'message': 'Impossible route'} if no_route else OK_ROUTE).encode()
+        self.send_response(400 if no_route else 200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RouteProxyTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOSRM)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.upstream = override_settings(OSRM_URL=f'http://127.0.0.1:{cls.server.server_port}/', ROUTE_QUANTIZE_DIGITS=4)
+        cls.upstream.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.upstream.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        route_memory().clear()
+        StubOSRM.paths = []
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username="driver1", email="driver1@ex.com", password="pass1234", role='driver'))
+
+    def test_tiers_and_quantization(self):
+        url = "/api/v1/route/v1/driving/-87.62981,41.87811;-87.90649,43.03889?overview=full&geometries=geojson"
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Route-Cache'], 'upstream')
+        self.assertEqual(res.json(), OK_ROUTE)
+        self.assertEqual(StubOSRM.paths, ['/route/v1/driving/-87.6298,41.8781;-87.9065,43.0389?geometries=geojson&overview=full'])
+
+        # A few metres away with the options reordered: same entry
+        nearby = "/api/route/v1/driving/-87.629805,41.878108;-87.90651,43.03891?geometries=geojson&overview=full"
+        self.assertEqual(self.client.get(nearby)['X-Route-Cache'], 'memory')
+        route_memory().clear()
+        self.assertEqual(self.client.get(nearby)['X-Route-Cache'], 'db')
+        self.assertEqual(self.client.get(nearby)['X-Route-Cache'], 'memory')
+        self.assertEqual(len(StubOSRM.paths), 1)
+        self.assertEqual(CachedRoute.objects.count(), 1)
+
+    def test_errors_pass_through_uncached(self):
+        res = self.client.get("/api/v1/route/v1/driving/0,0;1,1")
+        self.assertEqual((res.status_code, res.json()['code']), (400, 'NoRoute'))
+        self.client.get("/api/v1/route/v1/driving/0,0;1,1")
+        self.assertEqual(len(StubOSRM.paths), 2)
+        self.assertFalse(CachedRoute.objects.exists())
+
+        for bad in ('driving/1,2', 'driving/1,2;3,95', 'driving/a,b;1,2', 'driving/1,2;3,4?overview=huge', 'DRIVING/1,2;3,4'):
+            self.assertEqual(self.client.get(f"/api/v1/route/v1/{bad}").status_code, 400, bad)
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/v1/route/v1/driving/1,2;3,4").status_code, 401)
+
+    @override_settings(OSRM_URL='http://127.0.0.1:9', OSRM_TIMEOUT=2)
+    def test_unreachable_upstream_is_502(self):
+        res = self.client.get("/api/v1/route/v1/driving/1,2;3,4")
+        self.assertEqual((res.status_code, res.json()['code']), (502, 'UpstreamError'))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_identical_calls_run_once(self):
+        flight = SingleFlight()
+        calls = []
+        results = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'route'
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do('k', slow, timeout=5))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('route', False)] + [('route', True)] * 4)
+        # Finished calls are not remembered
+        self.assertEqual(flight.do('k', lambda: 'again'), ('again', False))
@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Supervisor, ELDLog, DutySegment
+from backend.segments import segment_fields
+
+DAY = [
+    {'start': 0, 'end': 6, 'status': 'Off Duty'},
+    {'start': 6, 'end': 11, 'status': 'Driving'},
+    {'start': 11, 'end': 12, 'status': 'On Duty'},
+    {'start': 12, 'end': 14.5, 'status': 'Driving'},
+    {'start': 14.5, 'end': 24, 'status': 'Sleeper Berth'},
+]
+
+
+class DutySegmentTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        sup_user = User.objects.create_user(username="sup1", email="sup1@ex.com", password="pass1234", role='supervisor')
+        self.supervisor = Supervisor.objects.create(user=sup_user, office="HQ", email="s1@ex.com")
+        self.drivers = []
+        for i in (1, 2):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            self.drivers.append(Driver.objects.create(
+                user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}", supervisor=self.supervisor if i == 1 else None,
+            ))
+        self.today = date.today()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def _segments(self, **filters):
+        return list(DutySegment.objects.filter(**filters).order_by('date', 'start').values_list('start', 'end', 'hours', 'status'))
+
+    def test_submit_writes_segments(self):
+        self.client.force_authenticate(user=self.drivers[0].user)
+        res = self.client.post("/api/v1/eldlogs/submit/", {
+            'username': 'driver1', 'date': self.yesterday.isoformat(), 'logEntries': DAY,
+        }, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self._segments(log_id=res.json()['id']), [
+            (0, 6, 6, DutySegment.OFF_DUTY),
+            (6, 11, 5, DutySegment.DRIVING),
+            (11, 12, 1, DutySegment.ON_DUTY),
+            (12, 14.5, 2.5, DutySegment.DRIVING),
+            (14.5, 24, 9.5, DutySegment.SLEEPER_BERTH),
+        ])
+        self.assertEqual(set(DutySegment.objects.values_list('driver_id', 'date')), {(self.drivers[0].id, self.yesterday)})
+
+    def test_bulk_submit_edit_and_delete(self):
+        self.client.force_authenticate(user=self.supervisor.user)
+        res = self.client.post("/api/v1/eldlogs/bulk-submit/", {'logs': [
+            {'username': 'driver1', 'date': self.yesterday.isoformat(), 'logEntries': DAY},
+            {'username': 'driver1', 'date': self.today.isoformat(), 'logEntries': DAY[:2]},
+        ]}, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(DutySegment.objects.count(), 7)
+
+        log = ELDLog.objects.get(date=self.today)
+        res = self.client.patch(f"/api/v1/eldlogs/{log.id}/", {
+            'logEntries': [{'start': 8, 'end': 10, 'status': 'On Duty'}],
+        }, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self._segments(log=log), [(8, 10, 2, DutySegment.ON_DUTY)])
+
+        self.client.delete(f"/api/v1/eldlogs/{log.id}/")
+        self.assertFalse(DutySegment.objects.filter(log_id=log.id).exists())
+        self.assertEqual(DutySegment.objects.count(), 5)
+
+    def test_segment_queries(self):
+        mine = ELDLog.objects.create(driver=self.drivers[0], date=self.yesterday, logEntries=DAY)
+        other = ELDLog.objects.create(driver=self.drivers[1], date=self.yesterday, logEntries=DAY)
+        call_command('backfill_duty_segments', stdout=StringIO())
+
+        self.client.force_authenticate(user=self.supervisor.user)
+        res = self.client.get("/api/v1/duty-segments/", {'status': 'Driving', 'min_hours': 4})
+        self.assertEqual(res.status_code, 200)
+        rows = res.json()['results']
+        self.assertEqual([(row['log'], row['start'], row['hours'], row['status']) for row in rows], [(mine.id, 6, 5, 'Driving')])
+
+        at = f"{self.yesterday.isoformat()}T11:30"
+        rows = self.client.get("/api/v1/duty-segments/", {'status': 'Driving,On Duty', 'at': at}).json()['results']
+        self.assertEqual([(row['start'], row['status']) for row in rows], [(11, 'On Duty')])
+        rows = self.client.get("/api/v1/duty-segments/", {'status': 'Driving,On Duty', 'at': f"{self.yesterday.isoformat()}T15:00"}).json()['results']
+        self.assertEqual(rows, [])
+
+        self.client.force_authenticate(user=self.drivers[1].user)
+        rows = self.client.get("/api/v1/duty-segments/", {'from': self.yesterday.isoformat()}).json()['results']
+        self.assertEqual({row['log'] for row in rows}, {other.id})
+        self.assertEqual(self.client.get("/api/v1/duty-segments/", {'status': 'Napping'}).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/duty-segments/", {'at': 'noon'}).status_code, 400)
+
+    def test_backfill_command_replaces_rows(self):
+        log = ELDLog.objects.create(driver=self.drivers[0], date=self.yesterday, logEntries=DAY)
+        out = StringIO()
+        call_command('backfill_duty_segments', '--batch-size=1', stdout=out)
+        call_command('backfill_duty_segments', stdout=StringIO())
+        self.assertIn('written for 1 logs', out.getvalue())
+        self.assertEqual(DutySegment.objects.filter(log=log).count(), 5)
+
+
+class SegmentFieldsTests(SimpleTestCase):
+    def test_skips_unusable_entries_and_clips(self):
+        fields = segment_fields([
+            {'start': 20, 'end': 26, 'status': 'Driving'},
+            {'start': 'x', 'end': 2, 'status': 'Driving'},
+            {'start': 3, 'end': 3, 'status': 'On Duty'},
+            {'start': 1, 'end': 2, 'status': 'Lunch'},
+            {'start': -1, 'end': 2, 'status': 'Off Duty'},
+            'bad',
+        ])
+        self.assertEqual(
+            [(f['start'], f['end'], f['hours'], f['status']) for f in fields],
+            [(0, 2, 2, DutySegment.OFF_DUTY), (20, 24, 4, DutySegment.DRIVING)],
+        )
+        self.assertEqual(segment_fields(None), [])
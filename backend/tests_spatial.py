@@ -0,0 +1,99 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from backend.models import User, Driver, Trip, TripCell
+from backend.geometry import store_geometry
+from backend.polyline import encode
+from backend.views import DateIdPagination
+from backend.spatial import query_cells, route_cells, route_crosses_bbox, route_distance_miles
+
+# Denver -> Kansas City as a single long segment, and a short hop near Chicago
+LONG_SEGMENT = [[39.74, -104.99], [39.10, -94.58]]
+CHICAGO = [[41.88, -87.63], [41.90, -87.70], [41.95, -87.65]]
+
+
+class SpatialFunctionTests(SimpleTestCase):
+    def test_segment_crossing_box_without_vertices_inside(self):
+        encoded = encode(LONG_SEGMENT)
+        # Box around Hays, KS: no vertex inside, but the segment passes through it
+        self.assertTrue(route_crosses_bbox(encoded, 39.3, -100.0, 39.6, -99.0))
+        self.assertFalse(route_crosses_bbox(encoded, 40.0, -100.0, 40.5, -99.0))
+        self.assertFalse(route_crosses_bbox(encoded, 39.3, -90.0, 39.6, -89.0))
+
+    def test_cells_cover_the_route_for_index_lookups(self):
+        encoded = encode(LONG_SEGMENT)
+        cells = set(route_cells(encoded))
+        # Every box along the route shares at least one cell with the route
+        for lng in range(-104, -95):
+            self.assertTrue(cells & set(query_cells(39.0, lng, 39.8, lng + 0.05)), lng)
+
+    def test_distance_to_route_uses_segments(self):
+        encoded = encode(LONG_SEGMENT)
+        # Midpoint of the segment, offset ~10 miles north
+        self.assertAlmostEqual(route_distance_miles(encoded, 39.42 + 10 / 69.09, -99.785), 10, delta=0.5)
+
+
+class TripsWithinTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.users = []
+        for i in (1, 2):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            Driver.objects.create(user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}")
+            self.users.append(u)
+        self.client.force_authenticate(user=self.users[0])
+        ids = []
+        for route in (LONG_SEGMENT, CHICAGO):
+            res = self.client.post("/api/v1/trips/submit/", {'username': 'driver1', 'start': 'A', 'end': 'B', 'polyline': route}, format='json')
+            ids.append(res.json()['id'])
+        self.long_id, self.chicago_id = ids
+        Trip.objects.create(driver=Driver.objects.get(user=self.users[1]), start="X", end="Y", geometry=store_geometry(encode(CHICAGO)))
+
+    def _ids(self, query):
+        res = self.client.get(f"/api/v1/trips/within/{query}")
+        self.assertEqual(res.status_code, 200)
+        return [row['id'] for row in res.json()['results']]
+
+    def test_bbox_and_near_queries(self):
+        self.assertTrue(TripCell.objects.filter(trip_id=self.long_id).exists())
+        self.assertEqual(self._ids('?bbox=-100.0,39.3,-99.0,39.6'), [self.long_id])
+        self.assertEqual(self._ids('?bbox=-88,41,-87,42'), [self.chicago_id])
+        self.assertEqual(self._ids('?near=41.89,-87.66&radius=5'), [self.chicago_id])
+        self.assertEqual(self._ids('?near=45,-93&radius=20'), [])
+        # Boxes too large for the cell table fall back to the bbox columns
+        self.assertEqual(sorted(self._ids('?bbox=-120,30,-80,50')), sorted([self.long_id, self.chicago_id]))
+        self.assertNotIn('polyline', self.client.get("/api/v1/trips/within/?bbox=-88,41,-87,42").json()['results'][0])
+
+    def test_pages_are_filled_with_exact_matches(self):
+        driver = Driver.objects.get(user=self.users[0])
+        Trip.objects.bulk_create([
+            Trip(driver=driver, start="P", end="Q", min_lat=41.0, max_lat=42.0, min_lng=-88.0, max_lng=-87.0)
+            for _ in range(30)
+        ])
+        with mock.patch.object(DateIdPagination, 'filter_chunk_size', 4), CaptureQueriesContext(connection) as queries:
+            res = self.client.get("/api/v1/trips/within/?bbox=-120,30,-80,50&page_size=1").json()
+        # The 30 newest candidates have no route: chunks are read past them, and no id list is bound
+        self.assertTrue(all(len(q['sql']) < 2000 for q in queries.captured_queries))
+        self.assertNotIn('count', res)
+        self.assertEqual([row['id'] for row in res['results']], [self.chicago_id])
+        res = self.client.get(res['next']).json()
+        self.assertEqual(([row['id'] for row in res['results']], res['next']), ([self.long_id], None))
+
+    def test_invalid_region_is_rejected(self):
+        for query in ('', '?bbox=1,2,3', '?near=41,-87', '?near=41,-87&radius=9999', '?bbox=10,0,-10,5'):
+            self.assertEqual(self.client.get(f"/api/v1/trips/within/{query}").status_code, 400, query)
+
+    def test_rebuild_command_indexes_existing_trips(self):
+        other = Trip.objects.get(driver__user=self.users[1])
+        self.assertIsNone(other.min_lat)
+        call_command('rebuild_spatial_index', stdout=StringIO())
+        other.refresh_from_db()
+        self.assertAlmostEqual(other.min_lat, 41.88)
+        self.assertTrue(TripCell.objects.filter(trip=other).exists())
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.test import APITestCase, APIClient
+from backend.cycle import record_duty_days
+from backend.models import User, Driver, Supervisor, ELDLog, HOSViolation
+from backend.violations import scan_hos_violations
+
+# 12h driving in one run: driving, window-safe, break violations
+LONG_DAY = [
+    {'start': 0, 'end': 6, 'status': 'Off Duty'},
+    {'start': 6, 'end': 18, 'status': 'Driving'},
+    {'start': 18, 'end': 24, 'status': 'Off Duty'},
+]
+# 10 on-duty hours with a break; legal on its own
+WORK_DAY = [
+    {'start': 6, 'end': 11, 'status': 'Driving'},
+    {'start': 11, 'end': 12, 'status': 'Off Duty'},
+    {'start': 12, 'end': 17, 'status': 'On Duty'},
+]
+
+
+class HOSViolationScanTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        sup_user = User.objects.create_user(username="sup1", email="sup1@ex.com", password="pass1234", role='supervisor')
+        self.supervisor = Supervisor.objects.create(user=sup_user, office="HQ", email="s1@ex.com")
+        self.drivers = []
+        for i in (1, 2):
+            u = User.objects.create_user(username=f"driver{i}", email=f"driver{i}@ex.com", password="pass1234", role='driver')
+            self.drivers.append(Driver.objects.create(
+                user=u, license=f"LIC{i}", truck=f"T{i}", trailer=f"TR{i}", supervisor=self.supervisor if i == 1 else None,
+            ))
+        self.today = date.today()
+
+    def _log(self, driver, days_ago, entries):
+        log = ELDLog.objects.create(driver=driver, date=self.today - timedelta(days=days_ago), logEntries=entries)
+        record_duty_days({(driver.id, log.date)})
+        return log
+
+    def _rules(self):
+        return sorted(HOSViolation.objects.values_list('driver__user__username', 'date', 'rule'))
+
+    def test_scan_records_and_serves_violations(self):
+        long_log = self._log(self.drivers[0], 1, LONG_DAY)
+        self._log(self.drivers[0], 2, WORK_DAY)
+        self._log(self.drivers[1], 1, LONG_DAY)
+        out = StringIO()
+        call_command('scan_hos_violations', '--workers=1', stdout=out)
+        self.assertIn('Scanned 3 logs', out.getvalue())
+        self.assertEqual(HOSViolation.objects.filter(log=long_log).count(), 2)
+        violation = HOSViolation.objects.get(log=long_log, rule='driving')
+        self.assertEqual((violation.value, violation.limit), (12, 11))
+
+        self.client.force_authenticate(user=self.supervisor.user)
+        rows = self.client.get("/api/v1/hos-violations/").json()['results']
+        self.assertEqual({(row['driver'], row['rule']) for row in rows}, {(self.drivers[0].id, 'driving'), (self.drivers[0].id, 'break')})
+        self.assertEqual(len(self.client.get("/api/v1/hos-violations/?rule=break").json()['results']), 1)
+        self.assertEqual(self.client.get("/api/v1/hos-violations/?from=nope").status_code, 400)
+        self.client.force_authenticate(user=self.drivers[1].user)
+        self.assertEqual(len(self.client.get("/api/v1/hos-violations/").json()['results']), 2)
+
+    def test_reruns_only_scan_changes_and_their_cycle_days(self):
+        long_log = self._log(self.drivers[0], 20, LONG_DAY)
+        logs = [self._log(self.drivers[0], n, WORK_DAY) for n in range(7, 0, -1)]
+        self._log(self.drivers[1], 1, WORK_DAY)
+        self.assertEqual(scan_hos_violations()['logs'], 9)
+        self.assertEqual(scan_hos_violations()['logs'], 0)
+        self.assertEqual(HOSViolation.objects.filter(log=long_log).count(), 2)
+
+        # Fixing a log rescans just that log; its violations go away
+        self.client.force_authenticate(user=self.drivers[0].user)
+        self.client.patch(f"/api/v1/eldlogs/{long_log.id}/", {'logEntries': WORK_DAY}, format='json')
+        self.assertEqual(scan_hos_violations()['logs'], 1)
+        self.assertFalse(HOSViolation.objects.exists())
+
+        # Seven 10h days fit the 70h cycle; an extra hour on the first one puts the last day over it
+        self.client.patch(f"/api/v1/eldlogs/{logs[0].id}/", {'logEntries': WORK_DAY + [{'start': 17, 'end': 18, 'status': 'On Duty'}]}, format='json')
+        self.assertEqual(scan_hos_violations()['logs'], 7)
+        self.assertEqual(self._rules(), [('driver1', logs[-1].date, 'cycle')])
+
+    def test_process_pool_and_benchmark(self):
+        for n in range(12):
+            self._log(self.drivers[n % 2], n, LONG_DAY if n % 3 else WORK_DAY)
+        stats = scan_hos_violations(chunk_size=5, workers=2)
+        self.assertEqual((stats['logs'], stats['violations']), (12, 16))
+        recorded = self._rules()
+        HOSViolation.objects.all().delete()
+        stats = scan_hos_violations(chunk_size=5, workers=1, full=True)
+        self.assertEqual(self._rules(), recorded)
+
+        HOSViolation.objects.all().delete()
+        stats = scan_hos_violations(benchmark=True)
+        self.assertEqual((stats['logs'], stats['violations']), (12, 16))
+        self.assertGreater(stats['logs_per_second'], 0)
+        self.assertFalse(HOSViolation.objects.exists())
@@ -9,10 +9,14 @@ from .views import (
     TripViewSet,
     ELDLogViewSet,
     ApprovalRequestViewSet,
+    LocationViewSet,
+    HOSViolationViewSet,
+    DutySegmentViewSet,
     login_view,
     health,
     admin_assignments,
     index,
+    route_proxy,
 )
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -29,6 +33,9 @@ router.register(r'supervisors', SupervisorViewSet)
 router.register(r'trips', TripViewSet)
 router.register(r'eldlogs', ELDLogViewSet)
 router.register(r'approvalrequests', ApprovalRequestViewSet)
+router.register(r'locations', LocationViewSet)
+router.register(r'hos-violations', HOSViolationViewSet)
+router.register(r'duty-segments', DutySegmentViewSet)
 
 urlpatterns = [
     # Root landing
@@ -43,6 +50,7 @@ urlpatterns = [
     path('api/auth/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 
     # API routes (unversioned - keep for backward compatibility)
+    path('api/route/v1/<str:profile>/<str:coordinates>', route_proxy, name='route'),
     path('api/', include((router.urls, 'api'), namespace='v0')),
 
     # Versioned API v1
@@ -50,6 +58,7 @@ urlpatterns = [
     path('api/v1/auth/token/', TokenObtainPairView.as_view(), name='v1_token_obtain_pair'),
     path('api/v1/auth/token/refresh/', TokenRefreshView.as_view(), name='v1_token_refresh'),
     path('api/v1/auth/token/verify/', TokenVerifyView.as_view(), name='v1_token_verify'),
+    path('api/v1/route/v1/<str:profile>/<str:coordinates>', route_proxy, name='v1_route'),
     path('api/v1/', include((router.urls, 'api'), namespace='v1')),
 
     # API schema and docs
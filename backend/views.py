@@ -8,23 +8,287 @@ from django.http import HttpResponse
 from django.contrib.auth import authenticate
 from django.shortcuts import get_object_or_404, redirect
 from rest_framework.pagination import PageNumberPagination
-from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum, Q
-from django.core.cache import cache
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from datetime import date as date_cls, datetime
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
 from django.conf import settings
+from django.utils import timezone
 from django.utils.html import escape
-from .models import User, Driver, Supervisor, Trip, ELDLog, ApprovalRequest
-from .serializers import UserSerializer, DriverSerializer, SupervisorSerializer, TripSerializer, ELDLogSerializer, ApprovalRequestSerializer
+from .models import (
+    User, Driver, Supervisor, Trip, ELDLog, ApprovalRequest, Location, HOSViolation, DutySegment, latest_approval_prefetch,
+)
+from .serializers import (
+    UserSerializer, DriverSerializer, SupervisorSerializer, TripSerializer, ELDLogSerializer, ApprovalRequestSerializer,
+    LocationSerializer, HOSViolationSerializer, DutySegmentSerializer, FieldSelection, render_trip_polyline,
+)
 from .permissions import IsSelfOrSupervisor, IsSupervisor, IsSupervisorSelf
+from .leaderboard import (
+    PERIOD_DAYS, SCOPE_FIELDS, cached_top, driver_scopes, ensure_board, index_driver_moved, index_lifetime_mileage,
+    index_rank, index_trip_changed, period_start_for, record_trip_change, trip_rollup_entry,
+)
+from .submissions import (
+    BULK_SUBMIT_MAX_ITEMS, apply_driver_trips, attach_references, bulk_create_trips, index_submitted_trips, parse_trip_item,
+)
+from .idempotency import idempotent
+from .eldlogs import bulk_create_eldlogs, parse_log_date, parse_log_entries
+from .cycle import fleet_hours_available, log_hos, record_duty_days
+from .segments import STATUS_CODES, write_duty_segments
+from .grid import PNGRenderer, SVGRenderer, grid_etag, render_grid, render_report, report_etag
+from .hos import entries_digest
+from .locations import count_location_uses, location_key, trip_location_ids
+from .polyline import geometry_detail_from_request, polyline_format_from_request
+from .spatial import index_trip_cells, trips_near, trips_within_bbox
+from .routing import RouteQueryError, get_route
+from .exports import EXPORT_FORMATS, TRIP_EXPORT_COLUMNS, ELDLOG_EXPORT_COLUMNS, stream_export
 import os
+import base64
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 25
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class UserViewSet(viewsets.ModelViewSet):
+
+class DateIdPagination(StandardResultsSetPagination):
+    """
+    Page-number pagination with an opt-in keyset (cursor) mode ordered by (-date, -id).
+    Cursor mode is selected with ?pagination=cursor or by passing a ?cursor= token; it skips
+    COUNT(*) and OFFSET, seeking straight to the rows after the last (date, id) seen, which
+    the (driver|supervisor, ..., -date, -id) composite indexes serve directly.
+    Response shape in cursor mode: {"next": <url or null>, "results": [...]}.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    # Candidate rows read per query while paginate_filtered fills a page
+    filter_chunk_size = 200
+
+    def is_cursor_request(self, request) -> bool:
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or self.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.is_cursor_request(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        qs = queryset.order_by('-date', '-id')
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        return self._page(list(self._after(qs, position)[:page_size + 1]), page_size)
+
+    def paginate_filtered(self, queryset, request, keep, view=None):
+        """
+        Cursor-mode page of the rows of `queryset` that survive keep(rows), which returns the rows to
+        keep in order. Candidates are read in keyset chunks until page_size + 1 survive or they run out,
+        so no COUNT is reported and a page is only short when it is the last one.
+        """
+        self.cursor_mode = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        qs = queryset.order_by('-date', '-id')
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        rows = []
+        while len(rows) <= page_size:
+            chunk = list(self._after(qs, position)[:self.filter_chunk_size])
+            rows.extend(keep(chunk))
+            if len(chunk) < self.filter_chunk_size:
+                break
+            position = (chunk[-1].date, chunk[-1].id)
+        return self._page(rows, page_size)
+
+    @staticmethod
+    def _after(qs, position):
+        if position is None:
+            return qs
+        after_date, after_id = position
+        return qs.filter(Q(date__lt=after_date) | Q(date=after_date, id__lt=after_id))
+
+    def _page(self, rows, page_size):
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = (rows[-1].date, rows[-1].id) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_paginated_response(data)
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_next_link(self):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_next_link()
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    def get_page_size(self, request):
+        # Cursor clients may keep sending the legacy ?limit= in place of page_size
+        if self.is_cursor_request(request) and self.page_size_query_param not in request.query_params:
+            limit = request.query_params.get('limit')
+            if limit:
+                try:
+                    return max(1, min(int(limit), self.max_page_size))
+                except ValueError:
+                    pass
+        return super().get_page_size(request)
+
+    @staticmethod
+    def encode_cursor(day, pk) -> str:
+        return base64.urlsafe_b64encode(f"{day.isoformat()}|{pk}".encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(token):
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+            day, pk = raw.split('|')
+            return date_cls.fromisoformat(day), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound('Invalid cursor')
+
+class FieldSelectionMixin:
+    """
+    Accept ?fields= and ?expand= on every endpoint of a viewset.
+    The parsed selection goes to the serializer context; get_queryset() implementations use
+    `includes()` / `expands()` to join or prefetch only the relations that will be rendered.
+    """
+    @property
+    def selection(self) -> FieldSelection:
+        if not hasattr(self, '_selection'):
+            self._selection = FieldSelection.from_request(getattr(self, 'request', None))
+        return self._selection
+
+    def includes(self, path: str) -> bool:
+        return self.selection.includes(path)
+
+    def expands(self, path: str) -> bool:
+        return self.selection.includes(path) and self.selection.expands(path)
+
+    # Actions rendering many rows; list-excluded fields (trip geometry) are dropped unless requested
+    list_actions = ('list',)
+
+    def omits_geometry(self, path: str = 'polyline') -> bool:
+        """Whether the trip at `path` (dotted polyline path) renders without its route, so it need not be fetched."""
+        if getattr(self, 'action', None) not in self.list_actions:
+            return not self.includes(path)
+        return not (self.selection.requests(path) and self.includes(path))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['selection'] = self.selection
+        context['polyline_format'] = polyline_format_from_request(getattr(self, 'request', None))
+        context['geometry_detail'] = geometry_detail_from_request(getattr(self, 'request', None))
+        # Renderings per shared RouteGeometry id, so repeated lanes are decoded once per response
+        context['rendered_geometry'] = {}
+        return context
+
+
+def _scope_to_user(qs, user):
+    """Rows of a driver-owned queryset the user may see: drivers their own, supervisors their assigned drivers', superusers all."""
+    if getattr(user, 'is_superuser', False):
+        return qs
+    if getattr(user, 'role', '') == 'supervisor':
+        return qs.filter(driver__supervisor__user=user)
+    return qs.filter(driver__user=user)
+
+
+def _scoped_queryset(request, qs):
+    """
+    Scope and filter a Trip or ELDLog queryset for exports and region queries (see _scope_to_user).
+    Filters: ?driver=<username>, ?from=YYYY-MM-DD, ?to=YYYY-MM-DD, ?status=<status>.
+    Returns (queryset, error_response).
+    """
+    qs = _scope_to_user(qs, request.user)
+    params = request.query_params
+    if params.get('driver'):
+        qs = qs.filter(driver__user__username=params['driver'])
+    if params.get('status'):
+        qs = qs.filter(status=params['status'])
+    try:
+        if params.get('from'):
+            qs = qs.filter(date__gte=date_cls.fromisoformat(params['from']))
+        if params.get('to'):
+            qs = qs.filter(date__lte=date_cls.fromisoformat(params['to']))
+    except ValueError:
+        return None, Response({'detail': 'from/to must be YYYY-MM-DD dates'}, status=status.HTTP_400_BAD_REQUEST)
+    return qs.order_by('date', 'id'), None
+
+
+# Upper bound for ?radius= (miles) on /trips/within/
+MAX_NEAR_RADIUS_MILES = 500
+
+
+def _parse_region(params):
+    """
+    ('bbox', (min_lat, min_lng, max_lat, max_lng)) from ?bbox=min_lng,min_lat,max_lng,max_lat, or
+    ('near', (lat, lng, radius_miles)) from ?near=lat,lng&radius=<miles>. Returns (region, error message).
+    """
+    try:
+        if params.get('bbox'):
+            min_lng, min_lat, max_lng, max_lat = (float(v) for v in params['bbox'].split(','))
+            if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+                return None, 'bbox must be min_lng,min_lat,max_lng,max_lat within world bounds'
+            return ('bbox', (min_lat, min_lng, max_lat, max_lng)), None
+        if params.get('near'):
+            lat, lng = (float(v) for v in params['near'].split(','))
+            radius = float(params.get('radius') or 0)
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                return None, 'near must be lat,lng within world bounds'
+            if not 0 < radius <= MAX_NEAR_RADIUS_MILES:
+                return None, f'radius must be between 0 and {MAX_NEAR_RADIUS_MILES} miles'
+            return ('near', (lat, lng, radius)), None
+    except ValueError:
+        return None, 'bbox/near/radius must be comma-separated numbers'
+    return None, 'Pass ?bbox=min_lng,min_lat,max_lng,max_lat or ?near=lat,lng&radius=<miles>'
+
+
+class TripSearchFilter(filters.SearchFilter):
+    """
+    ?search= over trip places and driver usernames. Each term is matched against the Location
+    dictionary (normalized keys, a few thousand rows) and trips are then found through the indexed
+    start/end location ids, instead of running icontains over every trip's text columns.
+    """
+    def filter_queryset(self, request, queryset, view):
+        for term in self.get_search_terms(request):
+            places = Location.objects.filter(key__contains=location_key(term)).values('id')
+            queryset = queryset.filter(
+                Q(start_location__in=places) | Q(end_location__in=places) | Q(driver__user__username__icontains=term)
+            )
+        return queryset
+
+
+# Upper bound for ?limit= on /trips/lanes/ and /locations/
+MAX_LANES = 500
+MAX_LOCATION_SUGGESTIONS = 50
+
+
+def _limit_param(params, default, maximum):
+    try:
+        return min(max(int(params.get('limit') or default), 1), maximum)
+    except ValueError:
+        return default
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match', '')
+    return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+
+
+# Most logs rendered into one /eldlogs/report.svg|png
+MAX_REPORT_LOGS = 400
+
+
+def _export_output(request):
+    # ?output= rather than ?format=, which DRF reserves for renderer selection
+    output = (request.query_params.get('output') or 'ndjson').lower()
+    return output if output in EXPORT_FORMATS else None
+
+
+class UserViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -49,8 +313,8 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
         return Response({'role': user.role})
 
-class DriverViewSet(viewsets.ModelViewSet):
-    queryset = Driver.objects.select_related('user').all()
+class DriverViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
+    queryset = Driver.objects.all()
     serializer_class = DriverSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -73,6 +337,9 @@ class DriverViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         qs = super().get_queryset()
+        # name/email are read from the related user
+        if self.expands('user') or self.includes('name') or self.includes('email'):
+            qs = qs.select_related('user')
         user = getattr(self.request, 'user', None)
         # Supervisors only see their assigned drivers
         if user and getattr(user, 'role', '') == 'supervisor' and not getattr(user, 'is_superuser', False):
@@ -83,6 +350,21 @@ class DriverViewSet(viewsets.ModelViewSet):
                 qs = qs.none()
         return qs
 
+    def perform_update(self, serializer):
+        old_scopes = driver_scopes(serializer.instance)
+        driver = serializer.save()
+        # Mileage edits move the driver on the lifetime boards; office/terminal edits move them between scoped boards
+        index_driver_moved(driver, old_scopes)
+        index_lifetime_mileage(driver)
+
+    @action(detail=False, methods=['get'], url_path='hours-available', permission_classes=[permissions.IsAuthenticated])
+    def hours_available(self, request):
+        """
+        Rolling 70h/8-day cycle hours used and still available per visible driver, fewest available first.
+        Read from the daily duty rollup (see cycle.py) in one query; 34-hour restarts are applied.
+        """
+        return Response({'results': fleet_hours_available(self.get_queryset())})
+
     @action(detail=True, methods=['post'], url_path='assign-supervisor', permission_classes=[permissions.IsAuthenticated, IsSupervisor])
     def assign_supervisor(self, request, username=None):
         """Assign or change the supervisor for a driver (by driver's username)."""
@@ -96,8 +378,10 @@ class DriverViewSet(viewsets.ModelViewSet):
         sup = Supervisor.objects.select_related('user').filter(user__username=sup_username).first()
         if not sup:
             return Response({'detail': 'Supervisor not found'}, status=status.HTTP_404_NOT_FOUND)
+        old_scopes = driver_scopes(driver)
         driver.supervisor = sup
         driver.save(update_fields=['supervisor'])
+        index_driver_moved(driver, old_scopes)
         return Response(DriverSerializer(driver).data)
 
     @action(detail=False, methods=['get'], url_path='leaderboard', permission_classes=[permissions.IsAuthenticated])
@@ -110,6 +394,9 @@ class DriverViewSet(viewsets.ModelViewSet):
         - username (optional): if omitted, uses request.user.username
         - limit (optional): number of top entries (default 5, max 10)
         - period (optional): 'week' or 'month'
+        - scope (optional): 'supervisor' | 'office' | 'terminal' ranks only drivers sharing that
+          supervisor/office/terminal. The scope is taken from the ranked driver (or, for supervisors,
+          their own profile) unless scope_value is given (office/terminal name or supervisor username).
         """
         limit_param = request.query_params.get('limit')
         try:
@@ -119,81 +406,40 @@ class DriverViewSet(viewsets.ModelViewSet):
 
         username = request.query_params.get('username') or getattr(request.user, 'username', None)
         period = (request.query_params.get('period') or '').lower().strip()
-        period_start = None
-        if period == 'week':
-            period_start = timezone.now().date() - timedelta(days=7)
-        elif period == 'month':
-            period_start = timezone.now().date() - timedelta(days=30)
-
-        cache_key = f"leaderboard:top:{period or 'all'}:{top_limit}"
-        top = cache.get(cache_key)
-        if top is None:
-            if period_start:
-                # Top by period trips sum
-                top_qs = (
-                    Driver.objects.select_related('user')
-                    .annotate(period_miles=Sum('trip__mileage', filter=Q(trip__date__gte=period_start)))
-                    .order_by('-period_miles', 'id')[:top_limit]
-                )
-                top = []
-                for idx, d in enumerate(top_qs, start=1):
-                    miles = int(d.period_miles or 0)
-                    top.append({
-                        'username': d.user.username,
-                        'name': d.user.get_full_name() or d.user.username,
-                        'mileage': miles,
-                        'rank': idx,
-                    })
-            else:
-                # Top by total mileage field
-                top_qs = Driver.objects.select_related('user').order_by('-mileage', 'id')[:top_limit]
-                top = []
-                for idx, d in enumerate(top_qs, start=1):
-                    top.append({
-                        'username': d.user.username,
-                        'name': d.user.get_full_name() or d.user.username,
-                        'mileage': int(d.mileage or 0),
-                        'rank': idx,
-                    })
-            # Cache for a short interval (configurable)
-            cache.set(cache_key, top, timeout=getattr(settings, 'LEADERBOARD_CACHE_TTL', 60))
+        if period not in PERIOD_DAYS:
+            period = ''
+        period_start = period_start_for(period)
 
-        me_obj = None
+        me_driver = None
         if username:
-            try:
-                me_driver = Driver.objects.select_related('user').get(user__username=username)
-                if period_start:
-                    # Compute my period miles and rank among drivers by period miles
-                    me_period = (
-                        Driver.objects.filter(pk=me_driver.pk)
-                        .annotate(period_miles=Sum('trip__mileage', filter=Q(trip__date__gte=period_start)))
-                        .values_list('period_miles', flat=True)
-                        .first()
-                    )
-                    me_miles = int(me_period or 0)
-                    higher = (
-                        Driver.objects
-                        .annotate(period_miles=Sum('trip__mileage', filter=Q(trip__date__gte=period_start)))
-                        .filter(period_miles__gt=me_miles)
-                        .count()
-                    )
-                    me_obj = {
-                        'username': me_driver.user.username,
-                        'name': me_driver.user.get_full_name() or me_driver.user.username,
-                        'mileage': me_miles,
-                        'rank': higher + 1,
-                    }
-                else:
-                    # Rank by total mileage field
-                    higher = Driver.objects.filter(mileage__gt=(me_driver.mileage or 0)).count()
-                    me_obj = {
-                        'username': me_driver.user.username,
-                        'name': me_driver.user.get_full_name() or me_driver.user.username,
-                        'mileage': int(me_driver.mileage or 0),
-                        'rank': higher + 1,
-                    }
-            except Driver.DoesNotExist:
-                me_obj = None
+            me_driver = Driver.objects.select_related('user').filter(user__username=username).first()
+
+        scope = None
+        scope_kind = (request.query_params.get('scope') or '').lower().strip()
+        if scope_kind in SCOPE_FIELDS:
+            scope_value = self._leaderboard_scope_value(request, scope_kind, me_driver)
+            if scope_value in (None, ''):
+                return Response({'detail': f'No {scope_kind} to rank within; pass scope_value.'}, status=status.HTTP_400_BAD_REQUEST)
+            scope = (scope_kind, scope_value)
+            # "me" is only ranked on boards the driver belongs to
+            if me_driver and driver_scopes(me_driver).get(scope_kind) != scope_value:
+                me_driver = None
+
+        # Top-N and ranks come from the ordered rank index (loaded from SQL on first use)
+        board = ensure_board(period, period_start, scope)
+
+        # Cached top-10, sliced per limit; refreshed single-flight after trip submits
+        top = cached_top(period, board, scope)[:top_limit]
+
+        me_obj = None
+        if me_driver:
+            me_miles, me_rank = index_rank(board, me_driver, period_start, scope)
+            me_obj = {
+                'username': me_driver.user.username,
+                'name': me_driver.user.get_full_name() or me_driver.user.username,
+                'mileage': me_miles,
+                'rank': me_rank,
+            }
 
         # If me is in top already, don't duplicate
         in_top = me_obj and any(item['username'] == me_obj['username'] for item in top)
@@ -207,6 +453,23 @@ class DriverViewSet(viewsets.ModelViewSet):
 
         return Response(payload)
 
+    @staticmethod
+    def _leaderboard_scope_value(request, kind, me_driver):
+        explicit = (request.query_params.get('scope_value') or '').strip()
+        if kind == 'supervisor':
+            if explicit:
+                return Supervisor.objects.filter(user__username=explicit).values_list('id', flat=True).first()
+            if me_driver:
+                return me_driver.supervisor_id
+            return Supervisor.objects.filter(user=request.user).values_list('id', flat=True).first()
+        if explicit:
+            return explicit
+        if me_driver:
+            return getattr(me_driver, SCOPE_FIELDS[kind])
+        if kind == 'office':
+            return Supervisor.objects.filter(user=request.user).values_list('office', flat=True).first()
+        return None
+
     @action(detail=False, methods=['get'], url_path=r'by-username/(?P<username>[^/.]+)', permission_classes=[IsSelfOrSupervisor])
     def by_username(self, request, username=None):
         try:
@@ -216,80 +479,201 @@ class DriverViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(driver)
         return Response(serializer.data)
 
-class SupervisorViewSet(viewsets.ModelViewSet):
-    queryset = Supervisor.objects.select_related('user').all()
+class SupervisorViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
+    queryset = Supervisor.objects.all()
     serializer_class = SupervisorSerializer
     permission_classes = [permissions.IsAuthenticated, IsSupervisor]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['user__username', 'user__email', 'office']
     ordering_fields = ['user__username', 'office', 'id']
 
-class TripViewSet(viewsets.ModelViewSet):
-    queryset = Trip.objects.select_related('driver__user').all()
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.expands('user'):
+            qs = qs.select_related('user')
+        return qs
+
+class TripViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
+    queryset = Trip.objects.all()
     serializer_class = TripSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['start', 'end', 'driver__user__username']
+    filter_backends = [TripSearchFilter, filters.OrderingFilter]
     ordering_fields = ['date', 'mileage', 'cycleUsed', 'id']
-    pagination_class = StandardResultsSetPagination
+    pagination_class = DateIdPagination
+    list_actions = ('list', 'trips_by_username', 'within')
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.expands('driver'):
+            qs = qs.select_related('driver__user')
+        if not self.omits_geometry('polyline'):
+            qs = qs.prefetch_related('geometry')
+        return qs
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            trip = serializer.save()
+            index_trip_cells([trip])
+            count_location_uses(added=trip_location_ids(trip))
+            deltas = record_trip_change(after=trip_rollup_entry(trip))
+        # Committed: move the driver on the period rank boards
+        index_trip_changed(deltas)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            before = trip_location_ids(serializer.instance)
+            rollup_before = trip_rollup_entry(serializer.instance)
+            trip = serializer.save()
+            if 'polyline' in serializer.validated_data:
+                index_trip_cells([trip])
+            count_location_uses(added=trip_location_ids(trip), removed=before)
+            deltas = record_trip_change(before=rollup_before, after=trip_rollup_entry(trip))
+        index_trip_changed(deltas)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            count_location_uses(removed=trip_location_ids(instance))
+            deltas = record_trip_change(before=trip_rollup_entry(instance))
+            instance.delete()
+        index_trip_changed(deltas)
+
+    @action(detail=False, methods=['get'], url_path='lanes', permission_classes=[permissions.IsAuthenticated])
+    def lanes(self, request):
+        """
+        Per-lane (start -> end location) trip counts and mileage, busiest first, up to ?limit= lanes.
+        Scoped and filterable like exports (?driver, ?from/?to, ?status); ?location=<id> keeps lanes
+        starting or ending there. Grouped on the indexed location ids; names are looked up once per page.
+        """
+        qs, error = _scoped_queryset(request, Trip.objects.filter(start_location__isnull=False, end_location__isnull=False))
+        if error:
+            return error
+        location = request.query_params.get('location')
+        if location:
+            if not location.isdigit():
+                return Response({'detail': 'location must be a location id'}, status=status.HTTP_400_BAD_REQUEST)
+            qs = qs.filter(Q(start_location=location) | Q(end_location=location))
+        limit = _limit_param(request.query_params, 50, MAX_LANES)
+        rows = list(
+            qs.order_by().values('start_location', 'end_location')
+            .annotate(trips=Count('id'), totalMileage=Sum('mileage'), avgMileage=Avg('mileage'), avgRouteMileage=Avg('routeMileage'))
+            .order_by('-trips', 'start_location', 'end_location')[:limit]
+        )
+        ids = {row['start_location'] for row in rows} | {row['end_location'] for row in rows}
+        names = dict(Location.objects.filter(id__in=ids).values_list('id', 'name'))
+        return Response({'results': [
+            {
+                'start': {'id': row['start_location'], 'name': names.get(row['start_location'])},
+                'end': {'id': row['end_location'], 'name': names.get(row['end_location'])},
+                'trips': row['trips'],
+                'mileage': row['totalMileage'] or 0,
+                'avgMileage': round(row['avgMileage'] or 0, 2),
+                'avgRouteMileage': round(row['avgRouteMileage'], 2) if row['avgRouteMileage'] is not None else None,
+            }
+            for row in rows
+        ]})
+
+    @action(detail=False, methods=['get'], url_path='within', permission_classes=[permissions.IsAuthenticated])
+    def within(self, request):
+        """
+        Trips whose route passes through a box (?bbox=min_lng,min_lat,max_lng,max_lat) or within
+        ?radius= miles of ?near=lat,lng. Scoped and filterable like exports (?driver, ?from/?to, ?status).
+        Candidates come from the bbox columns and TripCell index as a subquery and are read in keyset chunks,
+        each checked exactly, until the page is full. Always cursor-paginated: {"next", "results"}, no count.
+        """
+        region, error = _parse_region(request.query_params)
+        if error:
+            return Response({'detail': error}, status=status.HTTP_400_BAD_REQUEST)
+        qs, error_response = _scoped_queryset(request, Trip.objects.all())
+        if error_response:
+            return error_response
+        kind, args = region
+        candidates, exact = (trips_within_bbox if kind == 'bbox' else trips_near)(qs.order_by(), *args)
+        matches = self.get_queryset().filter(id__in=candidates.values('id'))
+        page = self.paginator.paginate_filtered(matches, request, exact, view=self)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path='geometry', permission_classes=[permissions.IsAuthenticated])
+    def geometry(self, request, pk=None):
+        """
+        Route of one trip, honouring ?polyline_format= and ?zoom= / ?simplify=.
+        The strong ETag is derived from the stored geometry and the requested rendering, so clients
+        revalidate with If-None-Match and get 304 without a body while the route is unchanged.
+        """
+        trip = self.get_object()
+        context = self.get_serializer_context()
+        detail = context['geometry_detail']
+        # Content-addressed: the geometry's digest changes exactly when the route does
+        digest = trip.geometry.digest[:32] if trip.geometry_id else 'none'
+        variant = f"{context['polyline_format']}-{detail[0]}{detail[1]:g}" if detail else context['polyline_format']
+        etag = f'"{digest}-{variant}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response({'id': trip.id, 'polyline': render_trip_polyline(trip, context)}, headers=headers)
 
     @action(detail=False, methods=['post'], url_path='submit', permission_classes=[permissions.IsAuthenticated])
+    @idempotent('trips.submit')
     def submit(self, request):
-        username = request.data.get('username')
-        start = request.data.get('start') or request.data.get('pickupLocation')
-        end = request.data.get('end') or request.data.get('dropoffLocation')
-        stops = request.data.get('stops')
-        mileage = request.data.get('mileage')
-        cycle_used = request.data.get('cycleUsed')
-        polyline = request.data.get('polyline')
-
-        if not username or not start or not end:
-            return Response({'detail': 'username, start, and end are required'}, status=status.HTTP_400_BAD_REQUEST)
+        fields, error = parse_trip_item(request.data)
+        if error:
+            return Response({'detail': error}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            driver = Driver.objects.select_related('user').get(user__username=username)
+            driver = Driver.objects.select_related('user').get(user__username=fields.pop('username'))
         except Driver.DoesNotExist:
             return Response({'detail': 'Driver not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        try:
-            mileage_val = int(mileage) if mileage is not None else 0
-        except (TypeError, ValueError):
-            mileage_val = 0
-        try:
-            cycle_val = int(cycle_used) if cycle_used is not None else 0
-        except (TypeError, ValueError):
-            cycle_val = 0
-
-        if stops is None:
-            current_loc = request.data.get('currentLocation')
-            stops = [current_loc] if current_loc else []
-
-        trip = Trip.objects.create(
-            driver=driver,
-            start=start,
-            end=end,
-            stops=stops,
-            mileage=mileage_val,
-            cycleUsed=cycle_val,
-            polyline=polyline,
-        )
-
-        # Update simple driver aggregates and recent trips
-        try:
-            driver.mileage = (driver.mileage or 0) + mileage_val
-            driver.tripsToday = (driver.tripsToday or 0) + 1
-            driver.cycleUsed = max(driver.cycleUsed or 0, cycle_val)
-            # Prepend a simple recent trip summary, keep max 5
-            recent = driver.recentTrips or []
-            summary = f"{start} -> {end} - {trip.date.isoformat()}"
-            recent = [summary] + [r for r in recent if r != summary]
-            driver.recentTrips = recent[:5]
-            driver.save(update_fields=['mileage', 'tripsToday', 'cycleUsed', 'recentTrips'])
-        except Exception:
-            pass
+        with transaction.atomic():
+            trip = Trip.objects.create(driver=driver, **attach_references([fields])[0])
+            # Driver aggregates, recent trips and the period leaderboard rollup, applied set-based
+            totals = apply_driver_trips({driver.pk: [trip]})
+        # Committed: move the driver on the lifetime and current period rank boards
+        index_submitted_trips({driver.pk: driver}, {driver.pk: [trip]}, totals)
 
         serializer = self.get_serializer(trip)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='bulk-submit', permission_classes=[permissions.IsAuthenticated])
+    @idempotent('trips.bulk_submit')
+    def bulk_submit(self, request):
+        """
+        Submit many trips (for any number of drivers) at once: a JSON list, or {"trips": [...]}, of
+        /trips/submit/ payloads. Valid items are inserted with one bulk_create and one aggregate
+        update per driver, all in one transaction; invalid items are reported by index.
+        Responds 201 when every item was created, 207 when some failed and 400 when none were created.
+        """
+        items = request.data.get('trips') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'Expected a non-empty list of trips'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_SUBMIT_MAX_ITEMS:
+            return Response({'detail': f'At most {BULK_SUBMIT_MAX_ITEMS} trips per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            created, errors, drivers, trips_by_driver = bulk_create_trips(items)
+            totals = apply_driver_trips(trips_by_driver)
+        index_submitted_trips(drivers, trips_by_driver, totals)
+
+        if not created:
+            code = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_201_CREATED
+        return Response({
+            'created': [{'index': idx, 'id': trip.pk} for idx, trip in created],
+            'errors': errors,
+        }, status=code)
+
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        """Stream trips as NDJSON (default) or CSV (?output=csv); see _scoped_queryset for filters."""
+        output = _export_output(request)
+        if output is None:
+            return Response({'detail': 'output must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+        qs, error = _scoped_queryset(request, Trip.objects.all())
+        if error:
+            return error
+        return stream_export(qs, TRIP_EXPORT_COLUMNS, output, 'trips')
+
     @action(detail=False, methods=['get'], url_path=r'by-username/(?P<username>[^/.]+)', permission_classes=[IsSelfOrSupervisor])
     def trips_by_username(self, request, username=None):
         limit = request.query_params.get('limit')
@@ -297,8 +681,8 @@ class TripViewSet(viewsets.ModelViewSet):
             driver = Driver.objects.select_related('user').get(user__username=username)
         except Driver.DoesNotExist:
             return Response({'detail': 'Driver not found'}, status=status.HTTP_404_NOT_FOUND)
-        qs = Trip.objects.filter(driver=driver).order_by('-date')
-        if limit:
+        qs = self.get_queryset().filter(driver=driver).order_by('-date', '-id')
+        if limit and not self.paginator.is_cursor_request(request):
             try:
                 qs = qs[:int(limit)]
             except ValueError:
@@ -310,26 +694,143 @@ class TripViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
 
-class ELDLogViewSet(viewsets.ModelViewSet):
-    queryset = (
-        ELDLog.objects.select_related('driver__user', 'trip')
-        .prefetch_related('approvalrequest_set__trip')
-        .all()
-    )
+class LocationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Place autocomplete: ?q= matches the start of normalized names, most used first, up to ?limit=.
+    Served from the (-trip_count, key) ordering of the Location dictionary, not from trip rows.
+    """
+    queryset = Location.objects.all()
+    serializer_class = LocationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return super().get_queryset().order_by('-trip_count', 'key')
+
+    def list(self, request, *args, **kwargs):
+        qs = self.get_queryset()
+        prefix = location_key(request.query_params.get('q'))
+        if prefix:
+            qs = qs.filter(key__startswith=prefix)
+        limit = _limit_param(request.query_params, 10, MAX_LOCATION_SUGGESTIONS)
+        return Response(self.get_serializer(qs[:limit], many=True).data)
+
+
+class ELDLogViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
+    queryset = ELDLog.objects.all()
     serializer_class = ELDLogSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['driver__user__username']
     ordering_fields = ['date', 'id']
-    pagination_class = StandardResultsSetPagination
+    pagination_class = DateIdPagination
+    list_actions = ('list', 'logs_by_username')
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.expands('driver'):
+            qs = qs.select_related('driver__user')
+        if self.includes('trip'):
+            qs = qs.select_related('trip')
+            if not self.omits_geometry('trip.polyline'):
+                qs = qs.prefetch_related('trip__geometry')
+        if self.includes('approvalStatus') or self.includes('approvalInfo'):
+            qs = qs.with_latest_approval()
+        return qs
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # ?hos=1 adds each log's hours-of-service metrics and violations (see hos.py)
+        context['hos'] = (self.request.query_params.get('hos') or '').lower() in ('1', 'true', 'yes') if self.request else False
+        return context
+
+    @action(detail=True, methods=['get'], url_path='hos', permission_classes=[permissions.IsAuthenticated])
+    def hos(self, request, pk=None):
+        """Hours-of-service metrics and violations of one log, cached until its entries change."""
+        log = self.get_object()
+        return Response({'id': log.id, 'date': log.date, **log_hos([log])[log.id]})
+
+    @action(
+        detail=True, methods=['get'], url_path='grid', permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[SVGRenderer, PNGRenderer],
+    )
+    def grid(self, request, pk=None, format=None):
+        """
+        The log's 24-hour duty grid as /grid.svg or /grid.png (see grid.py). The rendering is cached and
+        its strong ETag derived from the log's entries, so If-None-Match gets 304 until they change.
+        """
+        log = self.get_object()
+        fmt = request.accepted_renderer.format
+        digest = entries_digest(log.logEntries)
+        etag = grid_etag(digest, fmt)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(render_grid(log.logEntries, fmt, digest), headers=headers)
+
+    @action(
+        detail=False, methods=['get'], url_path='report', permission_classes=[permissions.IsAuthenticated],
+        renderer_classes=[SVGRenderer, PNGRenderer],
+    )
+    def report(self, request, format=None):
+        """
+        Duty grids of many logs in one /report.svg or /report.png, oldest first, each under its date and
+        driver; filters as for exports (?driver=, ?from=, ?to=, ?status=), at most MAX_REPORT_LOGS logs.
+        Days are rendered from the grid cache in one pass; the ETag covers every day's entries.
+        """
+        qs, error = _scoped_queryset(request, ELDLog.objects.all())
+        if error:
+            return error
+        rows = list(qs.values_list('date', 'driver__user__username', 'logEntries')[:MAX_REPORT_LOGS + 1])
+        if len(rows) > MAX_REPORT_LOGS:
+            return Response(
+                {'detail': f'At most {MAX_REPORT_LOGS} logs per report; narrow ?driver= or ?from= / ?to='},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not rows:
+            return Response({'detail': 'No ELD logs match'}, status=status.HTTP_404_NOT_FOUND)
+        fmt = request.accepted_renderer.format
+        days = [(f'{day.isoformat()} {username}', entries) for day, username, entries in rows]
+        digests = [entries_digest(entries) for _, entries in days]
+        etag = report_etag([label for label, _ in days], digests, fmt)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(render_report(days, fmt, digests), headers=headers)
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            log = serializer.save()
+            write_duty_segments([log])
+            record_duty_days({(log.driver_id, log.date)})
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            log = serializer.save()
+            # Keeps the segment rows and the daily duty rollup (and with it cycle hours) in step with edits
+            if 'logEntries' in serializer.validated_data:
+                write_duty_segments([log])
+            record_duty_days({(log.driver_id, log.date)})
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            pair = (instance.driver_id, instance.date)
+            instance.delete()
+            record_duty_days({pair})
 
     @action(detail=False, methods=['post'], url_path='submit', permission_classes=[permissions.IsAuthenticated])
+    @idempotent('eldlogs.submit')
     def submit(self, request):
         username = request.data.get('username')
         log_entries = request.data.get('logEntries', [])
         trip_id = request.data.get('tripId') or request.data.get('trip_id')
         if not username:
             return Response({'detail': 'username is required'}, status=status.HTTP_400_BAD_REQUEST)
+        day, error = parse_log_date(request.data.get('date'))
+        if error:
+            return Response({'detail': error}, status=status.HTTP_400_BAD_REQUEST)
+        log_entries, error = parse_log_entries(log_entries)
+        if error:
+            return Response({'detail': error}, status=status.HTTP_400_BAD_REQUEST)
         try:
             driver = Driver.objects.select_related('user').get(user__username=username)
         except Driver.DoesNotExist:
@@ -342,10 +843,44 @@ class ELDLogViewSet(viewsets.ModelViewSet):
             except Trip.DoesNotExist:
                 trip_obj = None
 
-        eld = ELDLog.objects.create(driver=driver, logEntries=log_entries, trip=trip_obj)
+        with transaction.atomic():
+            eld = ELDLog.objects.create(driver=driver, date=day, logEntries=log_entries, trip=trip_obj)
+            write_duty_segments([eld])
+            record_duty_days({(driver.pk, day)})
         serializer = self.get_serializer(eld)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='bulk-submit', permission_classes=[permissions.IsAuthenticated])
+    @idempotent('eldlogs.bulk_submit')
+    def bulk_submit(self, request):
+        """
+        Backfill many dated logs (for any number of drivers) at once: a JSON list, or {"logs": [...]},
+        of /eldlogs/submit/ payloads with a "date" (YYYY-MM-DD). Segments are validated up front; valid
+        logs are inserted with one bulk_create in one transaction, invalid ones are reported by index.
+        Responds 201 when every log was created, 207 when some failed and 400 when none were created.
+        """
+        items = request.data.get('logs') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'detail': 'Expected a non-empty list of logs'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > BULK_SUBMIT_MAX_ITEMS:
+            return Response({'detail': f'At most {BULK_SUBMIT_MAX_ITEMS} logs per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            created, errors = bulk_create_eldlogs(items)
+            write_duty_segments(log for _, log in created)
+            record_duty_days({(log.driver_id, log.date) for _, log in created})
+
+        if not created:
+            code = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_201_CREATED
+        return Response({
+            'created': [{'index': idx, 'id': log.pk, 'date': log.date.isoformat()} for idx, log in created],
+            'errors': errors,
+        }, status=code)
+
     @action(detail=True, methods=['post'], url_path='accept', permission_classes=[permissions.IsAuthenticated])
     def accept(self, request, pk=None):
         eld = self.get_object()
@@ -376,6 +911,17 @@ class ELDLogViewSet(viewsets.ModelViewSet):
         eld.save(update_fields=['status'])
         return Response({'status': eld.status})
 
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[permissions.IsAuthenticated])
+    def export(self, request):
+        """Stream ELD logs as NDJSON (default) or CSV (?output=csv); see _scoped_queryset for filters."""
+        output = _export_output(request)
+        if output is None:
+            return Response({'detail': 'output must be ndjson or csv'}, status=status.HTTP_400_BAD_REQUEST)
+        qs, error = _scoped_queryset(request, ELDLog.objects.all())
+        if error:
+            return error
+        return stream_export(qs, ELDLOG_EXPORT_COLUMNS, output, 'eldlogs')
+
     @action(detail=False, methods=['get'], url_path=r'by-username/(?P<username>[^/.]+)', permission_classes=[IsSelfOrSupervisor])
     def logs_by_username(self, request, username=None):
         limit = request.query_params.get('limit')
@@ -407,8 +953,8 @@ class ELDLogViewSet(viewsets.ModelViewSet):
                     qs = qs.filter(date__lte=to_str)
         except Exception:
             pass
-        qs = qs.order_by('-date')
-        if limit:
+        qs = qs.order_by('-date', '-id')
+        if limit and not self.paginator.is_cursor_request(request):
             try:
                 qs = qs[:int(limit)]
             except ValueError:
@@ -421,14 +967,103 @@ class ELDLogViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ApprovalRequestViewSet(viewsets.ModelViewSet):
-    queryset = ApprovalRequest.objects.select_related('trip__driver__user', 'eldlog__driver__user', 'supervisor__user').all()
+class HOSViolationViewSet(FieldSelectionMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    HOS violations recorded by `manage.py scan_hos_violations`, newest first.
+    Drivers see their own, supervisors their assigned drivers', superusers all.
+    Filters: ?driver=<username>, ?rule=driving|window|break|cycle, ?from= / ?to= (YYYY-MM-DD).
+    """
+    queryset = HOSViolation.objects.all()
+    serializer_class = HOSViolationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DateIdPagination
+
+    def get_queryset(self):
+        qs = _scope_to_user(super().get_queryset(), self.request.user)
+        params = self.request.query_params
+        if params.get('driver'):
+            qs = qs.filter(driver__user__username=params['driver'])
+        if params.get('rule'):
+            qs = qs.filter(rule=params['rule'])
+        try:
+            if params.get('from'):
+                qs = qs.filter(date__gte=date_cls.fromisoformat(params['from']))
+            if params.get('to'):
+                qs = qs.filter(date__lte=date_cls.fromisoformat(params['to']))
+        except ValueError:
+            raise ValidationError({'detail': 'from/to must be YYYY-MM-DD dates'})
+        if self.expands('driver'):
+            qs = qs.select_related('driver__user')
+        return qs.order_by('-date', '-id')
+
+
+class DutySegmentViewSet(FieldSelectionMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    ELD duty-status segments as rows (see segments.py), newest first, scoped like ELD logs.
+    Filters: ?driver=<username>, ?status=Driving,On Duty, ?from= / ?to= (YYYY-MM-DD), ?min_hours=<n>,
+    ?at=YYYY-MM-DDTHH:MM (segments covering that moment; ?at=now for the current time).
+    """
+    queryset = DutySegment.objects.all()
+    serializer_class = DutySegmentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DateIdPagination
+
+    def get_queryset(self):
+        qs = _scope_to_user(super().get_queryset(), self.request.user)
+        params = self.request.query_params
+        if params.get('driver'):
+            qs = qs.filter(driver__user__username=params['driver'])
+        if params.get('status'):
+            names = [name.strip() for name in params['status'].split(',')]
+            if any(name not in STATUS_CODES for name in names):
+                raise ValidationError({'detail': f"status must be among {', '.join(STATUS_CODES)}"})
+            qs = qs.filter(status__in=[STATUS_CODES[name] for name in names])
+        try:
+            if params.get('from'):
+                qs = qs.filter(date__gte=date_cls.fromisoformat(params['from']))
+            if params.get('to'):
+                qs = qs.filter(date__lte=date_cls.fromisoformat(params['to']))
+            if params.get('min_hours'):
+                qs = qs.filter(hours__gte=float(params['min_hours']))
+            if params.get('at'):
+                at = timezone.localtime() if params['at'] == 'now' else datetime.fromisoformat(params['at'])
+                hour = at.hour + at.minute / 60 + at.second / 3600
+                qs = qs.filter(date=at.date(), start__lte=hour, end__gt=hour)
+        except ValueError:
+            raise ValidationError({'detail': 'from/to must be YYYY-MM-DD, at YYYY-MM-DDTHH:MM (or now) and min_hours a number'})
+        if self.expands('driver'):
+            qs = qs.select_related('driver__user')
+        return qs.order_by('-date', '-id')
+
+
+class ApprovalRequestViewSet(FieldSelectionMixin, viewsets.ModelViewSet):
+    queryset = ApprovalRequest.objects.all()
     serializer_class = ApprovalRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    list_actions = ('list', 'by_supervisor')
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['supervisor__user__username', 'trip__driver__user__username', 'eldlog__driver__user__username', 'status']
     ordering_fields = ['date', 'status', 'id']
-    pagination_class = StandardResultsSetPagination
+    pagination_class = DateIdPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        related = []
+        if self.expands('trip'):
+            related.append('trip__driver__user' if self.expands('trip.driver') else 'trip')
+            if not self.omits_geometry('trip.polyline'):
+                qs = qs.prefetch_related('trip__geometry')
+        if self.expands('eldlog'):
+            related.append('eldlog__driver__user' if self.expands('eldlog.driver') else 'eldlog')
+            if self.includes('eldlog.trip'):
+                related.append('eldlog__trip')
+                if not self.omits_geometry('eldlog.trip.polyline'):
+                    qs = qs.prefetch_related('eldlog__trip__geometry')
+            if self.includes('eldlog.approvalStatus') or self.includes('eldlog.approvalInfo'):
+                qs = qs.prefetch_related(latest_approval_prefetch('eldlog__'))
+        if self.expands('supervisor'):
+            related.append('supervisor__user' if self.expands('supervisor.user') else 'supervisor')
+        return qs.select_related(*related) if related else qs
 
     @action(detail=False, methods=['post'], url_path='create', permission_classes=[permissions.IsAuthenticated])
     def create_request(self, request):
@@ -483,7 +1118,7 @@ class ApprovalRequestViewSet(viewsets.ModelViewSet):
             supervisor = Supervisor.objects.select_related('user').get(user__username=username)
         except Supervisor.DoesNotExist:
             return Response({'detail': 'Supervisor not found'}, status=status.HTTP_404_NOT_FOUND)
-        qs = ApprovalRequest.objects.filter(supervisor=supervisor)
+        qs = self.get_queryset().filter(supervisor=supervisor)
         if status_filter:
             qs = qs.filter(status=status_filter)
         qs = qs.order_by('-date', '-id')
@@ -539,6 +1174,21 @@ def login_view(request):
     return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
 
+# OSRM-compatible route proxy: same path and options as the upstream /route/v1 service, cached (see routing.py)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def route_proxy(request, profile, coordinates):
+    try:
+        code, body, source = get_route(profile, coordinates, request.query_params)
+    except RouteQueryError as exc:
+        return Response({'code': 'InvalidQuery', 'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    response = HttpResponse(body, status=code, content_type='application/json')
+    response['X-Route-Cache'] = source
+    if code == 200:
+        response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
 # Lightweight health check for uptime/load balancers
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -583,8 +1233,10 @@ def admin_assignments(request):
             try:
                 driver = Driver.objects.select_related('user').get(user__username=d_username)
                 sup = Supervisor.objects.select_related('user').get(user__username=s_username)
+                old_scopes = driver_scopes(driver)
                 driver.supervisor = sup
                 driver.save(update_fields=['supervisor'])
+                index_driver_moved(driver, old_scopes)
             except Driver.DoesNotExist:
                 err = 'Driver not found.'
             except Supervisor.DoesNotExist:
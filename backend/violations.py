@@ -0,0 +1,129 @@
+"""
+Fleet-wide HOS violation scan (`manage.py scan_hos_violations`).
+
+Logs are streamed from the database in date-ordered chunks with .iterator(), evaluated in a process
+pool (hos.evaluate_entries: numpy only, no database access in the workers) and their failed checks
+are written to the HOSViolation table, which the /hos-violations/ endpoint serves to supervisors.
+
+A ScanWatermark row remembers the ELDLog.updated_at the last completed scan reached. A rerun picks up
+logs changed since then, plus the logs of the following 7 days of the same drivers, whose cycle check
+depends on the changed day. --full rescans everything; --benchmark evaluates without writing and
+reports logs/second.
+"""
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .cycle import CYCLE_DAYS, prior_cycle_hours
+from .hos import BREAK_AFTER_DRIVING_HOURS, CYCLE_LIMIT_HOURS, DRIVING_LIMIT_HOURS, DUTY_WINDOW_HOURS, evaluate_entries
+from .models import ELDLog, HOSViolation, ScanWatermark
+
+WATERMARK_NAME = 'hos_violations'
+# rule: (HOS result metric, limit in hours)
+RULES = {
+    'driving': ('totalDriving', DRIVING_LIMIT_HOURS),
+    'window': ('dutyWindow', DUTY_WINDOW_HOURS),
+    'break': ('maxContinuousDriving', BREAK_AFTER_DRIVING_HOURS),
+    'cycle': ('cycleTotal', CYCLE_LIMIT_HOURS),
+}
+# Drivers per log query of an incremental scan
+DRIVERS_PER_QUERY = 200
+
+ScannedLog = namedtuple('ScannedLog', 'id driver_id date logEntries')
+
+
+def _log_queries(since, until):
+    """Date-ordered log querysets to scan: everything, or the drivers' day ranges touched by changes in (since, until]."""
+    logs = ELDLog.objects.order_by('date', 'id')
+    if since is None:
+        yield logs
+        return
+    ranges = list(
+        ELDLog.objects.filter(updated_at__gt=since, updated_at__lte=until)
+        .values('driver_id').annotate(first=Min('date'), last=Max('date')).order_by('driver_id')
+    )
+    for offset in range(0, len(ranges), DRIVERS_PER_QUERY):
+        scope = Q()
+        for row in ranges[offset:offset + DRIVERS_PER_QUERY]:
+            scope |= Q(driver_id=row['driver_id'], date__gte=row['first'], date__lte=row['last'] + timedelta(days=CYCLE_DAYS - 1))
+        yield logs.filter(scope)
+
+
+def _log_chunks(since, until, chunk_size: int):
+    """([ScannedLog], [cycle hours before each log's day]) per chunk of at most chunk_size logs."""
+    for logs in _log_queries(since, until):
+        chunk = []
+        rows = logs.values_list('id', 'driver_id', 'date', 'logEntries').iterator(chunk_size=chunk_size)
+        for row in rows:
+            chunk.append(ScannedLog(*row))
+            if len(chunk) >= chunk_size:
+                yield _with_prior_cycle(chunk)
+                chunk = []
+        if chunk:
+            yield _with_prior_cycle(chunk)
+
+
+def _with_prior_cycle(chunk):
+    prior = prior_cycle_hours(chunk)
+    return chunk, [prior.get(log.id, 0) for log in chunk]
+
+
+def _evaluated_chunks(chunks, workers: int):
+    """(chunk, HOS results) per chunk; evaluated in `workers` processes with a few chunks in flight."""
+    if workers <= 1:
+        for chunk, cycle_used in chunks:
+            yield chunk, evaluate_entries([log.logEntries for log in chunk], cycle_used=cycle_used)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk, cycle_used in chunks:
+            pending.append((chunk, pool.submit(evaluate_entries, [log.logEntries for log in chunk], cycle_used)))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+
+
+def _violation_rows(chunk, results) -> list:
+    return [
+        HOSViolation(
+            log_id=log.id, driver_id=log.driver_id, date=log.date, rule=rule,
+            value=result[RULES[rule][0]], limit=RULES[rule][1],
+        )
+        for log, result in zip(chunk, results)
+        for rule in result['violations']
+    ]
+
+
+def scan_hos_violations(chunk_size: int = 1000, workers: int = 1, full: bool = False, benchmark: bool = False) -> dict:
+    """
+    Evaluate logs changed since the watermark (every log with full or benchmark) and replace their
+    HOSViolation rows chunk by chunk. The watermark moves only when the whole scan completed.
+    Returns {'logs', 'violations', 'seconds', 'logs_per_second'}; benchmark writes nothing.
+    """
+    until = timezone.now()
+    watermark = None if (full or benchmark) else ScanWatermark.objects.filter(name=WATERMARK_NAME).first()
+    since = watermark.scanned_until if watermark else None
+    stats = {'logs': 0, 'violations': 0}
+    started = time.perf_counter()
+    for chunk, results in _evaluated_chunks(_log_chunks(since, until, chunk_size), workers):
+        rows = _violation_rows(chunk, results)
+        stats['logs'] += len(chunk)
+        stats['violations'] += len(rows)
+        if benchmark:
+            continue
+        with transaction.atomic():
+            HOSViolation.objects.filter(log_id__in=[log.id for log in chunk]).delete()
+            HOSViolation.objects.bulk_create(rows)
+    if not benchmark:
+        ScanWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={'scanned_until': until})
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['logs_per_second'] = round(stats['logs'] / stats['seconds'], 1) if stats['seconds'] else 0.0
+    return stats
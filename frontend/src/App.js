@@ -2,7 +2,7 @@ import React, { useState, useEffect, useCallback } from 'react';
 import { Routes, Route, Navigate, useNavigate } from 'react-router-dom';
 import './App.css';
 import Navbar from './Navbar';
-import { getUserRole, loginUser, submitTrip, submitELDLog, createApprovalRequest, obtainToken, clearAccessToken } from './api'; // Centralized API logic
+import { getUserRole, loginUser, submitTrip, submitELDLog, createApprovalRequest, obtainToken, clearAccessToken, getRoute } from './api'; // Centralized API logic
 import Leaderboard from './Leaderboard';
 import DriverDashboard from './DriverDashboard';
 import SupervisorDashboard from './SupervisorDashboard';
@@ -166,12 +166,10 @@ function App() {
   // ELD log state: { [username]: { [date]: [logEntries] } }
   const [eldLogs, setEldLogs] = useState({});
 
-  // Route calculation via free OSRM API: returns distance (miles) and polyline positions [[lat,lng], ...]
+  // Route calculation via the backend OSRM proxy: returns distance (miles) and polyline positions [[lat,lng], ...]
   const fetchRouteWithPolyline = useCallback(async (start, end) => {
     try {
-      const url = `https://router.project-osrm.org/route/v1/driving/${start.lng},${start.lat};${end.lng},${end.lat}?overview=full&geometries=geojson`;
-      const res = await fetch(url);
-      const data = await res.json();
+      const data = await getRoute([[start.lng, start.lat], [end.lng, end.lat]]);
       if (data?.routes?.[0]) {
         const coords = data.routes[0].geometry.coordinates || [];
         const distanceMeters = data.routes[0].distance || 0;
@@ -1,6 +1,6 @@
 import PropTypes from 'prop-types';
 import React, { useState, useEffect, useMemo } from "react";
-import { getELDLogsByUsername, acceptELDLog, completeELDLog, getDrivers } from './api';
+import { getELDLogsByUsername, acceptELDLog, completeELDLog, getDrivers, getTripGeometry, getRoute } from './api';
 import { MapContainer, TileLayer, Polyline, Marker, Popup, useMap } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 // import { getELDLogs } from './api'; // For future centralized API usage
@@ -52,7 +52,10 @@ function LiveDriverMarker({ onLocationUpdate }) {
   );
 }
 
-// OSRMRoutePolyline component: fetches and draws route using OSRM free API
+// Routes are requested pre-simplified for this zoom level (server-side Douglas-Peucker)
+const MAP_ZOOM = 6;
+
+// OSRMRoutePolyline component: fetches and draws route through the backend OSRM proxy
 function OSRMRoutePolyline() {
   const [route, setRoute] = useState([]);
   useEffect(() => {
@@ -62,9 +65,7 @@ function OSRMRoutePolyline() {
       [-77.1945, 41.2033],  // Lock Haven (rest stop)
       [-71.0589, 42.3601]   // Boston
     ];
-    const url = `https://router.project-osrm.org/route/v1/driving/${coords.map(c => c.join(',')).join(';')}?overview=full&geometries=geojson`;
-    fetch(url)
-      .then(res => res.json())
+    getRoute(coords)
       .then(data => {
         if (data.routes && data.routes.length > 0) {
           setRoute(data.routes[0].geometry.coordinates.map(([lng, lat]) => [lat, lng]));
@@ -80,6 +81,8 @@ function OSRMRoutePolyline() {
 export default function ELDLogs({ username = '', role = 'driver', windowWidth = 800 }) {
   const [userLogs, setUserLogs] = useState([]);
   const [page, setPage] = useState(1);
+  // Cursor for each page we have reached; cursors[0] is the first page (no cursor)
+  const [cursors, setCursors] = useState([null]);
   const [pageSize, setPageSize] = useState(10);
   const [selectedLog, setSelectedLog] = useState(null);
   const [showDirections, setShowDirections] = useState(true);
@@ -115,9 +118,16 @@ export default function ELDLogs({ username = '', role = 'driver', windowWidth =
       setLoading(true);
       setError("");
       try {
-        const logs = await getELDLogsByUsername(effectiveUsername, pageSize, page, pageSize);
+        const logs = await getELDLogsByUsername(effectiveUsername, null, null, pageSize, { cursorMode: true, cursor: cursors[page - 1] });
         if (!cancelled) {
           setUserLogs(Array.isArray(logs) ? logs : (logs?.results || []));
+          const nextCursor = logs?.next ? new URL(logs.next, window.location.origin).searchParams.get('cursor') : null;
+          setCursors(list => {
+            if (list[page] === nextCursor) return list;
+            const updated = list.slice(0, page);
+            updated[page] = nextCursor;
+            return updated;
+          });
         }
       } catch (e) {
         if (!cancelled) {
@@ -134,7 +144,8 @@ export default function ELDLogs({ username = '', role = 'driver', windowWidth =
       interval = setInterval(loadLogs, 15000);
     }
     return () => { cancelled = true; if (interval) clearInterval(interval); };
-  }, [username, role, targetUsername, page, pageSize, autoRefresh, reloadTick, pageSize]);
+  // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [username, role, targetUsername, page, pageSize, autoRefresh, reloadTick]);
 
   // Preselect first log when userLogs change if none selected
   useEffect(() => {
@@ -149,9 +160,22 @@ export default function ELDLogs({ username = '', role = 'driver', windowWidth =
     return getRouteDirections(trip);
   }, [selectedLog]);
 
+  // Log lists carry no geometry; fetch the selected trip's route (ETag-cached by the browser)
+  const selectedTripId = selectedLog?.trip?.id;
+  const [routePolyline, setRoutePolyline] = useState(null);
+  useEffect(() => {
+    let cancelled = false;
+    setRoutePolyline(null);
+    if (!selectedTripId) return undefined;
+    getTripGeometry(selectedTripId, { zoom: MAP_ZOOM })
+      .then(data => { if (!cancelled) setRoutePolyline(data?.polyline || null); })
+      .catch(() => { if (!cancelled) setRoutePolyline(null); });
+    return () => { cancelled = true; };
+  }, [selectedTripId]);
+
   // Decode polyline if provided as a string (Google polyline or JSON array), else pass-through arrays
   const decodedRoute = useMemo(() => {
-    const poly = selectedLog?.trip?.polyline;
+    const poly = routePolyline;
     if (!poly) return [];
     // If already an array of [lat,lng] or [lng,lat]
     if (Array.isArray(poly)) {
@@ -173,7 +197,7 @@ export default function ELDLogs({ username = '', role = 'driver', windowWidth =
       return decodePolyline(poly);
     }
     return [];
-  }, [selectedLog]);
+  }, [routePolyline]);
 
   // Future: useEffect(() => { setLoading(true); getELDLogs().then(...).catch(...).finally(() => setLoading(false)); }, []);
 
@@ -186,7 +210,7 @@ export default function ELDLogs({ username = '', role = 'driver', windowWidth =
         <div style={{display:'flex', gap:'0.5em', alignItems:'center', marginBottom:'0.6em'}}>
           <label>
             Driver:
-            <select value={targetUsername} onChange={e=>{ setTargetUsername(e.target.value); setPage(1); }} style={{marginLeft:'0.4em'}}>
+            <select value={targetUsername} onChange={e=>{ setTargetUsername(e.target.value); setPage(1); setCursors([null]); }} style={{marginLeft:'0.4em'}}>
               <option value="">-- Select driver --</option>
               {driverOptions.map(d => {
                 const uname = d?.user?.username || d?.username || '';
@@ -223,10 +247,10 @@ export default function ELDLogs({ username = '', role = 'driver', windowWidth =
         <div style={{ display:'flex', gap:'0.5em', alignItems:'center', marginBottom:'0.6em' }}>
           <button disabled={page<=1} onClick={() => setPage(p=>Math.max(1, p-1))} style={{padding:'0.2em 0.6em'}}>Prev</button>
           <span>Page {page}</span>
-          <button onClick={() => setPage(p=>p+1)} style={{padding:'0.2em 0.6em'}}>Next</button>
+          <button disabled={!cursors[page]} onClick={() => setPage(p=>p+1)} style={{padding:'0.2em 0.6em'}}>Next</button>
           <label style={{ marginLeft:'1em' }}>
             Page size:
-            <select value={pageSize} onChange={e=>{setPageSize(Number(e.target.value)); setPage(1);}} style={{marginLeft:'0.4em'}}>
+            <select value={pageSize} onChange={e=>{setPageSize(Number(e.target.value)); setPage(1); setCursors([null]);}} style={{marginLeft:'0.4em'}}>
               {[5,10,20].map(n=> <option key={n} value={n}>{n}</option>)}
             </select>
           </label>
@@ -310,7 +334,7 @@ export default function ELDLogs({ username = '', role = 'driver', windowWidth =
 
       <div style={{ marginBottom: '2em' }}>
         <h3 style={{ color: '#1976d2', fontWeight: 'bold' }}>Route & Stops</h3>
-        <MapContainer center={[40.7128, -74.006]} zoom={6} style={{ height: '320px', width: '100%', borderRadius: '12px' }}>
+        <MapContainer center={[40.7128, -74.006]} zoom={MAP_ZOOM} style={{ height: '320px', width: '100%', borderRadius: '12px' }}>
           <TileLayer url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png" />
           {/* If selectedLog has trip geometry, render it; else fallback demo */}
           {decodedRoute.length > 0 ? (
@@ -1,12 +1,49 @@
-import React from "react";
+import React, { useState } from "react";
+import { downloadELDReport, downloadExport } from './api';
+
 export default function ExportReport() {
+  const [filters, setFilters] = useState({ driver: '', from: '', to: '', status: '' });
+  const [error, setError] = useState('');
+  const [busy, setBusy] = useState(false);
+  const update = (e) => setFilters(f => ({ ...f, [e.target.name]: e.target.value }));
+  async function run(kind, output) {
+    setBusy(true);
+    setError('');
+    try {
+      await downloadExport(kind, output, filters);
+    } catch {
+      setError('Export failed. Please retry.');
+    } finally {
+      setBusy(false);
+    }
+  }
+  async function report(format) {
+    setBusy(true);
+    setError('');
+    try {
+      await downloadELDReport(format, filters);
+    } catch {
+      setError('Report failed. Narrow the driver or dates and retry.');
+    } finally {
+      setBusy(false);
+    }
+  }
   return (
     <div className="dashboard-container">
       <h2>Export / Report</h2>
-      <div style={{background: '#f1f5f9', borderRadius: '8px', padding: '2rem', color: '#888'}}>
-        <button style={{marginRight: '1rem'}}>Export CSV</button>
-        <button>Export PDF</button>
-        <div style={{marginTop: '2rem'}}>[Export/Report Placeholder]</div>
+      <div style={{background: '#f1f5f9', borderRadius: '8px', padding: '2rem', color: '#555'}}>
+        <div style={{display: 'flex', gap: '1rem', flexWrap: 'wrap', marginBottom: '1rem'}}>
+          <label>Driver: <input name="driver" value={filters.driver} onChange={update} placeholder="username" /></label>
+          <label>From: <input type="date" name="from" value={filters.from} onChange={update} /></label>
+          <label>To: <input type="date" name="to" value={filters.to} onChange={update} /></label>
+          <label>Status: <input name="status" value={filters.status} onChange={update} /></label>
+        </div>
+        <button disabled={busy} style={{marginRight: '1rem'}} onClick={() => run('trips', 'csv')}>Export Trips CSV</button>
+        <button disabled={busy} style={{marginRight: '1rem'}} onClick={() => run('eldlogs', 'csv')}>Export ELD Logs CSV</button>
+        <button disabled={busy} style={{marginRight: '1rem'}} onClick={() => run('trips', 'ndjson')}>Export Trips NDJSON</button>
+        <button disabled={busy} style={{marginRight: '1rem'}} onClick={() => report('svg')}>ELD Grid Report SVG</button>
+        <button disabled={busy} onClick={() => report('png')}>ELD Grid Report PNG</button>
+        {error && <div style={{marginTop: '1rem', color: '#e53935'}}>{error}</div>}
       </div>
     </div>
   );
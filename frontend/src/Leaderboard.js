@@ -9,6 +9,7 @@ export default function Leaderboard({ username = "You" }) {
   const [error, setError] = React.useState("");
   const [sortBy, setSortBy] = React.useState('mileage');
   const [period, setPeriod] = React.useState('week');
+  const [scope, setScope] = React.useState('');
 
   React.useEffect(() => {
     let cancelled = false;
@@ -16,7 +17,7 @@ export default function Leaderboard({ username = "You" }) {
       setLoading(true);
       setError("");
       try {
-  const data = await getLeaderboard(username, 5, period);
+  const data = await getLeaderboard(username, 5, period, scope);
         if (cancelled) return;
         const top = Array.isArray(data?.top) ? data.top : [];
         const me = data?.me || null; // can be null if already in top
@@ -40,7 +41,7 @@ export default function Leaderboard({ username = "You" }) {
     }
     load();
     return () => { cancelled = true; };
-  }, [username, period]);
+  }, [username, period, scope]);
 
   const displayed = React.useMemo(() => {
     const copy = rows.slice();
@@ -71,6 +72,18 @@ export default function Leaderboard({ username = "You" }) {
           <option value="week">This Week</option>
           <option value="month">This Month</option>
         </select>
+        <label htmlFor="scope">Within:</label>
+        <select
+          id="scope"
+          className="leaderboard-filter"
+          value={scope}
+          onChange={(e) => setScope(e.target.value)}
+        >
+          <option value="">Fleet</option>
+          <option value="supervisor">My Team</option>
+          <option value="office">My Office</option>
+          <option value="terminal">My Terminal</option>
+        </select>
       </div>
 
       {/* Period summary */}
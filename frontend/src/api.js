@@ -80,6 +80,10 @@ export async function getELDLogsByUsername(username, limit = 5, page, pageSize,
     if (opts.date) qs.set('date', String(opts.date));
     if (opts.from) qs.set('from', String(opts.from));
     if (opts.to) qs.set('to', String(opts.to));
+    // Keyset mode: no COUNT(*)/OFFSET per poll; pass the previous response's cursor for later pages
+    if (opts.cursorMode) qs.set('pagination', 'cursor');
+    if (opts.cursor) qs.set('cursor', String(opts.cursor));
+    qs.set('expand', 'trip');
     const res = await authorizedFetch(`/api/v1/eldlogs/by-username/${encodeURIComponent(username)}/?${qs.toString()}`);
     if (!res.ok) throw new Error('Failed to fetch user logs');
     return await res.json();
@@ -89,6 +93,31 @@ export async function getELDLogsByUsername(username, limit = 5, page, pageSize,
   }
 }
 
+// Route geometry for one trip (lists omit it). opts.zoom / opts.simplify return a simplified route.
+export async function getTripGeometry(tripId, opts = {}) {
+  try {
+    const qs = new URLSearchParams();
+    if (opts.zoom != null) qs.set('zoom', String(opts.zoom));
+    if (opts.simplify != null) qs.set('simplify', String(opts.simplify));
+    if (opts.format) qs.set('polyline_format', String(opts.format));
+    const res = await authorizedFetch(`/api/v1/trips/${encodeURIComponent(tripId)}/geometry/?${qs.toString()}`);
+    if (!res.ok) throw new Error('Failed to fetch trip geometry');
+    return await res.json();
+  } catch (err) {
+    console.error('Get trip geometry error:', err);
+    throw err;
+  }
+}
+
+// Driving route through the backend's caching OSRM proxy. coords: [[lng, lat], ...] (OSRM order).
+export async function getRoute(coords, options = {}) {
+  const path = coords.map(([lng, lat]) => `${lng},${lat}`).join(';');
+  const qs = new URLSearchParams({ overview: 'full', geometries: 'geojson', ...options });
+  const res = await authorizedFetch(`/api/v1/route/v1/driving/${path}?${qs.toString()}`);
+  if (!res.ok) throw new Error('Failed to fetch route');
+  return await res.json();
+}
+
 // --- Auth helpers ---
 // API base resolution:
 // 1) If REACT_APP_API_BASE is provided, use it.
@@ -218,7 +247,12 @@ export async function createApprovalRequest({ username, supervisorUsername }) {
 
 export async function getPendingApprovalRequestsBySupervisor(supervisorUsername) {
   try {
-    const res = await authorizedFetch(`/api/approvalrequests/by-supervisor/${encodeURIComponent(supervisorUsername)}/?status=Pending`);
+    // Request only the columns the dashboard cards render
+    const qs = new URLSearchParams({
+      status: 'Pending',
+      fields: 'id,status,date,trip.id,trip.start,trip.end,trip.date,trip.driver.name',
+    });
+    const res = await authorizedFetch(`/api/approvalrequests/by-supervisor/${encodeURIComponent(supervisorUsername)}/?${qs.toString()}`);
     if (!res.ok) throw new Error('Failed to fetch pending approval requests');
     return await res.json();
   } catch (err) {
@@ -248,12 +282,19 @@ export async function rejectApprovalRequest(id) {
     throw err;
   }
 }
+export function newIdempotencyKey() {
+  if (typeof crypto !== 'undefined' && crypto.randomUUID) return crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 // Submit a trip for a username
-export async function submitTrip(payload) {
+// Pass the same idempotencyKey when retrying so the server replays the first result instead of
+// recording the submission twice
+export async function submitTrip(payload, idempotencyKey = newIdempotencyKey()) {
   try {
     const res = await authorizedFetch('/api/trips/submit/', {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
       body: JSON.stringify(payload)
     });
     if (!res.ok) throw new Error('Failed to submit trip');
@@ -265,11 +306,11 @@ export async function submitTrip(payload) {
 }
 
 // Submit an ELD log for a username
-export async function submitELDLog(payload) {
+export async function submitELDLog(payload, idempotencyKey = newIdempotencyKey()) {
   try {
     const res = await authorizedFetch('/api/eldlogs/submit/', {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
       body: JSON.stringify(payload)
     });
     if (!res.ok) throw new Error('Failed to submit ELD log');
@@ -306,7 +347,7 @@ export async function completeELDLog(id) {
 // Get all drivers from backend API
 export async function getDrivers() {
   try {
-    const res = await authorizedFetch('/api/drivers/');
+    const res = await authorizedFetch('/api/drivers/?expand=user');
     if (!res.ok) throw new Error('Failed to fetch drivers');
     return await res.json();
   } catch (err) {
@@ -315,12 +356,14 @@ export async function getDrivers() {
   }
 }
 // Get leaderboard (top N and current user rank)
-export async function getLeaderboard(username, limit = 5, period) {
+// scope: 'supervisor' | 'office' | 'terminal' ranks within the driver's team/office/terminal
+export async function getLeaderboard(username, limit = 5, period, scope) {
   try {
     const qs = new URLSearchParams();
     if (username) qs.set('username', username);
     if (limit != null) qs.set('limit', String(limit));
     if (period) qs.set('period', String(period));
+    if (scope) qs.set('scope', String(scope));
     const res = await authorizedFetch(`/api/v1/drivers/leaderboard/?${qs.toString()}`);
     if (!res.ok) throw new Error('Failed to fetch leaderboard');
     return await res.json();
@@ -363,3 +406,45 @@ export async function getUserRole(username) {
 }
 
 // Add more API functions as needed for drivers, supervisors, trips, approvalrequests, eldlogs, etc.
+
+// Save a fetched file response to disk under `filename`.
+async function saveResponse(res, filename) {
+  const blob = await res.blob();
+  const url = window.URL.createObjectURL(blob);
+  const link = document.createElement('a');
+  link.href = url;
+  link.download = filename;
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+  window.URL.revokeObjectURL(url);
+}
+
+// Download a streamed export ('trips' or 'eldlogs') as CSV or NDJSON.
+// filters: { driver, from, to, status }
+export async function downloadExport(kind, output = 'csv', filters = {}) {
+  try {
+    const qs = new URLSearchParams({ output });
+    Object.entries(filters || {}).forEach(([k, v]) => { if (v) qs.set(k, String(v)); });
+    const res = await authorizedFetch(`/api/v1/${kind}/export/?${qs.toString()}`);
+    if (!res.ok) throw new Error('Failed to export');
+    await saveResponse(res, `${kind}.${output}`);
+  } catch (err) {
+    console.error('Export error:', err);
+    throw err;
+  }
+}
+
+// Multi-day ELD duty grid report (svg or png) for the same filters as the exports
+export async function downloadELDReport(format = 'svg', filters = {}) {
+  try {
+    const qs = new URLSearchParams();
+    Object.entries(filters || {}).forEach(([k, v]) => { if (v) qs.set(k, String(v)); });
+    const res = await authorizedFetch(`/api/v1/eldlogs/report.${format}?${qs.toString()}`);
+    if (!res.ok) throw new Error('Failed to render report');
+    await saveResponse(res, `eld-report.${format}`);
+  } catch (err) {
+    console.error('ELD report error:', err);
+    throw err;
+  }
+}